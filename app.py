@@ -1,13 +1,25 @@
 import pandas as pd
-from flask import Flask, jsonify, render_template, request
+from flask import Flask, Response, jsonify, render_template, request
 
-from backorder import pipeline
+from backorder import metrics, pipeline
 from backorder.entity import DataIngestionConfig
+from backorder.pipeline.model_cache import model_cache
+from backorder.serving import (JobStore, MicroBatcher, TrainingJobRunner,
+                               TrainingQueueFull)
 
 app = Flask(__name__)
 ingestion_config = DataIngestionConfig()
-training = pipeline.Training()
 prediction = pipeline.Prediction()
+batcher = MicroBatcher(
+    pipeline.Prediction.fast_predictions,
+    max_batch_size=prediction.max_batch_size,
+    max_wait_ms=prediction.batch_window_ms,
+)
+# New model versions are loaded and checked off the request path
+model_cache.start_watcher(prediction.model_poll_sec, prediction.canary_max_accuracy_drop,
+                          prediction.engine, prediction.model_watcher_nice)
+jobs = JobStore()
+training_runner = TrainingJobRunner(jobs)
 
 
 @app.route('/')
@@ -17,8 +29,19 @@ def index():
 
 @app.route('/train_model', methods=['POST'])
 def train_model():
-    training.initiate()
-    return jsonify({'message': 'Model Training Completed!'})
+    try:
+        job = training_runner.submit()
+    except TrainingQueueFull as e:
+        return jsonify({'error': str(e)}), 429
+    return jsonify(job.to_dict()), 202
+
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': f'Unknown job id: {job_id}'}), 404
+    return jsonify(job.to_dict())
 
 
 @app.route('/predict')
@@ -33,9 +56,20 @@ def predict():
 @app.route('/one_prediction', methods=['POST'])
 def one_prediction():
     form_data = dict(request.form)
-    df = pd.DataFrame([form_data.values()], columns=list(form_data.keys()))
-    prediction = pipeline.Prediction.one_prediction(df)
-    return jsonify(list(prediction.T.to_dict().values())[0])
+    # Per request, with queue wait; `fast_predictions` counts coalesced batches
+    with metrics.track_request('one_prediction', 1):
+        result = batcher.predict(form_data)
+    return jsonify(result)
+
+
+@app.route('/batcher_stats')
+def batcher_stats():
+    return jsonify(batcher.stats())
+
+
+@app.route('/metrics')
+def prometheus_metrics():
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
 
 
 @app.route('/batch_prediction', methods=['POST'])
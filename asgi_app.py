@@ -0,0 +1,115 @@
+"""
+Async (ASGI) serving mode with the same routes as `app.py`.
+
+Run with an ASGI server, e.g. `hypercorn asgi_app:app --bind 127.0.0.1:8502`.
+Requires `quart` (the asyncio port of Flask) and an ASGI server.
+
+`/metrics` covers this process only. Uploaded files are scored in the
+`cpu_executor` worker processes, and their metrics (`batch_prediction`
+latency, model loads) are not exported.
+"""
+
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from uuid import uuid4
+
+from quart import Quart, Response, jsonify, render_template, request
+
+from backorder import metrics, pipeline
+from backorder.entity import DataIngestionConfig
+from backorder.pipeline.model_cache import model_cache
+from backorder.serving import (JobStore, MicroBatcher, TrainingJobRunner,
+                               TrainingQueueFull, tasks)
+
+app = Quart(__name__)
+ingestion_config = DataIngestionConfig()
+prediction = pipeline.Prediction()
+batcher = MicroBatcher(
+    pipeline.Prediction.fast_predictions,
+    max_batch_size=prediction.max_batch_size,
+    max_wait_ms=prediction.batch_window_ms,
+)
+# New model versions are loaded and checked off the request path
+model_cache.start_watcher(prediction.model_poll_sec, prediction.canary_max_accuracy_drop,
+                          prediction.engine, prediction.model_watcher_nice)
+jobs = JobStore()
+training_runner = TrainingJobRunner(jobs)
+# CPU bound scoring never runs on the event loop; training has its own process
+cpu_executor = ProcessPoolExecutor(prediction.n_workers)
+UPLOAD_DIR = prediction.dir / 'uploads'
+
+
+@app.route('/')
+async def index():
+    return await render_template('index.html')
+
+
+@app.route('/train_model', methods=['POST'])
+async def train_model():
+    try:
+        job = training_runner.submit()
+    except TrainingQueueFull as e:
+        return jsonify({'error': str(e)}), 429
+    return jsonify(job.to_dict()), 202
+
+
+@app.route('/predict')
+async def predict():
+    return await render_template(
+        'predict.html',
+        num_cols=ingestion_config.num_cols,
+        cat_cols=ingestion_config.cat_cols,
+    )
+
+
+@app.route('/one_prediction', methods=['POST'])
+async def one_prediction():
+    form_data = dict(await request.form)
+    # Per request, with queue wait; `fast_predictions` counts coalesced batches
+    with metrics.track_request('one_prediction', 1):
+        result = await asyncio.wrap_future(batcher.submit(form_data))
+    return jsonify(result)
+
+
+@app.route('/batcher_stats')
+async def batcher_stats():
+    return jsonify(batcher.stats())
+
+
+@app.route('/metrics')
+async def prometheus_metrics():
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/batch_prediction', methods=['POST'])
+async def batch_prediction():
+    files = await request.files
+    if 'file' not in files:
+        return jsonify({'error': 'No file uploaded'})
+
+    file = files['file']
+    if file.filename == '':
+        return jsonify({'error': 'No file selected'})
+
+    UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+    upload_id = uuid4().hex
+    fp = UPLOAD_DIR / f'{upload_id}.csv'
+    await file.save(fp)
+
+    job = jobs.submit(
+        cpu_executor, 'batch_prediction', tasks.batch_prediction,
+        fp, UPLOAD_DIR / f'{upload_id}_prediction.csv',
+    )
+    return jsonify(job.to_dict()), 202
+
+
+@app.route('/jobs/<job_id>')
+async def job_status(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': f'Unknown job id: {job_id}'}), 404
+    return jsonify(job.to_dict())
+
+
+if __name__ == '__main__':
+    app.run(port=8502)
@@ -0,0 +1,77 @@
+""" Column statistics accumulated over a dataset streamed in chunks. """
+
+import numpy as np
+from pandas import DataFrame
+
+from backorder import utils
+
+
+@utils.wrap_with_custom_exception
+class ChunkStats:
+    def __init__(self, num_cols: list[str], cat_cols: list[str], target: str):
+        """
+        Everything `DataTransformation`'s transformer learns from the train
+        data: mean, min and max of numeric columns, categories of categorical
+        columns and the target labels. `update` with every chunk, in any order.
+        """
+        self.num_cols = num_cols
+        self.cat_cols = cat_cols
+        self.target = target
+        self.feature_cols: list[str] = []
+        self.n_rows = 0
+        self.sum = dict.fromkeys(num_cols, 0.0)
+        self.count = dict.fromkeys(num_cols, 0)
+        self.min = dict.fromkeys(num_cols, np.inf)
+        self.max = dict.fromkeys(num_cols, -np.inf)
+        self.categories: dict[str, set] = {col: set() for col in cat_cols}
+        # Categorical columns with missing values, a category of their own
+        self.missing: set[str] = set()
+        self.labels: set = set()
+
+    def update(self, df: DataFrame) -> None:
+        if not self.feature_cols:
+            self.feature_cols = [col for col in df.columns if col != self.target]
+        self.n_rows += len(df)
+        for col in self.num_cols:
+            values = df[col].to_numpy(dtype=np.float64, na_value=np.nan)
+            values = values[~np.isnan(values)]
+            if len(values):
+                self.sum[col] += values.sum()
+                self.count[col] += len(values)
+                self.min[col] = min(self.min[col], values.min())
+                self.max[col] = max(self.max[col], values.max())
+        for col in self.cat_cols:
+            self.categories[col].update(df[col].dropna().unique())
+            if df[col].isna().any():
+                self.missing.add(col)
+        self.labels.update(df[self.target].dropna().unique())
+
+    def means(self) -> np.ndarray:
+        """ Mean of every numeric column, in `num_cols` order. """
+        empty = [col for col in self.num_cols if self.count[col] == 0]
+        if empty:
+            raise ValueError(f'Columns without any value: {empty}')
+        return np.array([self.sum[col] / self.count[col] for col in self.num_cols])
+
+    def summary_frame(self) -> DataFrame:
+        """
+        Smallest frame with the same min/max per numeric column and the same
+        categories per categorical column as the streamed data. Fitting the
+        transformer on it gives the scaler ranges and encoder categories of
+        a fit on the full data.
+        """
+        values = {}
+        for col in self.cat_cols:
+            values[col] = sorted(self.categories[col])
+            # A column without any value is all missing, like a full fit sees it
+            if col in self.missing or not values[col]:
+                values[col].append(np.nan)
+        n_rows = max([2] + [len(categories) for categories in values.values()])
+        frame = {}
+        for col in self.num_cols:
+            frame[col] = np.full(n_rows, self.min[col])
+            frame[col][1] = self.max[col]
+        for col, categories in values.items():
+            # Repeat the last category to fill the remaining rows
+            frame[col] = categories + categories[-1:] * (n_rows - len(categories))
+        return DataFrame(frame)[self.feature_cols]
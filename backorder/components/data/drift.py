@@ -0,0 +1,154 @@
+""" Data Drift """
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from pandas import DataFrame, Series
+from pandas.api.types import is_bool_dtype, is_numeric_dtype
+from scipy.stats import ks_2samp, kstwo
+
+from backorder import utils
+from backorder.logger import logging
+
+
+def _numeric_values(data: Series) -> np.ndarray:
+    """ Non-null values of a numeric column as float64. """
+    return data.to_numpy(dtype=np.float64, na_value=np.nan, copy=False)[data.notna().to_numpy()]
+
+
+@utils.wrap_with_custom_exception
+class DriftEngine:
+    def __init__(
+        self,
+        base_df: DataFrame,
+        n_jobs: int | None = None,
+        approx_rows: int | None = None,
+        sketch_size: int = 10_000,
+        alpha: float = 0.05,
+    ):
+        """
+        Two-sample Kolmogorov-Smirnov tests of many datasets against one base.
+
+        Every numeric base column is sorted once and the sorted reference is
+        reused by each `compare` call. The KS statistic of a column is then
+        `max |F_base - F_curr|` evaluated with `searchsorted`, and the p-values
+        of all columns come from one vectorized call to the asymptotic KS
+        distribution. Columns are processed by `n_jobs` threads; NumPy releases
+        the GIL while sorting and searching.
+
+        When either sample has more than `approx_rows` rows, both sides are
+        summarised by `sketch_size` quantiles, so only that many points per
+        column are kept and searched. The statistic is then within about
+        `2 / sketch_size` of the exact one.
+
+        Non-numeric columns fall back to `scipy.stats.ks_2samp`.
+        """
+        self.n_jobs = n_jobs or os.cpu_count() or 1
+        self.approx_rows = approx_rows
+        self.sketch_size = sketch_size
+        self.alpha = alpha
+        self.probs = (np.arange(sketch_size) + 0.5) / sketch_size
+
+        self.numeric_cols = [
+            col for col in base_df.columns
+            if is_numeric_dtype(base_df[col]) and not is_bool_dtype(base_df[col])
+        ]
+        self.other_cols = [col for col in base_df.columns if col not in self.numeric_cols]
+        self.base_df = base_df
+
+        self.n_base = {col: int(base_df[col].notna().sum()) for col in self.numeric_cols}
+        logging.info('Sorting %s numeric base columns once', len(self.numeric_cols))
+        self.references: dict[str, np.ndarray] = dict(zip(
+            self.numeric_cols,
+            self._map(self._reference, self.numeric_cols),
+        ))
+
+    def _map(self, func, items: list) -> list:
+        if self.n_jobs == 1 or len(items) < 2:
+            return [func(item) for item in items]
+        with ThreadPoolExecutor(min(self.n_jobs, len(items))) as executor:
+            return list(executor.map(func, items))
+
+    def _use_sketch(self, n_rows: int) -> bool:
+        return self.approx_rows is not None and n_rows > self.approx_rows
+
+    def _sketch(self, values: np.ndarray) -> np.ndarray:
+        """ `sketch_size` evenly spaced order statistics of `values`. """
+        # A full sort beats `np.quantile`'s multi-pivot partition here
+        values = np.sort(values)
+        return values[(self.probs * len(values)).astype(np.int64)]
+
+    def _reference(self, col: str) -> np.ndarray:
+        values = _numeric_values(self.base_df[col])
+        if self._use_sketch(len(values)):
+            return self._sketch(values)
+        return np.sort(values)
+
+    @staticmethod
+    def _exact_statistic(ref: np.ndarray, curr: np.ndarray) -> float:
+        """ KS statistic of sorted `ref` against sorted `curr`. """
+        # F_curr is constant between its distinct values, where F_base can
+        # only grow, so the supremum is at a distinct value (F_base right
+        # limit) or just below one (F_base left limit vs the previous step)
+        is_last = np.append(curr[1:] != curr[:-1], True)
+        points = curr[is_last]
+        cdf_curr = (np.flatnonzero(is_last) + 1) / len(curr)
+        cdf_curr_below = np.append(0.0, cdf_curr[:-1])
+        cdf_base = np.searchsorted(ref, points, side='right') / len(ref)
+        cdf_base_below = np.searchsorted(ref, points, side='left') / len(ref)
+        return float(max(
+            np.abs(cdf_base - cdf_curr).max(),
+            np.abs(cdf_base_below - cdf_curr_below).max(),
+        ))
+
+    @staticmethod
+    def _sketch_statistic(ref: np.ndarray, curr: np.ndarray) -> float:
+        """ KS statistic between the step CDFs of two quantile sketches. """
+        points = np.concatenate([ref, curr])
+        cdf_base = np.searchsorted(ref, points, side='right') / len(ref)
+        cdf_curr = np.searchsorted(curr, points, side='right') / len(curr)
+        return float(np.abs(cdf_base - cdf_curr).max())
+
+    def _statistic(self, col: str, curr_data: Series) -> tuple[float, int, int]:
+        """ KS statistic of one column and the two sample sizes. """
+        ref, n_base = self.references[col], self.n_base[col]
+        curr = _numeric_values(curr_data)
+        n_curr = len(curr)
+        if n_base == 0 or n_curr == 0:
+            return np.nan, n_base, n_curr
+
+        if self._use_sketch(n_base) or self._use_sketch(n_curr):
+            if not self._use_sketch(n_base):
+                ref = self._sketch(ref)
+            return DriftEngine._sketch_statistic(ref, self._sketch(curr)), n_base, n_curr
+        curr.sort()
+        return DriftEngine._exact_statistic(ref, curr), n_base, n_curr
+
+    def compare(self, curr_df: DataFrame) -> dict:
+        """
+        Returns
+        -------
+        `{column: {'pvalues': float, 'same_distribution': bool}}` for every
+        base column.
+        """
+        stats = self._map(lambda col: self._statistic(col, curr_df[col]), self.numeric_cols)
+        statistic, n_base, n_curr = np.array(stats, dtype=np.float64).reshape(-1, 3).T
+
+        # Asymptotic p-value, as `ks_2samp(method='asymp')` computes it
+        with np.errstate(divide='ignore', invalid='ignore'):
+            effective_n = np.round(n_base * n_curr / (n_base + n_curr))
+        pvalues = kstwo.sf(statistic, np.maximum(effective_n, 1))
+        pvalues = np.where(np.isnan(statistic), np.nan, np.clip(pvalues, 0, 1))
+
+        pvalue_by_col = dict(zip(self.numeric_cols, pvalues.tolist()))
+        for col in self.other_cols:
+            pvalue_by_col[col] = float(ks_2samp(self.base_df[col], curr_df[col]).pvalue)
+
+        return {
+            col: {
+                'pvalues': pvalue_by_col[col],
+                'same_distribution': bool(pvalue_by_col[col] > self.alpha),
+            }
+            for col in self.base_df.columns
+        }
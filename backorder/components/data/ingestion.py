@@ -5,13 +5,13 @@ from typing import Tuple
 
 import numpy as np
 from pandas import DataFrame, Series
-from sklearn.model_selection import train_test_split
-from sklearn.utils import resample
 
 from backorder import utils
+from backorder.components.data import sampling
 from backorder.config import TARGET_COLUMN
 from backorder.entity import DataIngestionArtifact, DataIngestionConfig
 from backorder.logger import logging
+from backorder.stage_cache import code_fingerprint, file_fingerprint
 
 
 @utils.wrap_with_custom_exception
@@ -19,24 +19,35 @@ class DataIngestion(DataIngestionConfig):
     def __init__(self):
         """Divides and store the main data into train, test and validation data."""
         super().__init__()
+        # Rows read by the last `initiate`, before cleaning
+        self.n_rows_imported: int | None = None
         logging.info(f"{'>>'*10} Data Ingestion {'<<'*10}")
 
     def _import_data(self, fp: Path | None = None) -> DataFrame:
-        """Import the data from the provided path."""
+        """
+        Import the data from the provided path, a file or a directory of
+        parquet files.
+
+        Only the configured feature and target columns are read, and
+        `row_filters` are applied while scanning.
+        """
         import_path = self.base_data_fp if fp is None else fp
 
         log_msg = 'Importing main data from "%s"'
         logging.info(log_msg, import_path)
 
-        df = utils.read_dataset(import_path)
+        df = utils.read_dataset(
+            import_path,
+            columns=self.num_cols + self.cat_cols + [TARGET_COLUMN],
+            filters=self.row_filters,
+        )
         return df
 
     def _clean_df(self, df: DataFrame) -> DataFrame:
         """Custom cleaning of the df if requires."""
-        df = df[:-1]
-
-        # Drop columns
-        df = df.drop(columns=['sku'])
+        # Raw extracts end with an empty summary row, which has no values
+        # in any of the imported columns
+        df = df.dropna(how='all')
 
         return df
 
@@ -49,28 +60,73 @@ class DataIngestion(DataIngestionConfig):
         df.to_parquet(fp, index=False)
 
     def upsample_data(self, X: DataFrame, y: Series) -> Tuple[DataFrame, Series]:
-        X_majority, X_minority = X[y == 'No'], X[y == 'Yes']
-        y_majority, y_minority = y[y == 'No'], y[y == 'Yes']
-
-        X_upsampled, y_upsampled = resample(
-            X_minority, y_minority, replace=True, n_samples=len(X_majority)
-        )
-
-        X_upsampled = np.concatenate((X_majority, X_upsampled))
-        y_upsampled = np.concatenate((y_majority, y_upsampled))
-
-        return (DataFrame(X_upsampled, columns=X.columns), Series(y_upsampled, name=TARGET_COLUMN))
+        """
+        Materialized upsampling, only used with `initiate(upsample=True)`.
+
+        By default rebalancing is left to `ModelTrainer`, which applies it
+        as sample weights, see `backorder.components.data.sampling`.
+        """
+        indices = sampling.upsample_indices(y)
+        return (X.iloc[indices].reset_index(drop=True),
+                y.iloc[indices].reset_index(drop=True).rename(TARGET_COLUMN))
+
+    def split_data(self, df: DataFrame) -> Tuple[DataFrame, DataFrame]:
+        """
+        Train and test rows, chosen by the hash of each row instead of at
+        random, so a row stays on the same side across runs. Incremental
+        retraining then never grows the stored forest on earlier test rows,
+        nor scores it on rows its trees were trained on. Equal rows, e.g.
+        upsampled copies, land on the same side.
+
+        Both sides are ordered by hash, a fixed shuffle of the input order.
+        """
+        hashes = utils.row_hashes(df.drop(columns=[TARGET_COLUMN]), df[TARGET_COLUMN])
+        is_test = hashes / np.float64(2**64) < self.test_size
+        order = np.argsort(hashes, kind='stable')
+        return df.iloc[order[~is_test[order]]], df.iloc[order[is_test[order]]]
+
+    def fingerprint(self, main_data_fp: Path | None = None, upsample: bool = False) -> dict:
+        """Inputs the ingestion output depends on, used as `StageCache` key."""
+        return {
+            'data': file_fingerprint(self.base_data_fp if main_data_fp is None else main_data_fp),
+            'test_size': self.test_size,
+            'num_cols': self.num_cols,
+            'cat_cols': self.cat_cols,
+            'target': TARGET_COLUMN,
+            'row_filters': self.row_filters,
+            'downcast_dtypes': self.downcast_dtypes,
+            'upsample': upsample,
+            'code': code_fingerprint(self),
+        }
 
     def initiate(
         self,
         main_data_fp: Path | None = None,
-        upsample: bool = True,
+        upsample: bool = False,
     ) -> DataIngestionArtifact:
         """Initiate the Data Ingestion process."""
         df = self._import_data(main_data_fp)
+        self.n_rows_imported = len(df)
         logging.info('Shape of imported raw data %s', df.shape)
         df = self._clean_df(df)
 
+        # Memory per step, next to what the imported dtypes would have used
+        imported_bytes_per_row = utils.memory_mb(df) / max(len(df), 1)
+        memory_report = {}
+
+        def report_memory(step: str, df: DataFrame) -> None:
+            memory_report[step] = {
+                'rows': len(df),
+                'memory_mb': round(utils.memory_mb(df), 3),
+                'imported_dtypes_mb': round(imported_bytes_per_row * len(df), 3),
+            }
+            logging.info('Memory of %s data: %s', step, memory_report[step])
+
+        report_memory('imported', df)
+        if self.downcast_dtypes:
+            df = utils.downcast_dtypes(df, self.num_cols, self.cat_cols + [TARGET_COLUMN])
+            report_memory('downcast', df)
+
         # Up-sample the data to maintain balance
         if upsample:
             X_train_df, y_train_df = self.upsample_data(
@@ -79,11 +135,15 @@ class DataIngestion(DataIngestionConfig):
             X_train_df[y_train_df.name] = y_train_df
             df = X_train_df
             logging.info('Shape of upsampled raw data %s', df.shape)
+            report_memory('upsampled', df)
 
         logging.info('Split DataFrame into train and test.')
-        train_df, test_df = train_test_split(df, test_size=self.test_size)
+        train_df, test_df = self.split_data(df)
         logging.info('Train data shape: %s', train_df.shape)
         logging.info('Test data shape: %s', test_df.shape)
+        report_memory('train', train_df)
+        report_memory('test', test_df)
+        utils.to_yaml(self.memory_report_fp, memory_report)
 
         # Save train and test df
         self._df_to_parquet(train_df, self.train_path)
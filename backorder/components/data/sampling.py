@@ -0,0 +1,52 @@
+""" Class rebalancing as row indices or sample weights instead of row copies. """
+
+from typing import Literal
+
+import numpy as np
+import pandas as pd
+from sklearn.utils.class_weight import compute_sample_weight
+
+Sampling = Literal['upsample', 'class_weight', 'none']
+
+
+def upsample_indices(y, random_state=None) -> np.ndarray:
+    """
+    Row positions that upsample every class of `y` to the size of the
+    largest class: each row is kept and the missing rows of smaller classes
+    are drawn from that class with replacement.
+
+    `frame.iloc[indices]` gives the upsampled rows with their dtypes.
+    """
+    rng = np.random.default_rng(random_state)
+    # Hash based, sorting string labels is much slower
+    y_codes, classes = pd.factorize(np.asarray(y))
+    n_target = np.bincount(y_codes).max()
+
+    indices = []
+    for code in range(len(classes)):
+        positions = np.flatnonzero(y_codes == code)
+        if len(positions) < n_target:
+            positions = np.concatenate([
+                positions, rng.choice(positions, n_target - len(positions), replace=True)])
+        indices.append(positions)
+    return np.sort(np.concatenate(indices))
+
+
+def upsample_weights(y, random_state=None) -> np.ndarray:
+    """
+    Upsampling expressed as one weight per row: how many times the row
+    appears in `upsample_indices(y)`. Passing it as `sample_weight`
+    trains on the upsampled data without copying a single row.
+    """
+    return np.bincount(upsample_indices(y, random_state), minlength=len(y)).astype(np.float64)
+
+
+def get_sample_weight(y, sampling: Sampling, random_state=None) -> np.ndarray | None:
+    """ `sample_weight` for `fit` that applies `sampling` to labels `y`. """
+    if sampling == 'upsample':
+        return upsample_weights(y, random_state)
+    if sampling == 'class_weight':
+        return compute_sample_weight('balanced', y)
+    if sampling == 'none':
+        return None
+    raise ValueError(f'Unknown sampling: {sampling}')
@@ -1,5 +1,7 @@
 """ Data Transformation """
 
+from pathlib import Path
+
 import numpy as np
 from sklearn.compose import ColumnTransformer
 from sklearn.impute import SimpleImputer
@@ -7,9 +9,13 @@ from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import LabelEncoder, MinMaxScaler, OrdinalEncoder
 
 from backorder import utils
+from backorder.components.data.chunk_stats import ChunkStats
 from backorder.config import TARGET_COLUMN
-from backorder.entity import DataTransformationArtifact, DataTransformationConfig
+from backorder.entity import (DataIngestionArtifact, DataTransformationArtifact,
+                              DataTransformationConfig, StoredModelConfig)
 from backorder.logger import logging
+from backorder.model_registry import verify_stored_files
+from backorder.stage_cache import code_fingerprint, file_fingerprint
 
 
 @utils.wrap_with_custom_exception
@@ -17,6 +23,9 @@ class DataTransformation(DataTransformationConfig):
     def __init__(self):
         """To initiate transformation process with train and test dataset."""
         super().__init__()
+        # Fitted objects of the last `initiate`, handed on to `ModelEvaluation`
+        self.trf_pipeline = None
+        self.target_enc = None
         logging.info(f"{'>>'*20} Data Transformation {'<<'*20}")
 
     @classmethod
@@ -47,46 +56,179 @@ class DataTransformation(DataTransformationConfig):
 
         return preprocessor
 
+    def _reusable_stored_transformers(
+        self, columns: list[str], categories: dict[str, set], labels: set,
+    ) -> bool:
+        """
+        Whether the stored transformer and target encoder fit the current
+        schema: same feature `columns`, and no category or label they have
+        not seen.
+        """
+        stored = StoredModelConfig()
+        if stored.latest_stored_dir is None:
+            return False
+        verify_stored_files(stored.latest_stored_dir, [stored.stored_transformer_path.name,
+                                                       stored.stored_target_enc_path.name])
+        transformer = utils.load_object(stored.stored_transformer_path)
+        target_enc = utils.load_object(stored.stored_target_enc_path)
+
+        if set(transformer.feature_names_in_) != set(columns):
+            logging.info('Feature columns changed, fitting a new transformer.')
+            return False
+        encoder = transformer.named_transformers_['obj_pipe'].named_steps['encoder']
+        for col, known in zip(encoder.feature_names_in_, encoder.categories_):
+            unseen = categories[col] - set(known)
+            if unseen:
+                logging.info('Unseen categories %s in %s, fitting a new transformer.', unseen, col)
+                return False
+        if not labels <= set(target_enc.classes_):
+            logging.info('Unseen target labels, fitting a new target encoder.')
+            return False
+        return True
+
+    def _fit_from_chunk_stats(self, stats: ChunkStats):
+        """
+        Transformer and target encoder equal to fitting them on the full
+        train data, built from streamed statistics only.
+        """
+        # Ranges and categories come from fitting on the summary rows ...
+        trf_pipeline = DataTransformation.get_transformer_object(self.num_cols, self.cat_cols)
+        trf_pipeline.fit(stats.summary_frame())
+        # ... and the imputer means from the running sums
+        imputer = trf_pipeline.named_transformers_['num_pipe'].named_steps['imputer']
+        imputer.statistics_ = stats.means()
+
+        target_enc = LabelEncoder().fit(sorted(stats.labels))
+        return trf_pipeline, target_enc
+
+    def _transform_to_arrays(self, fp: Path, trf_pipeline, target_enc, X_path: Path, y_path: Path):
+        """ Transform the dataset at `fp` chunk by chunk straight into `.npy` files. """
+        n_rows = utils.count_rows(fp)
+        n_features = len(trf_pipeline.get_feature_names_out())
+        X_out = utils.open_array(X_path, (n_rows, n_features), self.transformed_dtype)
+        y_out = utils.open_array(y_path, (n_rows,), np.int64)
+
+        start = 0
+        for chunk in utils.iter_dataset_chunks(fp, self.chunk_size):
+            end = start + len(chunk)
+            X_out[start:end] = trf_pipeline.transform(chunk[trf_pipeline.feature_names_in_])
+            y_out[start:end] = target_enc.transform(chunk[TARGET_COLUMN])
+            start = end
+        X_out.flush()
+        y_out.flush()
+
+    def fingerprint(self, data_ingestion_artifact: DataIngestionArtifact) -> dict:
+        """ Inputs the transformation output depends on, used as `StageCache` key. """
+        stored = StoredModelConfig()
+        return {
+            'retrain_mode': self.retrain_mode,
+            'stored_transformer': (
+                file_fingerprint(stored.stored_transformer_path)
+                if self.retrain_mode == 'incremental' and stored.latest_stored_dir is not None
+                else None
+            ),
+            'train': file_fingerprint(data_ingestion_artifact.train_path),
+            'test': file_fingerprint(data_ingestion_artifact.test_path),
+            'num_cols': self.num_cols,
+            'cat_cols': self.cat_cols,
+            'target': TARGET_COLUMN,
+            'transformed_dtype': self.transformed_dtype,
+            'canary_rows': self.canary_rows,
+            'out_of_core': [self.out_of_core, self.chunk_size],
+            'code': [code_fingerprint(self), code_fingerprint(ChunkStats)],
+        }
+
     def initiate(
         self,
         upsample: bool = True,
+        data_ingestion_artifact: DataIngestionArtifact | None = None,
     ) -> DataTransformationArtifact:
-        # Reading training and testing file
-        train_df = utils.read_dataset(self.train_path)
-        test_df = utils.read_dataset(self.test_path)
-
-        # Selecting input feature from train and test data
-        X_train_df = train_df.drop(TARGET_COLUMN, axis=1)
-        X_test_df = test_df.drop(TARGET_COLUMN, axis=1)
-
-        # Selecting target feature from train and test data
-        y_train_df = train_df[TARGET_COLUMN]
-        y_test_df = test_df[TARGET_COLUMN]
-
-        # Transformation on target columns
-        target_enc = LabelEncoder()
-        y_train_arr = target_enc.fit_transform(y_train_df)
-        y_test_arr = target_enc.transform(y_test_df)
-
-        trf_pipeline = DataTransformation.get_transformer_object(self.num_cols, self.cat_cols)
-        trf_pipeline.fit(X_train_df)
-
-        # Transforming input features
-        X_train_arr = trf_pipeline.transform(X_train_df)
-        X_test_arr = trf_pipeline.transform(X_test_df)
-
-        train_arr = np.c_[X_train_arr, y_train_arr]
-        test_arr = np.c_[X_test_arr, y_test_arr]
-
-        # Objects dumping
-        utils.dump_array(self.train_npz_path, train_arr)
-        utils.dump_array(self.test_npz_path, test_arr)
-
-        utils.dump_object(self.transformer_pkl_fp, trf_pipeline)
-        utils.dump_object(self.target_enc_fp, target_enc)
-
+        if data_ingestion_artifact is not None:
+            self.train_path = data_ingestion_artifact.train_path
+            self.test_path = data_ingestion_artifact.test_path
+
+        if self.out_of_core:
+            # One streaming pass collects everything the transformer learns
+            logging.info('Collecting train statistics in chunks of %s rows', self.chunk_size)
+            stats = ChunkStats(self.num_cols, self.cat_cols, TARGET_COLUMN)
+            for chunk in utils.iter_dataset_chunks(self.train_path, self.chunk_size):
+                stats.update(chunk)
+            columns, categories, labels = stats.feature_cols, stats.categories, stats.labels
+        else:
+            # Reading training and testing file
+            train_df = utils.read_dataset(self.train_path)
+            test_df = utils.read_dataset(self.test_path)
+            logging.info('Memory of train and test data: %.1f MiB, %.1f MiB',
+                         utils.memory_mb(train_df), utils.memory_mb(test_df))
+
+            # Selecting input feature from train and test data
+            X_train_df = train_df.drop(TARGET_COLUMN, axis=1)
+            X_test_df = test_df.drop(TARGET_COLUMN, axis=1)
+
+            # Selecting target feature from train and test data
+            y_train_df = train_df[TARGET_COLUMN]
+            y_test_df = test_df[TARGET_COLUMN]
+
+            columns = list(X_train_df.columns)
+            categories = {col: set(X_train_df[col].dropna().unique()) for col in self.cat_cols}
+            labels = set(y_train_df.unique())
+
+        if (self.retrain_mode == 'incremental'
+                and self._reusable_stored_transformers(columns, categories, labels)):
+            # Linked byte for byte so `ModelTrainer` can tell the stored
+            # forest was trained on features from the same transformer
+            logging.info('Reusing the stored transformer and target encoder.')
+            stored = StoredModelConfig()
+            utils.link_or_copy(stored.stored_transformer_path, self.transformer_pkl_fp)
+            utils.link_or_copy(stored.stored_target_enc_path, self.target_enc_fp)
+            trf_pipeline = utils.load_object(self.transformer_pkl_fp)
+            target_enc = utils.load_object(self.target_enc_fp)
+        else:
+            if self.out_of_core:
+                trf_pipeline, target_enc = self._fit_from_chunk_stats(stats)
+            else:
+                target_enc = LabelEncoder().fit(y_train_df)
+                trf_pipeline = DataTransformation.get_transformer_object(
+                    self.num_cols, self.cat_cols)
+                trf_pipeline.fit(X_train_df)
+            utils.dump_object(self.transformer_pkl_fp, trf_pipeline)
+            utils.dump_object(self.target_enc_fp, target_enc)
+
+        if self.out_of_core:
+            self._transform_to_arrays(self.train_path, trf_pipeline, target_enc,
+                                      self.train_X_path, self.train_y_path)
+            self._transform_to_arrays(self.test_path, trf_pipeline, target_enc,
+                                      self.test_X_path, self.test_y_path)
+        else:
+            # Transformation on target columns
+            y_train_arr = target_enc.transform(y_train_df)
+            y_test_arr = target_enc.transform(y_test_df)
+
+            # Transforming input features, in the column order of the fit
+            X_train_arr = trf_pipeline.transform(X_train_df[trf_pipeline.feature_names_in_])
+            X_test_arr = trf_pipeline.transform(X_test_df[trf_pipeline.feature_names_in_])
+
+            # Objects dumping
+            utils.dump_array(self.train_X_path, X_train_arr, self.transformed_dtype)
+            utils.dump_array(self.train_y_path, y_train_arr)
+            utils.dump_array(self.test_X_path, X_test_arr, self.transformed_dtype)
+            utils.dump_array(self.test_y_path, y_test_arr)
+
+        # Test rows are shuffled by the split, the first ones are a sample.
+        # Unlinked first: a stored version may hold a link to the old file.
+        canary = next(utils.iter_dataset_chunks(self.test_path, self.canary_rows))
+        self.canary_fp.unlink(missing_ok=True)
+        canary.to_parquet(self.canary_fp, index=False)
+
+        self.trf_pipeline, self.target_enc = trf_pipeline, target_enc
         artifact = DataTransformationArtifact(
-            self.transformer_pkl_fp, self.target_enc_fp, self.train_npz_path, self.test_npz_path
+            self.transformer_pkl_fp,
+            self.target_enc_fp,
+            self.train_X_path,
+            self.train_y_path,
+            self.test_X_path,
+            self.test_y_path,
+            self.canary_fp,
         )
 
         logging.info('Data transformation object %s', artifact)
@@ -1,11 +1,15 @@
 """ Data Validation """
 
-from pandas import DataFrame
-from scipy.stats import ks_2samp
+from pathlib import Path
+
+from pandas import DataFrame, Series
 
 from backorder import utils
-from backorder.entity import DataValidationArtifact, DataValidationConfig
+from backorder.components.data.drift import DriftEngine
+from backorder.entity import (DataIngestionArtifact, DataValidationArtifact,
+                              DataValidationConfig)
 from backorder.logger import logging
+from backorder.stage_cache import code_fingerprint, file_fingerprint
 
 
 @utils.wrap_with_custom_exception
@@ -17,42 +21,53 @@ class DataValidation(DataValidationConfig):
         super().__init__()
         logging.info(f"{'>>'*10} Data Validation {'<<'*10}")
         self.validation_report = {}
+        self._drift_engine: DriftEngine | None = None
+
+    def _null_ratios(self, fp: Path, df: DataFrame | None = None) -> Series:
+        """
+        Fraction of missing values per column of the dataset at `fp`.
 
-    def _drop_missing_values_cols(
-        self, df: DataFrame, report_name: str,
-    ) -> DataFrame | None:
+        Parquet files are answered from footer statistics, so the cost grows
+        with the number of columns and row groups rather than rows. Otherwise
+        `df` (or the file) is scanned once.
+        """
+        footer = utils.parquet_null_counts(fp)
+        if footer is not None:
+            n_rows, null_counts = footer
+            logging.info('Null counts of %s read from parquet metadata', fp)
+            return Series(null_counts, dtype='float64').div(max(n_rows, 1))
+
+        if df is None:
+            df = utils.read_dataset(fp)
+        return df.isna().mean()
+
+    def _select_cols_by_missing_values(
+        self, null_ratios: Series, report_name: str,
+    ) -> list[str]:
         """
-        This function will drop column which contains missing value more than specified threshold.
+        Columns whose missing values are within the specified threshold.
 
-        df: Accepts a pandas DataFrame
+        null_ratios: Fraction of missing values per column
         threshold: Percentage criteria to drop a column
 
         Returns
         ------
-        DataFrame if at least a single column is available after dropping missing columns else None.
+        Columns to keep, an empty list if every column has too many missing values.
         """
 
         threshold = self.missing_threshold
-        null_report = df.isna().sum().div(df.shape[0])
 
         logging.info('Select columns which has null values more than %s',
                      threshold)
-        drop_col = list(null_report[null_report > threshold].index)
+        drop_col = list(null_ratios[null_ratios > threshold].index)
 
         logging.info(f'Columns to drop: %s', drop_col)
         self.validation_report[report_name] = drop_col
-        df.drop(drop_col, axis=1, inplace=True)
-
-        if len(df.columns) == 0:
-            return None
-        return df
+        return [col for col in null_ratios.index if col not in drop_col]
 
     def _is_required_cols_exists(
-        self, base_df: DataFrame, curr_df: DataFrame, report_name: str,
+        self, base_cols: list[str], curr_cols: list[str], report_name: str,
     ) -> bool:
-        base_cols = base_df.columns
-        curr_cols = curr_df.columns
-
         missing_cols = []
         for base_col in base_cols:
             if base_col not in curr_cols:
@@ -67,77 +82,70 @@ class DataValidation(DataValidationConfig):
     def _data_drift(
         self, base_df: DataFrame, curr_df: DataFrame, report_name: str,
     ) -> None:
-        drift_report = dict()
-        for base_col in base_df.columns:
-            base_data, curr_data = base_df[base_col], curr_df[base_col]
-
-            logging.info('Hypothesis %s: %s, %s',
-                         base_col, base_data.dtype, curr_data.dtype)
-            distribution = ks_2samp(base_data, curr_data)
-            pvalue = float(distribution.pvalue)    # type: ignore
-
-            if pvalue > 0.05:
-                drift_report[base_col] = {
-                    'pvalues': pvalue, 'same_distribution': True
-                }
-            else:
-                drift_report[base_col] = {
-                    'pvalues': pvalue, 'same_distribution': False
-                }
+        # The sorted base columns are shared by the train and test comparisons
+        if self._drift_engine is None:
+            self._drift_engine = DriftEngine(
+                base_df,
+                n_jobs=self.drift_n_jobs,
+                approx_rows=self.drift_approx_rows,
+                sketch_size=self.drift_sketch_size,
+            )
+        drift_report = self._drift_engine.compare(curr_df)
+
+        drifted = [col for col, result in drift_report.items() if not result['same_distribution']]
+        logging.info('Columns with data drift: %s', drifted)
         self.validation_report[report_name] = drift_report
 
-    def initiate(self) -> DataValidationArtifact:
+    def fingerprint(self, data_ingestion_artifact: DataIngestionArtifact) -> dict:
+        """ Inputs the validation report depends on, used as `StageCache` key. """
+        return {
+            'base_data': file_fingerprint(self.base_data_fp),
+            'train': file_fingerprint(data_ingestion_artifact.train_path),
+            'test': file_fingerprint(data_ingestion_artifact.test_path),
+            'missing_threshold': self.missing_threshold,
+            'drift_approx_rows': self.drift_approx_rows,
+            'drift_sketch_size': self.drift_sketch_size,
+            'code': [code_fingerprint(self), code_fingerprint(DriftEngine)],
+        }
+
+    def initiate(
+        self,
+        data_ingestion_artifact: DataIngestionArtifact | None = None,
+    ) -> DataValidationArtifact:
+        if data_ingestion_artifact is not None:
+            self.train_path = data_ingestion_artifact.train_path
+            self.test_path = data_ingestion_artifact.test_path
+
         # --- --- Base Dataset --- --- #
+        # Base data is read once; everything else is derived from this frame
         logging.info('Reading base DataFrame')
         base_df = utils.read_dataset(self.base_data_fp)
 
         logging.info('Drop null values columns from base df')
-        base_df = self._drop_missing_values_cols(
-            base_df, 'missing_values_within_base_dataset')
-
-        # --- --- Train dataset --- --- #
-        logging.info('Reading train DataFrame')
-        train_df = utils.read_dataset(self.train_path)
-
-        logging.info('Drop null values columns from train df')
-        train_df = self._drop_missing_values_cols(
-            train_df, 'missing_values_within_train_dataset')
-
-        # --- --- Test Dataset --- --- #
-        logging.info('Reading test DataFrame')
-        test_df = utils.read_dataset(self.test_path)
-
-        logging.info('Drop null values columns from test df')
-        test_df = self._drop_missing_values_cols(
-            test_df, 'missing_values_within_test_dataset')
-
-        # --- --- Check datasets exists --- --- #
-        if base_df is None:
+        base_cols = self._select_cols_by_missing_values(
+            self._null_ratios(self.base_data_fp, base_df),
+            'missing_values_within_base_dataset')
+        if len(base_cols) == 0:
             raise ValueError('Base Dataset cannot be None.')
-        if train_df is None:
-            raise ValueError('Train Dataset cannot be None.')
-        if test_df is None:
-            raise ValueError('Test Dataset cannot be None.')
-
-        # --- --- Checking Data Drift --- --- #
-        drift_log_msg = 'All columns are available in %s df hence detecting data drift'
-        # --- --- Train Dataset --- --- #
-        logging.info('Is all required columns present in train df')
-        train_df_cols_status = self._is_required_cols_exists(
-            base_df, train_df, 'missing_cols_within_train_dataset')
-        if train_df_cols_status:
-            logging.info(drift_log_msg % 'train')
-            self._data_drift(base_df, train_df,
-                             'data_drift_within_train_dataset')
-
-        # --- --- Test Dataset --- --- #
-        logging.info('Is all required columns present in test df')
-        test_df_cols_status = self._is_required_cols_exists(
-            base_df, test_df, 'missing_cols_within_test_dataset')
-        if test_df_cols_status:
-            logging.info(drift_log_msg % 'test')
-            self._data_drift(base_df, test_df,
-                             'data_drift_within_test_dataset')
+        base_df = base_df[base_cols]
+
+        # --- --- Train and Test Datasets --- --- #
+        # Null ratios and schema come from metadata; only the columns needed
+        # for data drift are read, once per dataset
+        for name, fp in [('train', self.train_path), ('test', self.test_path)]:
+            logging.info('Drop null values columns from %s df', name)
+            curr_cols = self._select_cols_by_missing_values(
+                self._null_ratios(fp), f'missing_values_within_{name}_dataset')
+            if len(curr_cols) == 0:
+                raise ValueError(f'{name.title()} Dataset cannot be None.')
+
+            logging.info('Is all required columns present in %s df', name)
+            if self._is_required_cols_exists(
+                base_cols, curr_cols, f'missing_cols_within_{name}_dataset',
+            ):
+                logging.info('All columns are available in %s df hence detecting data drift', name)
+                curr_df = utils.read_dataset(fp, columns=base_cols)
+                self._data_drift(base_df, curr_df, f'data_drift_within_{name}_dataset')
 
         # Write report to YAML file
         logging.info('Writing report in yaml file')
@@ -1,17 +1,55 @@
 """ Trained Model Evaluation """
 
-from typing import Any, Tuple
+from time import perf_counter
+from typing import Any
 
-from sklearn.compose import ColumnTransformer
-from sklearn.metrics import accuracy_score
+import numpy as np
+from sklearn.base import BaseEstimator
+from sklearn.metrics import roc_auc_score
 
 from backorder import utils
-from backorder.config import PREDICTION_TYPE, TARGET_COLUMN
+from backorder.config import PREDICTION_TYPE
 from backorder.entity import (DataIngestionArtifact,
                               DataTransformationArtifact,
                               ModelEvaluationArtifact, ModelEvaluationConfig,
                               ModelTrainerArtifact, StoredModelConfig)
 from backorder.logger import logging
+from backorder.model_registry import verify_stored_files
+
+
+def _fitted_state(estimator: BaseEstimator) -> dict:
+    """ Hyperparameters and fitted attributes (public, ending in `_`). """
+    state = estimator.get_params(deep=False)
+    state.update({
+        name: value for name, value in vars(estimator).items()
+        if name.endswith('_') and not name.startswith('_')
+    })
+    return state
+
+
+def _equivalent(a: Any, b: Any) -> bool:
+    """ Whether two fitted objects transform every input identically. """
+    if type(a) is not type(b):
+        return False
+    if isinstance(a, BaseEstimator):
+        return _equivalent(_fitted_state(a), _fitted_state(b))
+    if isinstance(a, dict):
+        return a.keys() == b.keys() and all(_equivalent(a[k], b[k]) for k in a)
+    if isinstance(a, (list, tuple)):
+        return len(a) == len(b) and all(_equivalent(x, y) for x, y in zip(a, b))
+    if isinstance(a, np.ndarray):
+        return a.shape == b.shape and np.array_equal(a, b, equal_nan=a.dtype.kind == 'f')
+    if isinstance(a, float) and np.isnan(a):
+        return bool(np.isnan(b))
+    return bool(a == b)
+
+
+def _proba_labels(model, target_enc) -> np.ndarray:
+    """
+    Target labels of the `predict_proba` columns of `model`. Models stored
+    before labels were kept as integers have float `classes_` (0.0, 1.0).
+    """
+    return target_enc.classes_[model.classes_.astype(int)]
 
 
 @utils.wrap_with_custom_exception
@@ -20,25 +58,61 @@ class ModelEvaluation(ModelEvaluationConfig):
         self,
         data_ingestion_artifact: DataIngestionArtifact,
         data_transformation_artifact: DataTransformationArtifact,
-        model_trainer_artifact: ModelTrainerArtifact
+        model_trainer_artifact: ModelTrainerArtifact,
+        model=None,
+        transformer=None,
+        target_enc=None,
     ) -> None:
         """
         Evaluate the new model with older model and store the new model;
         iff new model is better than than older one.
+
+        `model`, `transformer` and `target_enc` are the newly trained objects
+        when the pipeline still holds them; otherwise they are loaded from
+        the artifacts.
         """
+        super().__init__()
         logging.info(f"{'>>'*20}  Model Evaluation {'<<'*20}")
         self.data_ingestion_artifact = data_ingestion_artifact
         self.trf_artifact = data_transformation_artifact
         self.trainer_artifact = model_trainer_artifact
         self.stored_models = StoredModelConfig()
         self.prediction_type = PREDICTION_TYPE
-
-    def __load_stored_objects(
-        self, model_fp, transformer_fp
-    ) -> Tuple[Any, ColumnTransformer]:
-        model = utils.load_object(model_fp)
-        transformer = utils.load_object(transformer_fp)
-        return model, transformer
+        self.new_model = model
+        self.new_transformer = transformer
+        self.new_target_enc = target_enc
+
+    def _predict_proba(self, model, X) -> np.ndarray:
+        """ `model.predict_proba` over `chunk_size` rows at a time. """
+        return np.concatenate([
+            model.predict_proba(X[start:start + self.chunk_size])
+            for start in range(0, len(X), self.chunk_size)
+        ])
+
+    def _metrics(self, y_true: np.ndarray, proba: np.ndarray, labels: np.ndarray) -> dict:
+        """
+        Metrics of one model from its class probabilities; `labels` are the
+        target labels of the `proba` columns.
+        """
+        y_pred = labels[proba.argmax(axis=1)]
+        is_true, is_pred = y_true == self.positive_label, y_pred == self.positive_label
+        tp = int(np.count_nonzero(is_true & is_pred))
+        n_pred, n_true = int(np.count_nonzero(is_pred)), int(np.count_nonzero(is_true))
+
+        precision = tp / n_pred if n_pred else 0.0
+        recall = tp / n_true if n_true else 0.0
+        positive_col = np.flatnonzero(labels == self.positive_label)
+        roc_auc = (
+            float(roc_auc_score(is_true, proba[:, positive_col[0]]))
+            if len(positive_col) and 0 < n_true < len(y_true) else None
+        )
+        return {
+            'accuracy': float(np.mean(y_true == y_pred)),
+            'precision': precision,
+            'recall': recall,
+            'f1': 2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+            'roc_auc': roc_auc,
+        }
 
     def initiate(self) -> ModelEvaluationArtifact:
         # If stored model folder has model the we will compare
@@ -49,41 +123,58 @@ class ModelEvaluation(ModelEvaluationConfig):
             logging.info(artifact)
             return artifact
 
+        start = perf_counter()
         logging.info('Importing stored trained objects.')
-        model, transformer = self.__load_stored_objects(
-            self.stored_models.stored_model_path,
-            self.stored_models.stored_transformer_path,
-        )
+        stored_fps = [self.stored_models.stored_model_path,
+                      self.stored_models.stored_transformer_path,
+                      self.stored_models.stored_target_enc_path]
+        verify_stored_files(self.stored_models.latest_stored_dir, [fp.name for fp in stored_fps])
+        model = utils.load_object(self.stored_models.stored_model_path)
+        transformer = utils.load_object(self.stored_models.stored_transformer_path)
+        target_enc = utils.load_object(self.stored_models.stored_target_enc_path)
 
         logging.info('Newly trained model objects')
-        new_model, new_transformer = self.__load_stored_objects(
-            self.trainer_artifact.model_path,
-            self.trf_artifact.transformer_pkl,
-        )
-
-        # --- --- Old Model Evaluation --- --- #
-        logging.info(f"{'---'*10} Old Model Evaluation {'---'*10}")
-        test_df = utils.read_dataset(self.data_ingestion_artifact.test_path)
-        y_true = test_df[TARGET_COLUMN]
-
-        input_arr = transformer.transform(
-            test_df[transformer.get_feature_names_out()]
-        )
-        y_pred = model.predict(input_arr)
-
-        old_score = accuracy_score(y_true, y_pred)
-        logging.info('Score of old model: %s', old_score)
-
-        # --- --- New Model Evaluation --- --- #
-        logging.info(f"{'---'*10} New Model Evaluation {'---'*10}")
-        input_arr = new_transformer.transform(
-            test_df[transformer.get_feature_names_out()]
-        )
-        y_pred = new_model.predict(input_arr)
-
-        current_score = accuracy_score(y_true, y_pred)
-        logging.info('Score of current model: %s', current_score)
-
+        if self.new_model is None:
+            self.new_model = utils.load_object(self.trainer_artifact.model_path)
+        if self.new_transformer is None:
+            self.new_transformer = utils.load_object(self.trf_artifact.transformer_pkl)
+        if self.new_target_enc is None:
+            self.new_target_enc = utils.load_object(self.trf_artifact.target_enc_fp)
+
+        # The transformed test set is already on disk, as the trainer saw it
+        X_test = utils.load_array(self.trf_artifact.test_X_path, mmap_mode='r')
+        y_true = self.new_target_enc.classes_[utils.load_array(self.trf_artifact.test_y_path)]
+
+        shared_transform = _equivalent(transformer, self.new_transformer)
+        if shared_transform:
+            logging.info('Stored transformer is equivalent, reusing the transformed test set.')
+            X_old = X_test
+        else:
+            logging.info('Stored transformer differs, transforming the test set for it.')
+            columns = list(transformer.feature_names_in_)
+            test_df = utils.read_dataset(self.data_ingestion_artifact.test_path, columns=columns)
+            X_old = transformer.transform(test_df[columns])
+
+        # --- --- Old and New Model Evaluation --- --- #
+        # Probability columns follow `model.classes_`, codes of its own encoder
+        metrics = {
+            'old': self._metrics(
+                y_true, self._predict_proba(model, X_old), _proba_labels(model, target_enc)),
+            'new': self._metrics(
+                y_true, self._predict_proba(self.new_model, X_test),
+                _proba_labels(self.new_model, self.new_target_enc)),
+        }
+        elapsed = perf_counter() - start
+        logging.info('Old model: %s', metrics['old'])
+        logging.info('New model: %s', metrics['new'])
+        utils.to_yaml(self.report_fp, {
+            **metrics,
+            'shared_transform': shared_transform,
+            'n_rows': len(y_true),
+            'elapsed_sec': elapsed,
+        })
+
+        old_score, current_score = metrics['old']['accuracy'], metrics['new']['accuracy']
         if current_score <= old_score:
             error_msg = 'New trained model is not better than old model'
             logging.error(error_msg)
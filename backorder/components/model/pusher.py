@@ -1,10 +1,19 @@
 """ Model Pusher """
 
-from backorder import utils
+import os
+import shutil
+from datetime import datetime as dt
+from pathlib import Path
+
+from backorder import serialization, utils
 from backorder.entity import (DataTransformationArtifact, ModelPusherArtifact,
                               ModelPusherConfig, ModelTrainerArtifact,
                               StoredModelConfig)
 from backorder.logger import logging
+from backorder.stage_cache import file_fingerprint
+
+# Stored files that are data, not pickled objects
+_DATA_FORMATS = {'.npy': 'npy', '.parquet': 'parquet'}
 
 
 @utils.wrap_with_custom_exception
@@ -15,7 +24,16 @@ class ModelPusher(ModelPusherConfig):
         model_trainer_artifact: ModelTrainerArtifact,
     ) -> None:
         """
-        Dump the transformed models to `./stored_models` and `./artifacts/model_pusher` directory.
+        Promote the trained files to `./stored_models/<N>` and
+        `./artifacts/model_pusher` directory.
+
+        Files are hard-linked (or reflinked, or copied) as they are, never
+        unpickled. The new version is assembled in a hidden staging
+        directory with a `manifest.yaml` of checksums, renamed to
+        `stored_models/<N>` in one step, and only then registered as the
+        served version. `N` is reserved in the registry first, and the
+        directory is removed again if registering it fails. Versions beyond
+        `keep_last_versions` are removed.
         """
         super().__init__()
         logging.info(f"{'>>'*20} Model Pusher {'<<'*20}")
@@ -23,26 +41,78 @@ class ModelPusher(ModelPusherConfig):
         self.model_trainer_artifact = model_trainer_artifact
         self.stored_model_config = StoredModelConfig()
 
+    def _files_to_push(self) -> dict[str, Path]:
+        """ `{stored file name: trained file}` """
+        stored = self.stored_model_config
+        files = {
+            stored.path_to_store_model.name: self.model_trainer_artifact.model_path,
+            stored.path_to_store_transformer.name: self.data_trf_artifact.transformer_pkl,
+            stored.path_to_store_target_enc.name: self.data_trf_artifact.target_enc_fp,
+            stored.path_to_store_train_rows.name: self.model_trainer_artifact.train_rows_path,
+        }
+        if self.data_trf_artifact.canary_fp is not None:
+            files[stored.path_to_store_canary.name] = self.data_trf_artifact.canary_fp
+        return files
+
     def initiate(self) -> ModelPusherArtifact:
-        logging.info('Loading dumped models from artifacts directory.')
-        transformer = utils.load_object(self.data_trf_artifact.transformer_pkl)
-        model = utils.load_object(self.model_trainer_artifact.model_path)
-        target_enc = utils.load_object(self.data_trf_artifact.target_enc_fp)
+        files = self._files_to_push()
+
+        logging.info('Linking models to `./artifacts/model_pusher` directory.')
+        for name, src in files.items():
+            utils.link_or_copy(src, self.dir / name)
 
-        logging.info('Dumping models to `./artifacts/model_pusher` directory.')
-        utils.dump_object(self.transformer_path, transformer)
-        utils.dump_object(self.model_path, model)
-        utils.dump_object(self.target_enc_path, target_enc)
+        stored = self.stored_model_config
+        version_dir = stored.registry.version_dir(stored.registry.reserve_version())
+        staging_dir = stored.model_registry / f'.staging-{version_dir.name}-{os.getpid()}'
+        logging.info('Staging version %s in %s', version_dir.name, staging_dir)
+        shutil.rmtree(staging_dir, ignore_errors=True)
 
-        logging.info('Dumping models to `./stored_models` directory.')
-        model_path = self.stored_model_config.path_to_store_model
-        transformer_path = self.stored_model_config.path_to_store_transformer
-        target_enc_path = self.stored_model_config.path_to_store_target_enc
+        manifest = {
+            'version': int(version_dir.name),
+            'created': dt.now().isoformat(timespec='seconds'),
+            'files': {},
+        }
+        for name, src in files.items():
+            method = utils.link_or_copy(src, staging_dir / name)
+            manifest['files'][name] = {
+                'sha256': file_fingerprint(src),
+                'bytes': src.stat().st_size,
+                'format': (_DATA_FORMATS.get(src.suffix)
+                           or serialization.detect_format(src)),
+                'method': method,
+            }
+        # Written last: a version directory with a manifest is complete
+        utils.to_yaml(staging_dir / stored.path_to_store_manifest.name, manifest)
 
-        utils.dump_object(transformer_path, transformer)
-        utils.dump_object(model_path, model)
-        utils.dump_object(target_enc_path, target_enc)
+        logging.info('Publishing %s and making it current.', version_dir)
+        os.rename(staging_dir, version_dir)
+        try:
+            self._register(manifest)
+        except Exception:
+            # Unregistered, the directory is not served and only wastes space
+            logging.exception('Registering %s failed, removing it.', version_dir)
+            shutil.rmtree(version_dir, ignore_errors=True)
+            raise
+        stored.registry.gc(self.keep_last_versions)
 
         artifact = ModelPusherArtifact(self.dir, self.root_stored_model_dir)
         logging.info(artifact)
         return artifact
+
+    def _register(self, manifest: dict) -> None:
+        stored = self.stored_model_config
+        metrics = {
+            'train_score': float(self.model_trainer_artifact.r2_train_score),
+            'test_score': float(self.model_trainer_artifact.r2_test_score),
+        }
+        if self.model_trainer_artifact.full_fit_sec_per_row is not None:
+            # Lets incremental retraining report its speedup without a full fit
+            metrics['full_fit_sec_per_row'] = self.model_trainer_artifact.full_fit_sec_per_row
+        stored.registry.add(
+            manifest['version'],
+            files=manifest['files'],
+            metrics=metrics,
+            # Hashes of the training rows identify the data the model saw
+            data_fingerprint=manifest['files'][stored.path_to_store_train_rows.name]['sha256'],
+            created=manifest['created'],
+        )
@@ -1,13 +1,29 @@
 """ Train models and store it. """
 
+import math
+import warnings
+from time import perf_counter
+
+import numpy as np
 from sklearn.ensemble import RandomForestClassifier
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
 from sklearn.metrics import accuracy_score
+from sklearn.model_selection import HalvingRandomSearchCV
 
 from backorder import utils
+from backorder.components.data import sampling
 from backorder.config import PREDICTION_TYPE
-from backorder.entity import (DataTransformationConfig, ModelTrainerArtifact,
-                              ModelTrainerConfig)
+from backorder.entity import (DataTransformationArtifact,
+                              DataTransformationConfig, ModelTrainerArtifact,
+                              ModelTrainerConfig, StoredModelConfig)
 from backorder.logger import logging
+from backorder.model_registry import verify_stored_files
+from backorder.stage_cache import code_fingerprint, file_fingerprint
+
+
+def _accuracy(estimator, X, y) -> float:
+    """ Unweighted accuracy, the metric `ModelTrainer._evaluate` checks. """
+    return accuracy_score(y, estimator.predict(X))
 
 
 @utils.wrap_with_custom_exception
@@ -17,28 +33,102 @@ class ModelTrainer(ModelTrainerConfig):
 
         super().__init__()
         self.data_trf_config = DataTransformationConfig()
+        # Model of the last `initiate`, handed on to `ModelEvaluation`
+        self.model = None
         self.prediction_type = PREDICTION_TYPE
 
         logging.info(f"{'>>'*20} Model Trainer {'<<'*20}")
         logging.info('Prediction type: %s', self.prediction_type)
 
-    def _get_train_test_data(self):
-        logging.info('Loading train and test array.')
-        train_arr = utils.load_array(self.data_trf_config.train_npz_path)
-        test_arr = utils.load_array(self.data_trf_config.test_npz_path)
-
-        logging.info('Splitting into X and y from train and test array.')
-        X_train, y_train = train_arr[:, :-1], train_arr[:, -1]
-        X_test, y_test = test_arr[:, :-1], test_arr[:, -1]
+    def _get_train_test_data(
+        self,
+        data_transformation_artifact: DataTransformationArtifact | None = None,
+    ):
+        logging.info('Memory-mapping train and test arrays.')
+        config = data_transformation_artifact or self.data_trf_config
+        X_train = utils.load_array(config.train_X_path, mmap_mode='r')
+        y_train = utils.load_array(config.train_y_path, mmap_mode='r')
+        X_test = utils.load_array(config.test_X_path, mmap_mode='r')
+        y_test = utils.load_array(config.test_y_path, mmap_mode='r')
 
         return X_train, X_test, y_train, y_test
 
-    def _fine_tune(self):
-        ...
+    def _fine_tune(self, X_train, y_train, sample_weight=None) -> RandomForestClassifier:
+        """
+        Successive halving random search over `search_space`.
+
+        Every candidate starts on a small subset of the training rows and
+        only the best `1 / search_factor` move on to `search_factor` times
+        more rows. Candidates and CV folds run in parallel on `n_jobs`
+        cores, each forest on one core.
+
+        Returns
+        -------
+        Forest with the best hyperparameters, fitted on all rows on `n_jobs`
+        cores. Accuracy and wall-clock of every candidate are written to
+        `search_report_fp`.
+        """
+        # Size the first round so that the last one trains on all rows
+        n_iterations = math.ceil(math.log(self.search_n_candidates, self.search_factor))
+        min_resources = max(len(y_train) // self.search_factor ** max(n_iterations - 1, 0), 1)
+
+        search = HalvingRandomSearchCV(
+            RandomForestClassifier(n_jobs=1, random_state=self.search_random_state),
+            self.search_space,
+            n_candidates=self.search_n_candidates,
+            factor=self.search_factor,
+            min_resources=min_resources,
+            cv=self.search_cv,
+            scoring=_accuracy,
+            refit=False,
+            n_jobs=self.n_jobs,
+            random_state=self.search_random_state,
+        )
+        logging.info('Searching %s candidates on %s cores', self.search_n_candidates, self.n_jobs)
+        start = perf_counter()
+        with warnings.catch_warnings():
+            # Intended: `sample_weight` rebalances fitting, not scoring
+            warnings.filterwarnings('ignore', message='The scoring .* does not support sample_weight')
+            search.fit(X_train, y_train, sample_weight=sample_weight)
+        elapsed = perf_counter() - start
+
+        results = search.cv_results_
+        candidates = [
+            {
+                'iteration': int(results['iter'][i]),
+                'n_samples': int(results['n_resources'][i]),
+                'params': results['params'][i],
+                'accuracy': float(results['mean_test_score'][i]),
+                'fit_sec': float(results['mean_fit_time'][i]),
+                'score_sec': float(results['mean_score_time'][i]),
+            }
+            for i in range(len(results['params']))
+        ]
+        utils.to_yaml(self.search_report_fp, {
+            'search_sec': elapsed,
+            'n_jobs': self.n_jobs,
+            'best_params': dict(search.best_params_),
+            'best_accuracy': float(search.best_score_),
+            'candidates': candidates,
+        })
+        logging.info('Search took %.1fs, best params %s with accuracy %.4f',
+                     elapsed, search.best_params_, search.best_score_)
+
+        # Refitted here rather than by the search, which would use one core
+        model = RandomForestClassifier(
+            n_jobs=self.n_jobs, random_state=self.search_random_state, **search.best_params_)
+        return model.fit(X_train, y_train, sample_weight=sample_weight)
+
+    def _predict(self, model, X):
+        """ `model.predict` over `chunk_size` rows at a time of a memory-mapped `X`. """
+        return np.concatenate([
+            model.predict(X[start:start + self.chunk_size])
+            for start in range(0, len(X), self.chunk_size)
+        ])
 
     def _evaluate(self, model, X_train, X_test, y_train, y_test):
-        y_hat_train = model.predict(X_train)
-        y_hat_test = model.predict(X_test)
+        y_hat_train = self._predict(model, X_train)
+        y_hat_test = self._predict(model, X_test)
 
         train_score = accuracy_score(y_train, y_hat_train)
         test_score = accuracy_score(y_test, y_hat_test)
@@ -65,12 +155,201 @@ class ModelTrainer(ModelTrainerConfig):
             logging.error(error_msg)
             raise ValueError(error_msg)
 
-    def initiate(self) -> ModelTrainerArtifact:
-        X_train, X_test, y_train, y_test = self._get_train_test_data()
+    def fingerprint(self, data_transformation_artifact: DataTransformationArtifact) -> dict:
+        """ Inputs the trained model depends on, used as `StageCache` key. """
+        artifact = data_transformation_artifact
+        stored = StoredModelConfig()
+        return {
+            'arrays': [
+                file_fingerprint(fp) for fp in [
+                    artifact.train_X_path, artifact.train_y_path,
+                    artifact.test_X_path, artifact.test_y_path,
+                ]
+            ],
+            'expected_score': self.expected_score,
+            'overfitting_threshold': self.overfitting_threshold,
+            'sampling': self.sampling,
+            'fine_tune': self.fine_tune,
+            'search': [self.search_space, self.search_n_candidates,
+                       self.search_factor, self.search_cv, self.search_random_state],
+            'retrain_mode': self.retrain_mode,
+            'stored_model': (
+                [file_fingerprint(stored.stored_model_path),
+                 file_fingerprint(stored.stored_train_rows_path)]
+                if self.retrain_mode == 'incremental' and stored.latest_stored_dir is not None
+                and stored.stored_train_rows_path.exists()
+                else None
+            ),
+            'incremental': [self.incremental_add_fraction, self.incremental_refresh_fraction],
+            'out_of_core': [self.out_of_core, self.chunk_size, self.out_of_core_n_estimators],
+            'code': [code_fingerprint(self), code_fingerprint(sampling)],
+        }
+
+    def _fit_out_of_core(self, X_train, y_train, sample_weight) -> RandomForestClassifier:
+        """
+        Forest whose members are each fitted on one `chunk_size` row chunk,
+        so at most one chunk of `X_train` is in memory at a time. The members'
+        trees are merged into a single `RandomForestClassifier`.
+
+        The training rows were shuffled by `DataIngestion.split_data`, so
+        every chunk is a random sample; chunks missing a class are skipped.
+        """
+        classes = np.unique(y_train)
+        n_chunks = math.ceil(len(y_train) / self.chunk_size)
+        n_trees = max(math.ceil(self.out_of_core_n_estimators / n_chunks), 1)
+
+        params = {}
+        if self.fine_tune:
+            first = slice(0, self.chunk_size)
+            tuned = self._fine_tune(
+                np.asarray(X_train[first]), np.asarray(y_train[first]),
+                None if sample_weight is None else sample_weight[first])
+            params = {name: tuned.get_params()[name] for name in self.search_space}
+        params['n_estimators'] = n_trees
+        logging.info('Fitting %s trees on each of %s chunks with %s', n_trees, n_chunks, params)
+
+        model = None
+        for start in range(0, len(y_train), self.chunk_size):
+            chunk = slice(start, start + self.chunk_size)
+            y_chunk = np.asarray(y_train[chunk])
+            if not np.array_equal(np.unique(y_chunk), classes):
+                logging.info('Skipping chunk at row %s, it lacks a class', start)
+                continue
+            member = RandomForestClassifier(n_jobs=self.n_jobs, **params).fit(
+                np.asarray(X_train[chunk]), y_chunk,
+                sample_weight=None if sample_weight is None else sample_weight[chunk])
+            if model is None:
+                model = member
+            else:
+                model.estimators_ += member.estimators_
+        if model is None:
+            raise ValueError('Every chunk lacks a class, increase `chunk_size`.')
+        model.n_estimators = len(model.estimators_)
+        return model
+
+    def _grow_stored_model(self, model, X, y):
+        """
+        Replace the oldest `incremental_refresh_fraction` of the trees of
+        `model` and add `incremental_add_fraction` more, fitting only the
+        new trees on `X`, `y` with `warm_start`.
+        """
+        n_trees = len(model.estimators_)
+        n_refresh = int(n_trees * self.incremental_refresh_fraction)
+        n_add = int(n_trees * self.incremental_add_fraction)
+        logging.info('Growing %s trees on %s rows, replacing %s of %s stored trees',
+                     n_add + n_refresh, len(y), n_refresh, n_trees)
+
+        model.estimators_ = model.estimators_[n_refresh:]
+        model.set_params(warm_start=True, n_estimators=n_trees + n_add, n_jobs=self.n_jobs)
+        model.fit(X, y, sample_weight=sampling.get_sample_weight(y, self.sampling))
+        model.set_params(warm_start=False)
+        return model
+
+    def _incremental_fit(
+        self, X_train, X_test, y_train, y_test, train_rows, transformer_pkl,
+    ) -> RandomForestClassifier | None:
+        """
+        Grow the latest stored model on the training rows it has not seen.
+
+        Returns `None` if that is not possible, i.e. there is no stored model,
+        the transformer was refitted or the new rows lack a class.
+        """
+        stored = StoredModelConfig()
+        if stored.latest_stored_dir is None or not stored.stored_train_rows_path.exists():
+            logging.info('No stored model to grow, training from scratch.')
+            return None
+        if file_fingerprint(transformer_pkl) != file_fingerprint(stored.stored_transformer_path):
+            logging.info('Transformer changed since the stored model, training from scratch.')
+            return None
+
+        verify_stored_files(stored.latest_stored_dir, [stored.stored_model_path.name])
+        model = utils.load_object(stored.stored_model_path)
+        is_new = ~np.isin(train_rows, utils.load_array(stored.stored_train_rows_path))
+        y_new = y_train[is_new]
+        if not np.array_equal(np.unique(y_new), model.classes_):
+            logging.info('New rows do not cover every class, training from scratch.')
+            return None
+
+        n_trees_before = len(model.estimators_)
+        full_params = model.get_params()
+        stored_accuracy = _accuracy(model, X_test, y_test)
+        start = perf_counter()
+        model = self._grow_stored_model(model, X_train[is_new], y_new)
+        incremental_sec = perf_counter() - start
+        incremental_accuracy = _accuracy(model, X_test, y_test)
+
+        report = {
+            'n_train_rows': len(y_train),
+            'n_new_rows': int(is_new.sum()),
+            'n_trees_before': n_trees_before,
+            'n_trees': len(model.estimators_),
+            'incremental_sec': incremental_sec,
+            'incremental_accuracy': incremental_accuracy,
+            # The stored model before growing it, on the same test rows
+            'stored_accuracy': stored_accuracy,
+            'accuracy_gain': incremental_accuracy - stored_accuracy,
+        }
+        # Cost of training from scratch, from the last fit that did
+        sec_per_row = ModelTrainer._stored_full_fit_sec_per_row(stored)
+        if sec_per_row is not None:
+            report['estimated_full_sec'] = sec_per_row * len(y_train)
+            report['estimated_speedup'] = report['estimated_full_sec'] / incremental_sec
+        if self.incremental_compare_full:
+            start = perf_counter()
+            full_model = RandomForestClassifier(**full_params).fit(
+                X_train, y_train, sample_weight=sampling.get_sample_weight(y_train, self.sampling))
+            report['full_sec'] = perf_counter() - start
+            report['full_accuracy'] = _accuracy(full_model, X_test, y_test)
+            report['speedup'] = report['full_sec'] / incremental_sec
+            report['accuracy_diff'] = incremental_accuracy - report['full_accuracy']
+        utils.to_yaml(self.incremental_report_fp, report)
+        logging.info('Incremental retraining: %s', report)
+        return model
+
+    @staticmethod
+    def _stored_full_fit_sec_per_row(stored: StoredModelConfig) -> float | None:
+        """ Seconds per row of the last training from scratch, as recorded by `ModelPusher`. """
+        record = stored.registry.get(stored.registry.current_version())
+        return None if record is None else record['metrics'].get('full_fit_sec_per_row')
+
+    def initiate(
+        self,
+        data_transformation_artifact: DataTransformationArtifact | None = None,
+    ) -> ModelTrainerArtifact:
+        X_train, X_test, y_train, y_test = self._get_train_test_data(
+            data_transformation_artifact)
+        train_rows = utils.row_hashes(X_train, y_train)
+
+        model = None
+        if self.retrain_mode == 'incremental':
+            transformer_pkl = (
+                self.data_trf_config.transformer_pkl_fp if data_transformation_artifact is None
+                else data_transformation_artifact.transformer_pkl
+            )
+            model = self._incremental_fit(
+                X_train, X_test, y_train, y_test, train_rows, transformer_pkl)
+
+        if model is None:
+            start = perf_counter()
+            # Rebalancing is applied as weights, no row is copied
+            logging.info('Class rebalancing: %s', self.sampling)
+            sample_weight = sampling.get_sample_weight(y_train, self.sampling)
 
-        logging.info('Train the model')
-        model = RandomForestClassifier()
-        model.fit(X_train, y_train)
+            if self.out_of_core:
+                model = self._fit_out_of_core(X_train, y_train, sample_weight)
+            else:
+                if self.fine_tune:
+                    model = self._fine_tune(X_train, y_train, sample_weight)
+                else:
+                    logging.info('Train the model with default parameters')
+                    model = RandomForestClassifier(n_jobs=self.n_jobs)
+                    model.fit(X_train, y_train, sample_weight=sample_weight)
+            full_fit_sec_per_row = (perf_counter() - start) / len(y_train)
+        else:
+            # Remember every row any of the trees was trained on
+            stored = StoredModelConfig()
+            train_rows = np.union1d(train_rows, utils.load_array(stored.stored_train_rows_path))
+            full_fit_sec_per_row = ModelTrainer._stored_full_fit_sec_per_row(stored)
 
         train_score, test_score = self._evaluate(
             model, X_train, X_test, y_train, y_test
@@ -79,9 +358,12 @@ class ModelTrainer(ModelTrainerConfig):
 
         logging.info('Dumping trained model object.')
         utils.dump_object(self.model_path, model)
+        utils.dump_array(self.train_rows_path, train_rows)
+        self.model = model
 
         artifact = ModelTrainerArtifact(
-            self.model_path, train_score, test_score    # type: ignore
+            self.model_path, train_score, test_score, self.train_rows_path,    # type: ignore
+            full_fit_sec_per_row,
         )
         logging.info(f'Model trainer artifact: {artifact}')
         return artifact
@@ -5,6 +5,18 @@ from pathlib import Path
 from typing import Literal
 
 STORED_MODEL_PATH = Path('stored_models')
+# Index of the stored versions inside `STORED_MODEL_PATH`
+REGISTRY_DB_NAME = 'registry.db'
+# Checksums of the files of a stored version, inside its directory
+MANIFEST_NAME = 'manifest.yaml'
+PREDICTION_DIR = Path('prediction')
+STAGE_CACHE_PATH = Path('artifacts', 'stage_cache')
 PREDICTION_TYPE: Literal['regression', 'classification'] = 'classification'
+PREDICTION_ENGINE: Literal['sklearn', 'compiled'] = 'sklearn'
+RETRAIN_MODE: Literal['full', 'incremental'] = 'full'
+# Format of pickled artifacts; any format (and old dill files) can be loaded
+SERIALIZATION_FORMAT: Literal['dill', 'joblib', 'pickle5'] = 'pickle5'
+# zlib level of the 'joblib' format
+SERIALIZATION_COMPRESS = 3
 BASE_DATA_NAME = 'raw_data.csv'
 TARGET_COLUMN = 'went_on_backorder'
@@ -1,8 +1,11 @@
 from .artifact_entity import (DataIngestionArtifact,
                               DataTransformationArtifact,
                               DataValidationArtifact, ModelEvaluationArtifact,
-                              ModelPusherArtifact, ModelTrainerArtifact)
+                              ModelPusherArtifact, ModelTrainerArtifact,
+                              StreamPredictionArtifact)
 from .config_entity import (DataIngestionConfig, DataTransformationConfig,
                             DataValidationConfig, ModelEvaluationConfig,
-                            ModelPusherConfig, ModelTrainerConfig)
-from .stored_model_entity import StoredModelConfig
+                            ModelPusherConfig, ModelTrainerConfig,
+                            PredictionConfig, TrainingJobConfig,
+                            TrainingPipelineConfig)
+from .stored_model_entity import StoredModelBundle, StoredModelConfig
@@ -20,8 +20,12 @@ class DataValidationArtifact(DataIngestionArtifact):
 class DataTransformationArtifact:
     transformer_pkl: Path
     target_enc_fp: Path
-    train_npz_path: Path
-    test_npz_path: Path
+    train_X_path: Path
+    train_y_path: Path
+    test_X_path: Path
+    test_y_path: Path
+    # Raw test rows a serving process scores before swapping in a new model
+    canary_fp: Path | None = None
 
 
 @dataclass
@@ -29,6 +33,9 @@ class ModelTrainerArtifact:
     model_path: Path
     r2_train_score: float
     r2_test_score: float
+    train_rows_path: Path
+    # Of the last training from scratch, carried over by incremental ones
+    full_fit_sec_per_row: float | None = None
 
 
 @dataclass
@@ -41,3 +48,15 @@ class ModelEvaluationArtifact:
 class ModelPusherArtifact:
     self_dir: Path
     root_saved_model_dir: Path
+
+
+@dataclass
+class StreamPredictionArtifact:
+    prediction_fp: Path
+    n_rows: int
+    n_chunks: int
+    elapsed_sec: float
+    rows_per_sec: float
+    # Of this call ('call') where the peak could be reset, else of the process
+    peak_rss_mb: float | None
+    peak_rss_scope: str = 'process'
@@ -1,13 +1,28 @@
+import os
 from datetime import datetime as dt
 from pathlib import Path
 
-from backorder.config import BASE_DATA_NAME, STORED_MODEL_PATH
+from backorder.config import (BASE_DATA_NAME, PREDICTION_DIR,
+                              PREDICTION_ENGINE, RETRAIN_MODE,
+                              STORED_MODEL_PATH)
 
 
 class TrainingPipelineConfig:
     def __init__(self):
         self.root = Path.cwd()
         self.artifact_dir = Path('artifacts', dt.now().strftime('%m%d%y__%H'))
+        # 'incremental' reuses the stored transformer and grows the stored
+        # forest on new rows instead of fitting everything from scratch
+        self.retrain_mode = RETRAIN_MODE
+        # Out-of-core training: the transformer is fitted from statistics of
+        # `chunk_size` row chunks and every forest member sees one chunk
+        self.out_of_core = False
+        self.chunk_size = 500_000
+        # Time, memory and I/O of every stage, see `backorder.profiler`
+        self.profile_report_fp = self.artifact_dir / 'profile_report.yaml'
+        # Opt in to a cProfile dump per stage in `cprofile_dir/<stage>.prof`
+        self.cprofile_stages = False
+        self.cprofile_dir = self.artifact_dir / 'cprofile'
         self.__create_all_dirs()
 
     def __create_all_dirs(self):
@@ -48,6 +63,13 @@ class DataIngestionConfig(TrainingPipelineConfig):
             'stop_auto_buy',
             'rev_stop',
         ]
+        # Optional row filters pushed down to the file scan, in pyarrow's
+        # DNF format, e.g. [('lead_time', '<', 52)]
+        self.row_filters: list | None = None
+        # Flags as category and numerics as float32 where lossless, see
+        # `utils.downcast_dtypes`; memory per step goes to `memory_report_fp`
+        self.downcast_dtypes = True
+        self.memory_report_fp = self.dir / 'memory_report.yaml'
         self.__create_all_dirs()
 
     def __create_all_dirs(self):
@@ -63,6 +85,11 @@ class DataValidationConfig(DataIngestionConfig):
         self.dir = self.artifact_dir / 'data_validation'
         self.report_fp = self.dir / 'report.yaml'
         self.missing_threshold = 0.2
+        # Data drift: columns are tested in parallel and samples with more
+        # than `drift_approx_rows` rows are compared through quantile sketches
+        self.drift_n_jobs = os.cpu_count()
+        self.drift_approx_rows = 5_000_000
+        self.drift_sketch_size = 10_000
         self.__create_all_dirs()
 
     def __create_all_dirs(self):
@@ -75,13 +102,22 @@ class DataTransformationConfig(DataIngestionConfig):
         self.dir = self.artifact_dir / 'data_transformation'
         self.transformer_pkl_fp = self.dir / 'transformer.pkl'
         self.target_enc_fp = self.dir / 'target_encoder.pkl'
-        self.train_npz_path = self.dir / 'transformed' / 'train.npz'
-        self.test_npz_path = self.dir / 'transformed' / 'test.npz'
+        # Features and labels are stored as separate `.npy` files so they
+        # can be memory-mapped without slicing a combined array.
+        self.train_X_path = self.dir / 'transformed' / 'train_X.npy'
+        self.train_y_path = self.dir / 'transformed' / 'train_y.npy'
+        self.test_X_path = self.dir / 'transformed' / 'test_X.npy'
+        self.test_y_path = self.dir / 'transformed' / 'test_y.npy'
+        # RandomForest casts its input to float32, so storing float32 is lossless
+        self.transformed_dtype = 'float32'
+        # Test rows shipped with the model to validate it before serving
+        self.canary_fp = self.dir / 'canary.parquet'
+        self.canary_rows = 256
         self.__create_all_dirs()
 
     def __create_all_dirs(self):
         self.dir.mkdir(exist_ok=True)
-        self.train_npz_path.parent.mkdir(parents=True, exist_ok=True)
+        self.train_X_path.parent.mkdir(parents=True, exist_ok=True)
 
 
 class ModelTrainerConfig(TrainingPipelineConfig):
@@ -91,15 +127,58 @@ class ModelTrainerConfig(TrainingPipelineConfig):
         self.model_path = self.dir / 'model.pkl'
         self.expected_score = 0.7
         self.overfitting_threshold = 0.3
+        # Class rebalancing, applied as `sample_weight` when fitting:
+        # 'upsample', 'class_weight' or 'none'
+        self.sampling = 'upsample'
+        # Cores training may use; respects the CPU affinity of the process
+        self.n_jobs = (len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity')
+                       else os.cpu_count())
+        # Opt-in successive halving search over forest hyperparameters, seeded
+        # by `search_random_state` so that runs are reproducible
+        self.fine_tune = False
+        self.search_space = {
+            'n_estimators': [50, 100, 200],
+            'max_depth': [None, 10, 20, 40],
+            'min_samples_leaf': [1, 2, 5, 10],
+            'max_features': ['sqrt', 'log2', 0.5],
+        }
+        self.search_n_candidates = 24
+        self.search_factor = 3
+        self.search_cv = 3
+        self.search_random_state = 42
+        self.search_report_fp = self.dir / 'search_report.yaml'
+        # Hashes of every (features, label) row the model was trained on
+        self.train_rows_path = self.dir / 'train_rows.npy'
+        # Incremental retraining: grow `incremental_add_fraction` more trees
+        # and replace the oldest `incremental_refresh_fraction` of the trees,
+        # all fitted on rows the stored model has not seen
+        self.incremental_add_fraction = 0.2
+        self.incremental_refresh_fraction = 0.0
+        # The incremental report always compares with the stored model and
+        # estimates the speedup from the last full fit's time per row. Opt in
+        # to measure both against an actual full fit, which costs one.
+        self.incremental_compare_full = False
+        self.incremental_report_fp = self.dir / 'incremental_report.yaml'
+        # Total trees of the out-of-core ensemble, spread over the chunks
+        self.out_of_core_n_estimators = 100
         self.__create_all_dirs()
 
     def __create_all_dirs(self):
         self.dir.mkdir(exist_ok=True)
 
 
-class ModelEvaluationConfig:
+class ModelEvaluationConfig(TrainingPipelineConfig):
     def __init__(self):
+        super().__init__()
+        self.dir = self.artifact_dir / 'model_evaluation'
         self.change_threshold = 0.01
+        # Class precision, recall and ROC-AUC are computed for
+        self.positive_label = 'Yes'
+        self.report_fp = self.dir / 'evaluation_report.yaml'
+        self.__create_all_dirs()
+
+    def __create_all_dirs(self):
+        self.dir.mkdir(exist_ok=True)
 
 
 class ModelPusherConfig(TrainingPipelineConfig):
@@ -111,7 +190,47 @@ class ModelPusherConfig(TrainingPipelineConfig):
         self.target_enc_path = self.dir / 'target_encoder.pkl'
         # Store the latest models and datasets at root directory
         self.root_stored_model_dir = STORED_MODEL_PATH
+        # Stored versions kept after a push, besides the served one
+        self.keep_last_versions = 10
         self.__create_all_dirs()
 
     def __create_all_dirs(self):
         self.dir.mkdir(exist_ok=True)
+
+
+class PredictionConfig:
+    def __init__(self):
+        self.dir = PREDICTION_DIR
+        self.predicted_csv_fp = self.dir / 'prediction.csv'
+        # Rows per chunk when streaming files larger than memory
+        self.chunk_size = 100_000
+        # Process pool used by `Prediction.parallel_prediction`
+        self.n_workers = os.cpu_count() or 1
+        self.shard_size = 100_000
+        # Either sklearn's `model.predict` or the array based `CompiledForest`
+        self.engine = PREDICTION_ENGINE
+        # Request coalescing in front of `Prediction.fast_predictions`
+        self.max_batch_size = 64
+        self.batch_window_ms = 2.0
+        # Hot swap: seconds between registry checks of the serving process,
+        # the largest canary accuracy drop a new version may show and the
+        # scheduling priority of the thread loading it
+        self.model_poll_sec = 1.0
+        self.canary_max_accuracy_drop = 0.05
+        self.model_watcher_nice = 10
+        self.__create_all_dirs()
+
+    def __create_all_dirs(self):
+        self.dir.mkdir(exist_ok=True)
+
+
+class TrainingJobConfig:
+    def __init__(self):
+        # Cores the background training process may use; the rest keep serving
+        self.cpu_limit = max(1, (os.cpu_count() or 1) - 1)
+        # Lower scheduling priority of the training process
+        self.nice = 10
+        # Training requests allowed to wait behind the running one
+        self.max_queue = 1
+        # Return the waiting job instead of queueing an identical one
+        self.dedupe = True
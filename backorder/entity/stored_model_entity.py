@@ -1,30 +1,24 @@
 """ Stored Model entity to track recently stored trained model. """
 
-from pathlib import Path
+from dataclasses import dataclass, field
+from typing import Any
 
-from backorder.config import STORED_MODEL_PATH
+from backorder.config import MANIFEST_NAME, STORED_MODEL_PATH
 from backorder.logger import logging
+from backorder.model_registry import ModelRegistry
 
 
 class StoredModelConfig:
     def __init__(self) -> None:
         self.model_registry = STORED_MODEL_PATH
-        self.model_registry.mkdir(exist_ok=True)
+        # Versions are looked up in the registry index, not by listing the directory
+        self.registry = ModelRegistry(self.model_registry)
+        self.latest_stored_dir = self.registry.current_dir()
+        self.new_dir_to_store_models = self.registry.version_dir(self.registry.next_version())
 
-        self.latest_stored_dir = self.__get_latest_stored_dir_path()
-        self.new_dir_to_store_models = self.__get_new_dir_path_to_store()
-
-    def __get_latest_stored_dir_path(self) -> Path | None:
-        dir_names = [int(i.name) for i in self.model_registry.iterdir()]
-        if len(dir_names) == 0:
-            return None
-        return self.model_registry / str(max(dir_names))
-
-    def __get_new_dir_path_to_store(self) -> Path:
-        if self.latest_stored_dir == None:
-            return self.model_registry / str(0)
-        latest_dir_number = int(self.latest_stored_dir.name) + 1
-        return self.model_registry / str(latest_dir_number)
+    @property
+    def stored_versions(self) -> list[int]:
+        return self.registry.versions()
 
     @property
     def stored_model_path(self):
@@ -50,6 +44,22 @@ class StoredModelConfig:
             raise FileNotFoundError(error_msg)
         return self.latest_stored_dir / 'target_encoder.pkl'
 
+    @property
+    def stored_train_rows_path(self):
+        if self.latest_stored_dir is None:
+            error_msg = 'Training rows are not available.'
+            logging.error(error_msg)
+            raise FileNotFoundError(error_msg)
+        return self.latest_stored_dir / 'train_rows.npy'
+
+    @property
+    def stored_canary_path(self):
+        if self.latest_stored_dir is None:
+            error_msg = 'Canary rows are not available.'
+            logging.error(error_msg)
+            raise FileNotFoundError(error_msg)
+        return self.latest_stored_dir / 'canary.parquet'
+
     @property
     def path_to_store_model(self):
         return self.new_dir_to_store_models / 'model.pkl'
@@ -61,3 +71,38 @@ class StoredModelConfig:
     @property
     def path_to_store_target_enc(self):
         return self.new_dir_to_store_models / 'target_encoder.pkl'
+
+    @property
+    def path_to_store_train_rows(self):
+        return self.new_dir_to_store_models / 'train_rows.npy'
+
+    @property
+    def path_to_store_canary(self):
+        return self.new_dir_to_store_models / 'canary.parquet'
+
+    @property
+    def path_to_store_manifest(self):
+        return self.new_dir_to_store_models / MANIFEST_NAME
+
+
+@dataclass
+class StoredModelBundle:
+    """ Deserialized objects of a single `stored_models/<N>` directory. """
+    version: int
+    model: Any
+    transformer: Any
+    target_enc: Any
+    compiled_model: Any = field(default=None, repr=False)
+    row_scorer: Any = field(default=None, repr=False)
+
+    def get_predictor(self, engine: str = 'sklearn'):
+        """ Object whose `predict` is used for the requested `engine`. """
+        if engine == 'sklearn':
+            return self.model
+        if engine == 'compiled':
+            if self.compiled_model is None:
+                from backorder.components.model.compiled_forest import \
+                    CompiledForest
+                self.compiled_model = CompiledForest(self.model)
+            return self.compiled_model
+        raise ValueError(f'Unknown prediction engine: {engine!r}')
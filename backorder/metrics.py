@@ -0,0 +1,270 @@
+""" In-process counters and histograms exposed in Prometheus text format. """
+
+import math
+from bisect import bisect_left
+from contextlib import contextmanager
+from threading import Lock
+from time import perf_counter
+from typing import Callable
+
+# Seconds, from single compiled rows to large batch files
+LATENCY_BUCKETS = (
+    5e-05, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+    0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+ROW_BUCKETS = tuple(4.0**i for i in range(11))  # 1 ... ~1M rows
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names: tuple, values: tuple, extra: tuple = ()) -> str:
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value: float | None) -> str:
+    if value is None:
+        return 'NaN'
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value))
+
+
+class _Value:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self, lock: Lock) -> None:
+        self.value = 0.0
+        self._lock = lock
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class _Buckets:
+    __slots__ = ('bounds', 'counts', 'sum', '_lock')
+
+    def __init__(self, lock: Lock, bounds: tuple) -> None:
+        self.bounds = bounds
+        # Non-cumulative per bucket, the last one is +Inf
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self._lock = lock
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self._record(value)
+
+    def _record(self, value: float) -> None:
+        """ `observe` for callers already holding the metric's lock. """
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    @contextmanager
+    def time(self):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(perf_counter() - start)
+
+
+class _Metric:
+    type = ''
+
+    def __init__(self, name: str, help: str, labelnames: tuple = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children: dict[tuple, object] = {}
+        self._function: Callable[[], float | None] | None = None
+        self._lock = Lock()
+
+    def _new_child(self):
+        return _Value(self._lock)
+
+    def labels(self, *values):
+        """ Child metric of one combination of label values, created once. """
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f'{self.name} expects labels {self.labelnames}')
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def set_function(self, function: Callable[[], float | None]) -> None:
+        """ Read the value from `function` at scrape time (unlabelled metrics). """
+        self._function = function
+
+    def _samples(self) -> list[str]:
+        if self._function is not None:
+            return [f'{self.name} {_number(self._function())}']
+        return [
+            f'{self.name}{_labels(self.labelnames, values)} {_number(child.value)}'
+            for values, child in list(self._children.items())
+        ]
+
+    def render(self) -> list[str]:
+        return [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.type}',
+                *self._samples()]
+
+
+class Counter(_Metric):
+    type = 'counter'
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+
+class Gauge(_Metric):
+    type = 'gauge'
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+
+class Histogram(_Metric):
+    type = 'histogram'
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (),
+                 buckets: tuple = LATENCY_BUCKETS) -> None:
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _Buckets(self._lock, self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+    def _samples(self) -> list[str]:
+        lines = []
+        for values, child in list(self._children.items()):
+            with self._lock:
+                counts, total = list(child.counts), child.sum
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), counts):
+                cumulative += count
+                le = _labels(self.labelnames, values, (('le', _number(bound)),))
+                lines.append(f'{self.name}_bucket{le} {cumulative}')
+            labels = _labels(self.labelnames, values)
+            lines.append(f'{self.name}_sum{labels} {_number(total)}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        """
+        Metrics of this process, rendered on scrape in the Prometheus text
+        exposition format. Recording costs a dict lookup, a `bisect` and a
+        lock; formatting only happens in `render`.
+        """
+        self._metrics: dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f'Metric {metric.name} is already registered')
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: tuple = ()) -> Counter:
+        return self._register(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: tuple = ()) -> Gauge:
+        return self._register(Gauge(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: tuple = (),
+                  buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+# --- --- Prediction serving --- --- #
+# Call rate per entry point is `backorder_prediction_seconds_count`. The
+# `/one_prediction` routes record method="one_prediction" per request, queue
+# wait included; method="fast_predictions" counts the batches they coalesce.
+PREDICTION_SECONDS = registry.histogram(
+    'backorder_prediction_seconds', 'End to end latency by entry point.', ('method',))
+PREDICTION_ERRORS = registry.counter(
+    'backorder_prediction_errors_total', 'Prediction calls that raised.', ('method',))
+PREDICTION_ROWS = registry.histogram(
+    'backorder_prediction_rows', 'Rows scored per call.', ('method',), ROW_BUCKETS)
+PHASE_SECONDS = registry.histogram(
+    'backorder_prediction_phase_seconds',
+    'Latency of transform, predict and inverse_transform.', ('path', 'phase'))
+MODEL_LOAD_SECONDS = registry.histogram(
+    'backorder_model_load_seconds', 'Time to unpickle a stored model bundle.')
+MODEL_VERSION = registry.gauge(
+    'backorder_model_version', 'stored_models/<N> version currently served.')
+MODEL_CACHE_HITS = registry.counter(
+    'backorder_model_cache_hits_total', 'Model cache lookups served from memory.')
+MODEL_CACHE_LOADS = registry.counter(
+    'backorder_model_cache_loads_total', 'Model bundles loaded, first load and reloads.')
+MODEL_SWAPS = registry.counter(
+    'backorder_model_swaps_total', 'Background model swaps, swapped or rejected.', ('outcome',))
+
+PHASES = ('transform', 'predict', 'inverse_transform')
+_phase_children: dict[str, tuple] = {}
+
+
+def observe_phases(path: str, t0: float, t1: float, t2: float, t3: float) -> None:
+    """ Record `PHASES` from the `perf_counter` readings around them. """
+    children = _phase_children.get(path)
+    if children is None:
+        children = _phase_children[path] = tuple(
+            PHASE_SECONDS.labels(path, phase) for phase in PHASES)
+    # Children of a metric share its lock, take it once for all phases
+    with PHASE_SECONDS._lock:
+        children[0]._record(t1 - t0)
+        children[1]._record(t2 - t1)
+        children[2]._record(t3 - t2)
+
+
+class track_request:
+    __slots__ = ('method', 'children', 'n_rows', 'start')
+    _children: dict[str, tuple] = {}
+
+    def __init__(self, method: str, n_rows: int | None = None) -> None:
+        """
+        Context manager recording one call to a prediction entry point: its
+        latency, rows and whether it raised. A class, not `@contextmanager`,
+        since a generator per request costs more than the recording itself.
+        """
+        children = track_request._children.get(method)
+        if children is None:
+            children = track_request._children[method] = (
+                PREDICTION_SECONDS.labels(method), PREDICTION_ROWS.labels(method))
+        self.method = method
+        self.children = children
+        self.n_rows = n_rows
+
+    def __enter__(self) -> None:
+        self.start = perf_counter()
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        seconds, rows = self.children
+        seconds.observe(perf_counter() - self.start)
+        if self.n_rows is not None:
+            rows.observe(self.n_rows)
+        if exc_type is not None:
+            PREDICTION_ERRORS.labels(self.method).inc()
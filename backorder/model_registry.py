@@ -0,0 +1,256 @@
+""" SQLite index of the `stored_models/<N>` versions and their metadata. """
+
+import json
+import shutil
+import sqlite3
+import struct
+from contextlib import closing, contextmanager
+from datetime import datetime as dt
+from pathlib import Path
+
+import yaml
+
+from backorder.config import MANIFEST_NAME, REGISTRY_DB_NAME, STORED_MODEL_PATH
+from backorder.logger import logging
+from backorder.stage_cache import file_fingerprint
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS versions (
+    version INTEGER PRIMARY KEY,
+    created TEXT NOT NULL,
+    data_fingerprint TEXT,
+    metrics TEXT,
+    artifact_bytes INTEGER,
+    files TEXT,
+    removed TEXT
+);
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value INTEGER
+);
+"""
+
+
+def change_counter(db_path: Path) -> int | None:
+    """
+    SQLite's file change counter, incremented by every committed write in
+    the default rollback journal mode. Reading it costs one small read,
+    with no connection and no dependency on mtime resolution.
+    """
+    try:
+        with open(db_path, 'rb') as f:
+            header = f.read(28)
+    except FileNotFoundError:
+        return None
+    return struct.unpack('>I', header[24:28])[0] if len(header) == 28 else None
+
+
+def verify_stored_files(stored_dir: Path, names: list[str]) -> None:
+    """
+    Check files of a stored version against the sha256s in its manifest,
+    before they are unpickled: a file rewritten or swapped after the push
+    raises `ValueError`. Versions stored without a manifest are logged and
+    loaded unchecked.
+    """
+    manifest_fp = stored_dir / MANIFEST_NAME
+    if not manifest_fp.exists():
+        logging.warning('No %s in %s, loading it unchecked.', MANIFEST_NAME, stored_dir)
+        return
+    files = yaml.safe_load(manifest_fp.read_text()).get('files') or {}
+    for name in names:
+        expected = files.get(name, {}).get('sha256')
+        if expected is None:
+            raise ValueError(f'{name} is not listed in {manifest_fp}')
+        if file_fingerprint(stored_dir / name) != expected:
+            raise ValueError(f'{stored_dir / name} does not match the checksum in {manifest_fp}')
+
+
+class ModelRegistry:
+    def __init__(self, root: Path = STORED_MODEL_PATH) -> None:
+        """
+        Index of the stored model versions in `<root>/registry.db`.
+
+        The served version is a single row of the `state` table, so finding
+        it does not list `root`. Version numbers are never reused: rows of
+        versions removed by `gc` are kept, with `removed` set, as history.
+
+        A registry created next to existing version directories imports
+        them once, reading their `manifest.yaml` when there is one.
+        """
+        self.root = root
+        self.db_path = root / REGISTRY_DB_NAME
+        self.root.mkdir(parents=True, exist_ok=True)
+        with self._connect() as db:
+            db.executescript(_SCHEMA)
+            imported = db.execute("SELECT 1 FROM state WHERE key = 'imported'").fetchone()
+        if imported is None:
+            self._import_directories()
+
+    @contextmanager
+    def _connect(self):
+        """ Connection committing on success, one per operation so any thread can use it. """
+        with closing(sqlite3.connect(self.db_path, timeout=30)) as db:
+            with db:
+                yield db
+
+    def _import_directories(self) -> None:
+        """
+        Register the version directories found in `root`, once. Processes
+        opening a new registry together (the serving watcher, a training
+        job) serialise on the write lock; the first one imports and marks
+        it done in the same transaction, so a failed import is retried.
+        """
+        with self._connect() as db:
+            db.execute('BEGIN IMMEDIATE')
+            if db.execute("SELECT 1 FROM state WHERE key = 'imported'").fetchone():
+                return
+            # Other entries (staging directories, the db itself) are not versions
+            versions = sorted(int(i.name) for i in self.root.iterdir()
+                              if i.name.isdigit() and i.is_dir())
+            for version in versions:
+                manifest_fp = self.version_dir(version) / MANIFEST_NAME
+                manifest = (yaml.safe_load(manifest_fp.read_text())
+                            if manifest_fp.exists() else {})
+                self._insert(db, version, manifest.get('files') or {}, None, None,
+                             manifest.get('created'), or_ignore=True)
+            if versions:
+                db.execute("INSERT OR IGNORE INTO state (key, value) VALUES ('current', ?)",
+                           (versions[-1],))
+            db.execute("INSERT INTO state (key, value) VALUES ('imported', 1)")
+        if versions:
+            logging.info('Imported stored model versions %s into %s', versions, self.db_path)
+
+    def version_dir(self, version: int) -> Path:
+        return self.root / str(version)
+
+    def add(
+        self,
+        version: int,
+        files: dict | None = None,
+        metrics: dict | None = None,
+        data_fingerprint: str | None = None,
+        created: str | None = None,
+        make_current: bool = True,
+    ) -> None:
+        """ Register the complete directory of `version`, by default as the served one. """
+        with self._connect() as db:
+            self._insert(db, version, files or {}, metrics, data_fingerprint, created)
+            if make_current:
+                self._set_current(db, version)
+
+    @staticmethod
+    def _insert(db: sqlite3.Connection, version: int, files: dict, metrics: dict | None,
+                data_fingerprint: str | None, created: str | None,
+                or_ignore: bool = False) -> None:
+        db.execute(
+            f"INSERT {'OR IGNORE ' if or_ignore else ''}INTO versions (version, created, "
+            'data_fingerprint, metrics, artifact_bytes, files) VALUES (?, ?, ?, ?, ?, ?)',
+            (version, created or dt.now().isoformat(timespec='seconds'),
+             data_fingerprint, json.dumps(metrics or {}),
+             sum(entry.get('bytes', 0) for entry in files.values()), json.dumps(files)),
+        )
+
+    @staticmethod
+    def _set_current(db: sqlite3.Connection, version: int) -> None:
+        db.execute("INSERT OR REPLACE INTO state (key, value) VALUES ('current', ?)", (version,))
+
+    def set_current(self, version: int, expected: int | None = None) -> bool:
+        """
+        Serve `version`, e.g. to roll back. With `expected`, only if that
+        version is still the served one, so a concurrent push is not undone.
+        Returns whether the served version was set.
+        """
+        with self._connect() as db:
+            db.execute('BEGIN IMMEDIATE')
+            row = db.execute('SELECT 1 FROM versions WHERE version = ? AND removed IS NULL',
+                             (version,)).fetchone()
+            if row is None:
+                raise ValueError(f'Model version {version} is not stored.')
+            if expected is not None:
+                (current,) = db.execute(
+                    "SELECT value FROM state WHERE key = 'current'").fetchone() or (None,)
+                if current != expected:
+                    return False
+            self._set_current(db, version)
+        return True
+
+    def current_version(self) -> int | None:
+        with self._connect() as db:
+            row = db.execute("SELECT value FROM state WHERE key = 'current'").fetchone()
+        return None if row is None else row[0]
+
+    def current_dir(self) -> Path | None:
+        version = self.current_version()
+        return None if version is None else self.version_dir(version)
+
+    def _next_version(self, db: sqlite3.Connection) -> int:
+        (latest,) = db.execute('SELECT MAX(version) FROM versions').fetchone()
+        (reserved,) = db.execute(
+            "SELECT value FROM state WHERE key = 'reserved'").fetchone() or (None,)
+        taken = [int(i.name) for i in self.root.iterdir() if i.name.isdigit() and i.is_dir()]
+        taken += [version for version in (latest, reserved) if version is not None]
+        return max(taken) + 1 if taken else 0
+
+    def next_version(self) -> int:
+        """
+        One above every version ever registered (removed ones included) or
+        reserved, and every version directory, registered or not.
+        """
+        with self._connect() as db:
+            return self._next_version(db)
+
+    def reserve_version(self) -> int:
+        """
+        Claim `next_version` for a push, in one transaction, so concurrent
+        pushers never publish to the same directory.
+        """
+        with self._connect() as db:
+            db.execute('BEGIN IMMEDIATE')
+            version = self._next_version(db)
+            db.execute("INSERT OR REPLACE INTO state (key, value) VALUES ('reserved', ?)",
+                       (version,))
+        return version
+
+    def versions(self) -> list[int]:
+        """ Stored versions, oldest first. """
+        with self._connect() as db:
+            rows = db.execute('SELECT version FROM versions WHERE removed IS NULL '
+                              'ORDER BY version').fetchall()
+        return [version for (version,) in rows]
+
+    def get(self, version: int) -> dict | None:
+        """ Metadata of `version`, including removed ones. """
+        with self._connect() as db:
+            db.row_factory = sqlite3.Row
+            row = db.execute('SELECT * FROM versions WHERE version = ?', (version,)).fetchone()
+        if row is None:
+            return None
+        record = dict(row)
+        record['metrics'] = json.loads(record['metrics'] or '{}')
+        record['files'] = json.loads(record['files'] or '{}')
+        return record
+
+    def gc(self, keep_last: int) -> list[int]:
+        """
+        Remove the directories of all but the `keep_last` newest versions.
+        The served version is always kept. Returns the removed versions.
+
+        Rows are marked removed before their directory is deleted, so no
+        reader is handed a directory that is going away. A process that
+        already loaded a removed version keeps its open files.
+        """
+        current = self.current_version()
+        stored = self.versions()
+        keep = set(stored[-keep_last:] if keep_last > 0 else [])
+        if current is not None:
+            keep.add(current)
+        removed = [version for version in stored if version not in keep]
+        if not removed:
+            return []
+        with self._connect() as db:
+            db.executemany('UPDATE versions SET removed = ? WHERE version = ?',
+                           [(dt.now().isoformat(timespec='seconds'), v) for v in removed])
+        for version in removed:
+            shutil.rmtree(self.version_dir(version), ignore_errors=True)
+        logging.info('Removed stored model versions %s, keeping %s', removed, sorted(keep))
+        return removed
@@ -1,2 +1,3 @@
+from .model_cache import ModelCache
 from .prediction import Prediction
 from .training import Training
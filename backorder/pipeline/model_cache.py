@@ -0,0 +1,299 @@
+""" Keep the latest stored model bundle resident in the serving process. """
+
+import os
+from pathlib import Path
+from threading import Event, Lock, Thread, get_native_id
+
+import numpy as np
+from pandas import DataFrame
+
+from backorder import metrics, utils
+from backorder.config import (PREDICTION_ENGINE, REGISTRY_DB_NAME,
+                              STORED_MODEL_PATH, TARGET_COLUMN)
+from backorder.entity import StoredModelBundle
+from backorder.logger import logging
+from backorder.model_registry import (ModelRegistry, change_counter,
+                                      verify_stored_files)
+from backorder.pipeline.row_scorer import get_row_scorer
+
+
+class CanaryFailed(Exception):
+    """ A new model version did not pass its canary check. """
+
+
+class ModelCache:
+    def __init__(self, registry: Path = STORED_MODEL_PATH) -> None:
+        """
+        Load the model, transformer and target encoder once and reuse them.
+
+        The bundle is reloaded only when the registry serves another version.
+        Every registry write bumps the change counter in the header of its
+        database, so a cache hit costs reading 28 bytes instead of a query
+        and three unpickles.
+
+        Without `start_watcher` the new version is loaded by the first
+        request that sees it. With it, a background thread loads, warms and
+        canary checks the new version while requests keep getting the old
+        bundle, then swaps the reference; `get` never loads.
+        """
+        self.registry = registry
+        self._registry_index: ModelRegistry | None = None
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self._bundle: StoredModelBundle | None = None
+        self._token: int | None = None
+        self._lock = Lock()
+
+        self._watcher: Thread | None = None
+        self._stop = Event()
+        self.poll_sec = 1.0
+        self.max_accuracy_drop = 0.05
+        self.engine = PREDICTION_ENGINE
+        self.nice = 10
+        # Rows of the last canary file seen, for versions shipped without one,
+        # and the (version, accuracy) of the served bundle on them
+        self._canary: DataFrame | None = None
+        self._served_accuracy: tuple[int, float] | None = None
+        # Last version `refresh` rejected; `get` never loads it
+        self._rejected: int | None = None
+
+    def _registry_token(self) -> int | None:
+        return change_counter(self.registry / REGISTRY_DB_NAME)
+
+    def _current_dir(self) -> Path | None:
+        # Opened on first use: the module level cache must not create files on import
+        if self._registry_index is None:
+            self._registry_index = ModelRegistry(self.registry)
+        return self._registry_index.current_dir()
+
+    @staticmethod
+    def _load_bundle(stored_dir: Path) -> StoredModelBundle:
+        logging.info('Loading stored model bundle from %s', stored_dir)
+        with metrics.MODEL_LOAD_SECONDS.time():
+            verify_stored_files(stored_dir, ['model.pkl', 'transformer.pkl', 'target_encoder.pkl'])
+            return StoredModelBundle(
+                version=int(stored_dir.name),
+                model=utils.load_object(stored_dir / 'model.pkl'),
+                transformer=utils.load_object(stored_dir / 'transformer.pkl'),
+                target_enc=utils.load_object(stored_dir / 'target_encoder.pkl'),
+            )
+
+    def get(self) -> StoredModelBundle:
+        """ Return the cached bundle, (re)loading it if a newer version exists. """
+        if self._watcher is not None:
+            with self._lock:
+                bundle = self._bundle
+                if bundle is not None:
+                    self.hits += 1
+                    return bundle
+            # Nothing loaded yet: the first load happens on the request path
+
+        token = self._registry_token()
+        with self._lock:
+            bundle = self._bundle
+            if bundle is not None and token == self._token:
+                self.hits += 1
+                return bundle
+
+            stored_dir = self._current_dir()
+            if stored_dir is None:
+                error_msg = 'Model is not available.'
+                logging.error(error_msg)
+                raise FileNotFoundError(error_msg)
+
+            if bundle is not None and int(stored_dir.name) in (bundle.version, self._rejected):
+                # Registry changed but no newer version was stored, or it
+                # still serves a rejected one that could not be rolled back
+                self._token = token
+                self.hits += 1
+                return bundle
+
+            if int(stored_dir.name) == self._rejected:
+                # A first version the watcher rejected, with nothing to roll back to
+                error_msg = f'Model version {self._rejected} failed its canary check.'
+                logging.error(error_msg)
+                raise CanaryFailed(error_msg)
+
+            try:
+                new_bundle = self._load_bundle(stored_dir)
+            except Exception:
+                if bundle is None:
+                    raise
+                # Version may still be getting written; serve the old one
+                # and retry on the next call.
+                logging.exception('Failed to load %s, serving version %s',
+                                  stored_dir, bundle.version)
+                self.hits += 1
+                return bundle
+
+            if bundle is None:
+                self.misses += 1
+            else:
+                self.reloads += 1
+                logging.info('Model cache reloaded: version %s -> %s',
+                             bundle.version, new_bundle.version)
+            self._bundle, self._token = new_bundle, token
+            return new_bundle
+
+    def _canary_accuracy(self, bundle: StoredModelBundle, canary: DataFrame) -> float:
+        """ Score `canary` through every path requests use; raises if one fails. """
+        transformer = bundle.transformer
+        X = transformer.transform(canary[transformer.feature_names_in_])
+        labels = bundle.target_enc.inverse_transform(
+            bundle.get_predictor(self.engine).predict(X).astype(int))
+        # Builds the compiled forest of the single-row path ahead of requests;
+        # scored through its parts so the canary stays out of the phase metrics
+        scorer = get_row_scorer(bundle)
+        records = canary.drop(columns=TARGET_COLUMN).to_dict('records')
+        row_labels = scorer.classes[scorer.predictor.predict(scorer.to_matrix(records)).astype(int)]
+        if not np.array_equal(labels, row_labels):
+            raise CanaryFailed('Row scorer and DataFrame predictions differ.')
+        return float(np.mean(labels == canary[TARGET_COLUMN].astype(str).to_numpy()))
+
+    def _check_canary(self, bundle: StoredModelBundle, stored_dir: Path,
+                      current: StoredModelBundle | None) -> float | None:
+        """ Canary accuracy of `bundle`; raises `CanaryFailed` if it is rejected. """
+        canary_fp = stored_dir / 'canary.parquet'
+        if canary_fp.exists():
+            self._canary = utils.read_dataset(canary_fp)
+            self._served_accuracy = None
+        if self._canary is None:
+            logging.info('No canary rows for version %s, only loading it.', bundle.version)
+            return None
+        accuracy = self._canary_accuracy(bundle, self._canary)
+        if current is None:
+            return accuracy
+        # Scored once per served version, not on every rollout
+        if self._served_accuracy is None or self._served_accuracy[0] != current.version:
+            self._served_accuracy = (current.version,
+                                     self._canary_accuracy(current, self._canary))
+        current_accuracy = self._served_accuracy[1]
+        logging.info('Canary accuracy: version %s %.4f, version %s %.4f', current.version,
+                     current_accuracy, bundle.version, accuracy)
+        if accuracy < current_accuracy - self.max_accuracy_drop:
+            raise CanaryFailed(f'Canary accuracy fell from {current_accuracy:.4f} '
+                               f'to {accuracy:.4f}.')
+        return accuracy
+
+    def refresh(self) -> bool:
+        """
+        Load, warm and canary check the version the registry serves, and
+        swap it in if it passes. Runs off the request path; `get` returns
+        the old bundle until the swap, and requests holding it finish on
+        it.
+
+        A rejected version is rolled back in the registry, so other
+        processes (prediction workers, the next retrain) do not serve it
+        either. It is not retried until the registry changes, and `get`
+        does not load it on the request path.
+
+        Returns whether the served bundle changed.
+        """
+        token = self._registry_token()
+        if token == self._token:
+            return False
+        stored_dir = self._current_dir()
+        current = self._bundle
+        if stored_dir is None or (current is not None and int(stored_dir.name) == current.version):
+            self._token = token
+            return False
+
+        try:
+            new_bundle = self._load_bundle(stored_dir)
+            accuracy = self._check_canary(new_bundle, stored_dir, current)
+        except Exception:
+            logging.exception('Rejected %s, serving version %s', stored_dir,
+                              None if current is None else current.version)
+            metrics.MODEL_SWAPS.labels('rejected').inc()
+            self._token, self._rejected = token, int(stored_dir.name)
+            if current is not None:
+                self._roll_back(int(stored_dir.name), current.version)
+            return False
+
+        with self._lock:
+            if self._bundle is None:
+                self.misses += 1
+            else:
+                self.reloads += 1
+            self._bundle, self._token = new_bundle, token
+        if accuracy is not None:
+            self._served_accuracy = (new_bundle.version, accuracy)
+        metrics.MODEL_SWAPS.labels('swapped').inc()
+        logging.info('Model swapped: version %s -> %s',
+                     None if current is None else current.version, new_bundle.version)
+        return True
+
+    def _roll_back(self, rejected: int, served: int) -> None:
+        try:
+            rolled_back = self._registry_index.set_current(served, expected=rejected)
+        except ValueError:
+            # The served version was removed by `gc`; nothing to go back to
+            logging.exception('Cannot roll back rejected version %s', rejected)
+            return
+        if rolled_back:
+            logging.warning('Rolled the registry back from rejected version %s to %s',
+                            rejected, served)
+            self._token = self._registry_token()
+
+    def _watch(self) -> None:
+        try:
+            # Linux schedules threads like processes: requests win the CPU
+            os.setpriority(os.PRIO_PROCESS, get_native_id(), self.nice)
+        except (AttributeError, OSError):
+            pass
+        while not self._stop.wait(self.poll_sec):
+            try:
+                self.refresh()
+            except Exception:
+                logging.exception('Model watcher failed to check %s', self.registry)
+
+    def start_watcher(
+        self,
+        poll_sec: float = 1.0,
+        max_accuracy_drop: float = 0.05,
+        engine: str = PREDICTION_ENGINE,
+        nice: int = 10,
+    ) -> None:
+        """
+        Check the registry every `poll_sec` seconds in a daemon thread and
+        hot swap new versions. A version is rejected if scoring the canary
+        rows stored with it raises, or its canary accuracy is more than
+        `max_accuracy_drop` below the served version's.
+
+        The thread runs at `nice` scheduling priority where the OS allows
+        it, so loading a version competes less with requests for the CPU.
+        """
+        if self._watcher is not None:
+            return
+        self.poll_sec, self.max_accuracy_drop = poll_sec, max_accuracy_drop
+        self.engine, self.nice = engine, nice
+        self._stop.clear()
+        self._watcher = Thread(target=self._watch, name='model-watcher', daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self) -> None:
+        if self._watcher is None:
+            return
+        self._stop.set()
+        self._watcher.join()
+        self._watcher = None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._bundle, self._token = None, None
+
+    def stats(self) -> dict:
+        bundle = self._bundle
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'reloads': self.reloads,
+            'version': None if bundle is None else bundle.version,
+        }
+
+
+model_cache = ModelCache()
+metrics.MODEL_VERSION.set_function(lambda: model_cache.stats()['version'])
+metrics.MODEL_CACHE_HITS.set_function(lambda: model_cache.hits)
+metrics.MODEL_CACHE_LOADS.set_function(lambda: model_cache.misses + model_cache.reloads)
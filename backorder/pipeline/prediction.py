@@ -1,54 +1,97 @@
 """ Predict the input file and store. """
 
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from time import perf_counter
+from typing import Iterator
 
 from pandas import DataFrame
 
-from backorder import utils
-from backorder.entity import StoredModelConfig
+from backorder import metrics, utils
+from backorder.config import PREDICTION_DIR, PREDICTION_ENGINE
+from backorder.entity import (PredictionConfig, StoredModelBundle,
+                              StreamPredictionArtifact)
 from backorder.logger import logging
+from backorder.pipeline.model_cache import ModelCache, model_cache
+from backorder.pipeline.row_scorer import get_row_scorer
 
-PREDICTION_DIR = Path('prediction')
+# Bundle loaded once per worker process of `Prediction.parallel_prediction`
+_worker_bundle: StoredModelBundle | None = None
+
+
+def _init_worker(stored_dir: Path) -> None:
+    global _worker_bundle
+    _worker_bundle = ModelCache._load_bundle(stored_dir)
+
+
+def _predict_shard(shard: DataFrame, engine: str):
+    return Prediction.predict_df(shard, _worker_bundle, engine)
 
 
 @utils.wrap_with_custom_exception
-class Prediction:
+class Prediction(PredictionConfig):
     def __init__(self) -> None:
         """Prediction using transformed model."""
+        super().__init__()
         logging.info(f"{'>>'*20} Prediction {'<<'*20}")
 
-        PREDICTION_DIR.mkdir(exist_ok=True)
-        self.predicted_csv_fp = PREDICTION_DIR / 'prediction.csv'
-
     @staticmethod
     def one_prediction(df: DataFrame):
-        logging.info('Loading pickled transformers to transform dataset.')
-        model, transformer, target_enc = Prediction.get_stored_transformers()
+        with metrics.track_request('one_prediction_df', len(df)):
+            logging.info('Fetching cached transformers to transform dataset.')
+            df['backorder_prediction'] = Prediction.predict_df(df, model_cache.get())
 
-        input_arr = transformer.transform(df[transformer.feature_names_in_])
-        prediction = model.predict(input_arr)
-
-        df['backorder_prediction'] = target_enc.inverse_transform(prediction.astype(int))
-
-        fp = Path(f'{PREDICTION_DIR}/pred.csv')
-        fp.parent.mkdir(exist_ok=True)
-        df.to_csv(fp, index=False)
+            fp = Path(f'{PREDICTION_DIR}/pred.csv')
+            fp.parent.mkdir(exist_ok=True)
+            df.to_csv(fp, index=False)
 
         return df
 
     @staticmethod
-    def get_stored_transformers():
-        stored_models_config = StoredModelConfig()
+    def fast_one_prediction(record: dict) -> dict:
+        """
+        Score a single record (e.g. submitted form data) without building a
+        DataFrame or writing to disk.
+        """
+        return Prediction.fast_predictions([record])[0]
 
-        transformer_path = stored_models_config.stored_transformer_path
-        target_enc_path = stored_models_config.stored_target_enc_path
-        model_path = stored_models_config.stored_model_path
+    @staticmethod
+    def fast_predictions(records: list[dict]) -> list[dict]:
+        """ `fast_one_prediction` for many records in one vectorised call. """
+        with metrics.track_request('fast_predictions', len(records)):
+            scorer = get_row_scorer(model_cache.get())
+            return [
+                {**record, 'backorder_prediction': label}
+                for record, label in zip(records, scorer.predict(records))
+            ]
 
-        transformer = utils.load_object(transformer_path)
-        target_enc = utils.load_object(target_enc_path)
-        model = utils.load_object(model_path)
+    @staticmethod
+    def get_stored_transformers():
+        """ Latest stored objects, served from the in-process `model_cache`. """
+        with metrics.track_request('get_stored_transformers'):
+            bundle = model_cache.get()
+        return bundle.model, bundle.transformer, bundle.target_enc
 
-        return model, transformer, target_enc
+    @staticmethod
+    def predict_df(
+        df: DataFrame,
+        bundle: StoredModelBundle,
+        engine: str = PREDICTION_ENGINE,
+    ):
+        """ Decoded predictions for every row of `df`. """
+        if df.empty:
+            # sklearn refuses to transform zero rows
+            return bundle.target_enc.classes_[:0]
+        transformer = bundle.transformer
+        t0 = perf_counter()
+        input_arr = transformer.transform(df[transformer.feature_names_in_])
+        t1 = perf_counter()
+        prediction = bundle.get_predictor(engine).predict(input_arr)
+        t2 = perf_counter()
+        labels = bundle.target_enc.inverse_transform(prediction.astype(int))
+        metrics.observe_phases('dataframe', t0, t1, t2, perf_counter())
+        return labels
 
     def batch_prediction(self, df: DataFrame = ..., csv_fp: Path = ...) -> Path:
         if isinstance(csv_fp, Path) and csv_fp.suffix == '.csv':
@@ -59,12 +102,138 @@ class Prediction:
         else:
             raise ValueError('Pass either df or csv_path.')
 
-        logging.info('Loading pickled transformers to transform dataset.')
-        model, transformer, target_enc = Prediction.get_stored_transformers()
+        with metrics.track_request('batch_prediction', len(df)):
+            logging.info('Fetching cached transformers to transform dataset.')
+            df['backorder_prediction'] = Prediction.predict_df(
+                df, model_cache.get(), self.engine)
+            df.to_csv(self.predicted_csv_fp, index=False, header=True)
+        return self.predicted_csv_fp
 
-        input_arr = transformer.transform(df[transformer.feature_names_in_])
-        prediction = model.predict(input_arr)
+    def stream_prediction(
+        self,
+        fp: Path,
+        out_fp: Path | None = None,
+        chunk_size: int | None = None,
+    ) -> StreamPredictionArtifact:
+        """
+        Predict a CSV or parquet file chunk by chunk.
+
+        Every chunk is scored and appended to `out_fp` before the next one is
+        read, so peak memory is bounded by `chunk_size` instead of file size.
+        The artifact's `peak_rss_mb` is measured from the start of the call
+        on Linux, and includes whatever runs concurrently in the process.
+        """
+        out_fp = self.predicted_csv_fp if out_fp is None else out_fp
+        chunk_size = self.chunk_size if chunk_size is None else chunk_size
+        logging.info('Streaming prediction of %s in chunks of %s rows', fp, chunk_size)
+
+        # Resolve the bundle once so every chunk is scored by the same model
+        bundle = model_cache.get()
+        # Removed up front, so a failed or empty run does not leave the last output behind
+        out_fp.unlink(missing_ok=True)
+        peak_rss_scope = 'call' if utils.reset_peak_rss() else 'process'
+        start = perf_counter()
+        n_rows = n_chunks = 0
+
+        for chunk in utils.iter_dataset_chunks(fp, chunk_size):
+            chunk['backorder_prediction'] = Prediction.predict_df(
+                chunk, bundle, self.engine)
+            chunk.to_csv(out_fp, mode='a' if n_chunks else 'w',
+                         index=False, header=not n_chunks)
+            n_rows += len(chunk)
+            n_chunks += 1
+        if not n_chunks:
+            # Parquet files without rows yield no chunk; write the header only
+            empty = utils.read_dataset(fp)
+            empty['backorder_prediction'] = Prediction.predict_df(empty, bundle, self.engine)
+            empty.to_csv(out_fp, index=False)
+
+        elapsed = perf_counter() - start
+        artifact = StreamPredictionArtifact(
+            prediction_fp=out_fp,
+            n_rows=n_rows,
+            n_chunks=n_chunks,
+            elapsed_sec=elapsed,
+            rows_per_sec=n_rows / elapsed if elapsed else 0.0,
+            peak_rss_mb=utils.peak_rss_mb(),
+            peak_rss_scope=peak_rss_scope,
+        )
+        logging.info('Stream prediction artifact: %s', artifact)
+        return artifact
+
+    def parallel_prediction(
+        self,
+        data: Path | DataFrame,
+        out_fp: Path | None = None,
+        n_workers: int | None = None,
+        shard_size: int | None = None,
+    ) -> StreamPredictionArtifact:
+        """
+        Score `data` (a CSV/parquet path or a DataFrame) across a process pool.
+
+        Shards are submitted in input order and written back in the same
+        order. At most `2 * n_workers` shards are in flight, so memory stays
+        bounded for files larger than RAM. Every worker loads the version
+        served when the call starts, even if a newer one is pushed meanwhile.
+        `peak_rss_mb` is that of this process, the workers are not included.
+        """
+        out_fp = self.predicted_csv_fp if out_fp is None else out_fp
+        n_workers = self.n_workers if n_workers is None else n_workers
+        shard_size = self.shard_size if shard_size is None else shard_size
+        logging.info('Parallel prediction with %s workers, shards of %s rows',
+                     n_workers, shard_size)
+
+        bundle = model_cache.get()
+        stored_dir = model_cache.registry / str(bundle.version)
+        feature_names = list(bundle.transformer.feature_names_in_)
+        out_fp.unlink(missing_ok=True)
+        peak_rss_scope = 'call' if utils.reset_peak_rss() else 'process'
+        start = perf_counter()
+        n_rows = n_shards = 0
+        pending = deque()
+
+        def write_oldest():
+            nonlocal n_rows, n_shards
+            shard, future = pending.popleft()
+            shard['backorder_prediction'] = future.result()
+            shard.to_csv(out_fp, mode='a' if n_shards else 'w',
+                         index=False, header=not n_shards)
+            n_rows += len(shard)
+            n_shards += 1
+
+        with ProcessPoolExecutor(n_workers, initializer=_init_worker,
+                                 initargs=(stored_dir,)) as pool:
+            for shard in Prediction._iter_shards(data, shard_size):
+                # Only the feature columns are sent to the worker
+                future = pool.submit(_predict_shard, shard[feature_names], self.engine)
+                pending.append((shard, future))
+                if len(pending) >= 2 * n_workers:
+                    write_oldest()
+            while pending:
+                write_oldest()
+        if not n_shards:
+            # Input without rows; write the header only
+            empty = data.head(0) if isinstance(data, DataFrame) else utils.read_dataset(data)
+            empty['backorder_prediction'] = Prediction.predict_df(empty, bundle, self.engine)
+            empty.to_csv(out_fp, index=False)
+
+        elapsed = perf_counter() - start
+        artifact = StreamPredictionArtifact(
+            prediction_fp=out_fp,
+            n_rows=n_rows,
+            n_chunks=n_shards,
+            elapsed_sec=elapsed,
+            rows_per_sec=n_rows / elapsed if elapsed else 0.0,
+            peak_rss_mb=utils.peak_rss_mb(),
+            peak_rss_scope=peak_rss_scope,
+        )
+        logging.info('Parallel prediction artifact: %s', artifact)
+        return artifact
 
-        df['backorder_prediction'] = target_enc.inverse_transform(prediction.astype(int))
-        df.to_csv(self.predicted_csv_fp, index=False, header=True)
-        return self.predicted_csv_fp
+    @staticmethod
+    def _iter_shards(data: Path | DataFrame, shard_size: int) -> Iterator[DataFrame]:
+        if isinstance(data, DataFrame):
+            for i in range(0, len(data), shard_size):
+                yield data.iloc[i:i + shard_size].copy()
+        else:
+            yield from utils.iter_dataset_chunks(data, shard_size)
@@ -1,5 +1,7 @@
 """ Training Pipeline to train the model with new data. """
 from pathlib import Path
+from time import perf_counter
+from typing import Any, Callable
 
 from backorder import utils
 from backorder.components import (
@@ -10,26 +12,167 @@ from backorder.components import (
     ModelPusher,
     ModelTrainer,
 )
+from backorder.entity import (DataIngestionArtifact,
+                              DataTransformationArtifact,
+                              DataValidationArtifact, ModelPusherArtifact,
+                              ModelTrainerArtifact, StoredModelConfig,
+                              TrainingPipelineConfig)
+from backorder.logger import logging
+from backorder.profiler import StageProfiler
+from backorder.stage_cache import StageCache
+
+# Called as `progress(stage, event, seconds)` with event 'start' or 'end'
+ProgressCallback = Callable[[str, str, float | None], None]
+# `(rows_in, rows_out)` of a stage, given its result
+RowsCallback = Callable[[Any], tuple[int | None, int | None]]
+
+
+def _n_rows(*fps: Path) -> int:
+    return sum(utils.count_rows(Path(fp)) for fp in fps)
 
 
 @utils.wrap_with_custom_exception
 class Training:
-    def initiate(self, main_data_fp: Path | None = None):
+    @staticmethod
+    def _run_stage(
+        name: str,
+        func: Callable,
+        progress: ProgressCallback | None,
+        profiler: StageProfiler | None = None,
+        rows: RowsCallback | None = None,
+    ):
+        if progress is not None:
+            progress(name, 'start', None)
+        start = perf_counter()
+        if profiler is None:
+            result = func()
+        else:
+            with profiler.stage(name) as record:
+                result = func()
+            if rows is not None:
+                record['rows_in'], record['rows_out'] = rows(result)
+        seconds = perf_counter() - start
+        logging.info('Stage %s took %.2fs', name, seconds)
+        if progress is not None:
+            progress(name, 'end', seconds)
+        return result
+
+    def initiate(
+        self,
+        main_data_fp: Path | None = None,
+        progress: ProgressCallback | None = None,
+        use_cache: bool = True,
+        retrain_mode: str | None = None,
+        cprofile: bool | None = None,
+    ):
         """
         `DataIngestion` -> `DataValidation` -> `DataTransformation`
 
         `ModelTraining` -> `ModelEvaluation` -> `ModelPusher`
 
+        `progress` is notified when each stage starts and ends.
+
+        With `use_cache`, a stage whose inputs (data files, stage config and
+        code) are unchanged since an earlier run reuses that run's artifact.
+        Evaluation and pushing are skipped when the cached model is the one
+        currently stored. Cache hits are written to `stage_cache_report.yaml`.
+
+        `retrain_mode` overrides `RETRAIN_MODE`: 'incremental' reuses the
+        stored transformer and grows the stored forest on new rows only.
+
+        Wall and CPU time, peak RSS, rows and bytes in and out of every
+        stage are written to `profile_report.yaml`, also when a stage fails.
+        `cprofile` overrides `cprofile_stages`, which dumps a cProfile of
+        each stage.
+
         Finally:
         --------
             Store the models and transformers in Pickle format.
         """
-        ingestion_artifact = DataIngestion().initiate(main_data_fp)
-        DataValidation().initiate()
-        transformation_artifact = DataTransformation().initiate()
-        model_trainer_artifact = ModelTrainer().initiate()
-        ModelEvaluation(
-            ingestion_artifact, transformation_artifact, model_trainer_artifact
-        ).initiate()
-
-        ModelPusher(transformation_artifact, model_trainer_artifact).initiate()
+        cache = StageCache(enabled=use_cache)
+        config = TrainingPipelineConfig()
+        if cprofile is None:
+            cprofile = config.cprofile_stages
+        profiler = StageProfiler(config.cprofile_dir if cprofile else None)
+
+        def run(name, component, artifact_cls, func, *upstream, rows=None):
+            return Training._run_stage(name, lambda: cache.run(
+                name, component.fingerprint(*upstream), artifact_cls, func,
+            ), progress, profiler, rows)
+
+        try:
+            ingestion = DataIngestion()
+            ingestion_artifact = run(
+                'data_ingestion', ingestion, DataIngestionArtifact,
+                lambda: ingestion.initiate(main_data_fp), main_data_fp,
+                rows=lambda a: (ingestion.n_rows_imported, _n_rows(a.train_path, a.test_path)),
+            )
+            n_split_rows = _n_rows(ingestion_artifact.train_path, ingestion_artifact.test_path)
+            validation = DataValidation()
+            run(
+                'data_validation', validation, DataValidationArtifact,
+                lambda: validation.initiate(ingestion_artifact), ingestion_artifact,
+                rows=lambda a: (n_split_rows, n_split_rows),
+            )
+            transformation = DataTransformation()
+            if retrain_mode is not None:
+                transformation.retrain_mode = retrain_mode
+            transformation_artifact = run(
+                'data_transformation', transformation, DataTransformationArtifact,
+                lambda: transformation.initiate(data_ingestion_artifact=ingestion_artifact),
+                ingestion_artifact,
+                rows=lambda a: (n_split_rows, _n_rows(a.train_X_path, a.test_X_path)),
+            )
+            trainer = ModelTrainer()
+            if retrain_mode is not None:
+                trainer.retrain_mode = retrain_mode
+            model_trainer_artifact = run(
+                'model_trainer', trainer, ModelTrainerArtifact,
+                lambda: trainer.initiate(transformation_artifact), transformation_artifact,
+                # Out: rows the model was trained on, across incremental runs
+                rows=lambda a: (
+                    _n_rows(transformation_artifact.train_X_path, transformation_artifact.test_X_path),
+                    _n_rows(a.train_rows_path),
+                ),
+            )
+
+            # The model was promoted before iff the same trained model is served.
+            # Keyed on the checksums the pusher recorded, so `stored_models/` is not read.
+            def promotion_key():
+                registry = StoredModelConfig().registry
+                version = registry.current_version()
+                record = None if version is None else registry.get(version)
+                return cache.key({
+                    'model': cache.report['model_trainer']['key'],
+                    'current_version': version,
+                    'files': {name: entry.get('sha256')
+                              for name, entry in (record or {}).get('files', {}).items()},
+                })
+
+            pusher_artifact = cache.lookup('model_pusher', promotion_key(), ModelPusherArtifact)
+            if pusher_artifact is not None:
+                logging.info('Trained model is already the latest stored model.')
+                cache.report['model_evaluation'] = {'cache': 'hit'}
+                cache.report['model_pusher'] = {'cache': 'hit'}
+            else:
+                # Objects are `None` after a cache hit and loaded from the artifacts
+                Training._run_stage('model_evaluation', lambda: ModelEvaluation(
+                    ingestion_artifact, transformation_artifact, model_trainer_artifact,
+                    model=trainer.model,
+                    transformer=transformation.trf_pipeline,
+                    target_enc=transformation.target_enc,
+                ).initiate(), progress, profiler,
+                    lambda _: (_n_rows(transformation_artifact.test_X_path), None))
+                pusher_artifact = Training._run_stage('model_pusher', lambda: ModelPusher(
+                    transformation_artifact, model_trainer_artifact).initiate(), progress, profiler)
+                cache.store('model_pusher', promotion_key(), pusher_artifact)
+                cache.report['model_evaluation'] = {'cache': 'miss'}
+                cache.report['model_pusher'] = {'cache': 'miss'}
+        finally:
+            for name, record in profiler.records.items():
+                record['cache'] = cache.report.get(name, {}).get('cache')
+            utils.to_yaml(config.profile_report_fp, profiler.report())
+
+        utils.to_yaml(ingestion.artifact_dir / 'stage_cache_report.yaml', cache.report)
+        logging.info('Stage cache report: %s', cache.report)
+        return cache.report
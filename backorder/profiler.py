@@ -0,0 +1,89 @@
+""" Wall time, CPU time, memory and I/O of each training pipeline stage. """
+
+import cProfile
+from contextlib import contextmanager
+from pathlib import Path
+from time import perf_counter, process_time
+
+from backorder import utils
+from backorder.logger import logging
+
+
+def _cpu_seconds() -> float:
+    """ CPU time of this process and of its finished child processes. """
+    try:
+        import resource
+    except ImportError:
+        return process_time()
+    usage = [resource.getrusage(who) for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)]
+    return sum(u.ru_utime + u.ru_stime for u in usage)
+
+
+def _io_bytes() -> tuple[int, int] | None:
+    """ Bytes read and written by this process through system calls. """
+    try:
+        with open('/proc/self/io') as f:
+            counters = dict(line.split(': ') for line in f.read().splitlines())
+    except OSError:
+        return None
+    return int(counters['rchar']), int(counters['wchar'])
+
+
+class StageProfiler:
+    def __init__(self, cprofile_dir: Path | None = None) -> None:
+        """
+        Resource usage of every stage run inside `stage(name)`: wall and CPU
+        seconds, peak RSS and bytes read and written. Callers add `rows_in`
+        and `rows_out` to the yielded record.
+
+        CPU time includes finished child processes. Peak RSS is per stage
+        on Linux and the process-wide peak elsewhere, see `peak_rss_scope`.
+        Memory-mapped reads are not counted as bytes read.
+
+        With `cprofile_dir`, each stage also runs under `cProfile` and its
+        stats are dumped to `<cprofile_dir>/<stage>.prof`, readable with
+        `python -m pstats`. Only the calling thread is profiled.
+        """
+        self.cprofile_dir = cprofile_dir
+        self.records: dict[str, dict] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        record = self.records[name] = {'rows_in': None, 'rows_out': None}
+        record['peak_rss_scope'] = 'stage' if utils.reset_peak_rss() else 'process'
+        io_start = _io_bytes()
+        cpu_start = _cpu_seconds()
+        start = perf_counter()
+
+        profile = None
+        if self.cprofile_dir is not None:
+            profile = cProfile.Profile()
+            profile.enable()
+        record['status'] = 'error'
+        try:
+            yield record
+            record['status'] = 'ok'
+        finally:
+            if profile is not None:
+                profile.disable()
+                self.cprofile_dir.mkdir(parents=True, exist_ok=True)
+                profile.dump_stats(self.cprofile_dir / f'{name}.prof')
+
+            record['wall_sec'] = perf_counter() - start
+            record['cpu_sec'] = _cpu_seconds() - cpu_start
+            record['peak_rss_mb'] = utils.peak_rss_mb()
+            io_end = _io_bytes()
+            if io_start is None or io_end is None:
+                record['bytes_read'] = record['bytes_written'] = None
+            else:
+                record['bytes_read'] = io_end[0] - io_start[0]
+                record['bytes_written'] = io_end[1] - io_start[1]
+            logging.info('Profile of stage %s: %s', name, record)
+
+    def report(self) -> dict:
+        return {
+            'total_wall_sec': sum(record['wall_sec'] for record in self.records.values()),
+            'cprofile_dir': None if self.cprofile_dir is None else str(self.cprofile_dir),
+            # A list keeps the run order in YAML
+            'stages': [{'stage': name, **record} for name, record in self.records.items()],
+        }
@@ -0,0 +1,158 @@
+""" Pluggable formats for the pickled artifacts (model, transformer, encoder). """
+
+import hashlib
+import io
+import os
+import pickle
+import struct
+import tempfile
+from pathlib import Path
+from typing import Literal
+
+import dill
+import numpy as np
+
+Format = Literal['dill', 'joblib', 'pickle5']
+
+# Prefixes of the formats written here; files without one are legacy dill
+_JOBLIB_MAGIC = b'BOJOBLIB'
+_PICKLE5_MAGIC = b'BOPICKL5'
+_MAGIC_SIZE = 8
+# Pickle and buffer offsets are aligned like `.npy` data
+_ALIGN = 64
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // _ALIGN) * _ALIGN
+
+
+class _HashingWriter:
+    def __init__(self, f) -> None:
+        """ Binary file wrapper computing the sha256 of everything written. """
+        self.f = f
+        self.sha256 = hashlib.sha256()
+
+    def write(self, data) -> int:
+        self.sha256.update(data)
+        return self.f.write(data)
+
+    def tell(self) -> int:
+        return self.f.tell()
+
+
+def _sha256_file(fp: Path) -> str:
+    digest = hashlib.sha256()
+    with open(fp, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_pickle5(f, obj: object) -> None:
+    """
+    Pickle protocol 5 with NumPy arrays kept out-of-band: every contiguous
+    array (forest node arrays, imputer means, ...) is written as raw bytes
+    after the pickle stream, so loading does not copy them through the
+    unpickler. Layout: magic, `<QQ` pickle size and buffer count, `<QQ`
+    offset and size per buffer, the pickle stream, aligned buffers.
+    """
+    buffers = []
+    data = pickle.dumps(obj, protocol=5, buffer_callback=buffers.append)
+    raws = [buffer.raw() for buffer in buffers]
+
+    offset = _aligned(_MAGIC_SIZE + 16 + 16 * len(raws)) + len(data)
+    layout = []
+    for raw in raws:
+        offset = _aligned(offset)
+        layout.append((offset, raw.nbytes))
+        offset += raw.nbytes
+
+    header = _PICKLE5_MAGIC + struct.pack('<QQ', len(data), len(raws))
+    header += b''.join(struct.pack('<QQ', *entry) for entry in layout)
+    f.write(header.ljust(_aligned(len(header)), b'\0'))
+    f.write(data)
+    for (offset, _), raw in zip(layout, raws):
+        f.write(b'\0' * (offset - f.tell()))
+        f.write(raw)
+
+
+def _read_pickle5(fp: Path):
+    # Copy-on-write map: arrays are paged in lazily and stay writable
+    buffer = memoryview(np.memmap(fp, mode='c'))
+    header_end = _MAGIC_SIZE + 16
+    data_size, n_buffers = struct.unpack('<QQ', buffer[_MAGIC_SIZE:header_end])
+    layout = struct.iter_unpack('<QQ', buffer[header_end:header_end + 16 * n_buffers])
+    data_start = _aligned(header_end + 16 * n_buffers)
+    return pickle.loads(
+        buffer[data_start:data_start + data_size],
+        buffers=[buffer[offset:offset + size] for offset, size in layout],
+    )
+
+
+def dump(fp: Path, obj: object, fmt: Format, compress: int = 3) -> str:
+    """
+    Write `obj` to `fp` in `fmt`. The file is written next to `fp` and
+    renamed over it, so a process that has the old file memory-mapped
+    keeps reading the old content.
+
+    `compress` is the zlib level of the 'joblib' format.
+
+    Returns
+    -------
+    sha256 of the file, computed while writing for 'dill' and 'pickle5'.
+    """
+    fp.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=fp.parent, prefix=f'.{fp.name}.')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            writer = _HashingWriter(f)
+            if fmt == 'dill':
+                dill.dump(obj, writer)
+            elif fmt == 'joblib':
+                import joblib
+
+                f.write(_JOBLIB_MAGIC)
+                joblib.dump(obj, f, compress=compress)
+            elif fmt == 'pickle5':
+                _write_pickle5(writer, obj)
+            else:
+                raise ValueError(f'Unknown serialization format: {fmt}')
+        # joblib may seek while writing, hash what ended up on disk
+        digest = _sha256_file(tmp) if fmt == 'joblib' else writer.sha256.hexdigest()
+        os.replace(tmp, fp)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return digest
+
+
+def detect_format(fp: Path) -> Format:
+    with open(fp, 'rb') as f:
+        magic = f.read(_MAGIC_SIZE)
+    if magic == _PICKLE5_MAGIC:
+        return 'pickle5'
+    if magic == _JOBLIB_MAGIC:
+        return 'joblib'
+    return 'dill'
+
+
+def load(fp: Path):
+    """
+    Read an object written by `dump` in any format, or a plain dill pickle.
+
+    Every format unpickles, which can run arbitrary code: load trusted
+    files only. Stored versions are checked against the checksums of
+    their manifest first, see `model_registry.verify_stored_files`.
+    """
+    fmt = detect_format(fp)
+    if fmt == 'pickle5':
+        return _read_pickle5(fp)
+    if fmt == 'joblib':
+        import joblib
+
+        with open(fp, 'rb') as f:
+            f.seek(_MAGIC_SIZE)
+            # joblib sniffs the compressor from a seekable file object
+            return joblib.load(io.BufferedReader(f))
+    with open(fp, 'rb') as f:
+        return dill.load(f)
@@ -0,0 +1,3 @@
+from .batcher import MicroBatcher
+from .jobs import Job, JobStore
+from .training_runner import TrainingJobRunner, TrainingQueueFull
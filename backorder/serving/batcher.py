@@ -0,0 +1,131 @@
+""" Coalesce concurrent single-row requests into vectorised batches. """
+
+from collections import Counter, deque
+from concurrent.futures import Future
+from queue import Empty, Queue
+from threading import Lock, Thread
+from time import perf_counter
+from typing import Any, Callable
+
+import numpy as np
+
+from backorder.logger import logging
+
+
+class MicroBatcher:
+    def __init__(
+        self,
+        score_fn: Callable[[list], list],
+        max_batch_size: int = 64,
+        max_wait_ms: float = 2.0,
+    ) -> None:
+        """
+        Gather items for up to `max_wait_ms` (or until `max_batch_size` items
+        are queued), score them with one `score_fn` call and hand every
+        caller its own result.
+
+        `score_fn` takes a list of items and returns a list of results in
+        the same order.
+        """
+        self.score_fn = score_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue: Queue = Queue()
+        self._thread: Thread | None = None
+        self._start_lock = Lock()
+
+        self._stats_lock = Lock()
+        self.n_batches = 0
+        self.n_items = 0
+        self.batch_sizes: Counter = Counter()
+        self._queue_delays_ms: deque = deque(maxlen=10_000)
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = Thread(target=self._run, name='micro-batcher', daemon=True)
+                self._thread.start()
+
+    def submit(self, item: Any) -> Future:
+        self._ensure_started()
+        future: Future = Future()
+        self._queue.put((item, future, perf_counter()))
+        return future
+
+    def predict(self, item: Any, timeout: float | None = None) -> Any:
+        """ Blocking helper: submit `item` and wait for its result. """
+        return self.submit(item).result(timeout)
+
+    def _collect(self) -> list:
+        batch = [self._queue.get()]
+        deadline = batch[0][2] + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - perf_counter()
+            try:
+                if remaining <= 0:
+                    # Window is over; take only what is already queued
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except Empty:
+                break
+        return batch
+
+    def _score(self, batch: list) -> None:
+        items = [item for item, _, _ in batch]
+        try:
+            results = self.score_fn(items)
+            if len(results) != len(items):
+                raise ValueError(f'score_fn returned {len(results)} results for {len(items)} items')
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0][1].set_exception(e)
+                return
+            # Isolate the failing item(s) so other callers still get results
+            logging.warning('Batch of %s failed (%s), scoring items one by one', len(batch), e)
+            for entry in batch:
+                self._score([entry])
+            return
+        for (_, future, _), result in zip(batch, results):
+            future.set_result(result)
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            dispatched = perf_counter()
+            with self._stats_lock:
+                self.n_batches += 1
+                self.n_items += len(batch)
+                self.batch_sizes[len(batch)] += 1
+                self._queue_delays_ms.extend(
+                    (dispatched - enqueued) * 1000 for _, _, enqueued in batch)
+            try:
+                self._score(batch)
+            except BaseException as e:
+                # Keep the thread alive: callers wait on these futures without a timeout
+                logging.exception('Scoring a batch of %s raised', len(batch))
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def stats(self) -> dict:
+        """ Batch-size distribution and queueing delay of recent items. """
+        with self._stats_lock:
+            delays = np.array(self._queue_delays_ms)
+            batch_sizes = dict(sorted(self.batch_sizes.items()))
+            n_batches, n_items = self.n_batches, self.n_items
+
+        queue_delay_ms = dict.fromkeys(['p50', 'p90', 'p99', 'max'], 0.0)
+        if delays.size:
+            p50, p90, p99 = np.percentile(delays, [50, 90, 99])
+            queue_delay_ms = {'p50': p50, 'p90': p90, 'p99': p99, 'max': delays.max()}
+
+        return {
+            'batches': n_batches,
+            'items': n_items,
+            'mean_batch_size': n_items / n_batches if n_batches else 0.0,
+            'batch_sizes': batch_sizes,
+            'queue_delay_ms': {k: float(v) for k, v in queue_delay_ms.items()},
+        }
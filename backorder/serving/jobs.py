@@ -0,0 +1,74 @@
+""" Track long running jobs (batch prediction, training) by job id. """
+
+from concurrent.futures import Executor, Future
+from dataclasses import dataclass, field
+from datetime import datetime as dt
+from threading import Lock
+from typing import Any, Callable
+from uuid import uuid4
+
+from backorder.logger import logging
+
+
+@dataclass
+class Job:
+    kind: str
+    future: Future = field(repr=False)
+    id: str = field(default_factory=lambda: uuid4().hex)
+    created_at: str = field(default_factory=lambda: dt.now().isoformat())
+    finished_at: str | None = None
+    # Per-stage progress, filled in by jobs that report it
+    stages: dict = field(default_factory=dict)
+
+    @property
+    def status(self) -> str:
+        if not self.future.done():
+            return 'running' if self.future.running() else 'queued'
+        return 'failed' if self.future.exception() is not None else 'succeeded'
+
+    def to_dict(self) -> dict:
+        data = {
+            'job_id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'created_at': self.created_at,
+            'finished_at': self.finished_at,
+        }
+        if self.stages:
+            # Copied: the training runner thread adds stages while this is serialised
+            data['stages'] = dict(self.stages)
+        if self.status == 'succeeded':
+            data['result'] = self.future.result()
+        elif self.status == 'failed':
+            data['error'] = str(self.future.exception())
+        return data
+
+
+class JobStore:
+    def __init__(self, max_jobs: int = 1000) -> None:
+        """ In-memory registry of submitted jobs; keeps the latest `max_jobs`. """
+        self.max_jobs = max_jobs
+        self._jobs: dict[str, Job] = {}
+        self._lock = Lock()
+
+    def submit(self, executor: Executor, kind: str, fn: Callable, *args: Any) -> Job:
+        """ Run `fn(*args)` on `executor` and return the `Job` tracking it. """
+        return self.add(Job(kind, executor.submit(fn, *args)))
+
+    def add(self, job: Job) -> Job:
+        """ Track a job whose future is resolved by the caller. """
+        job.future.add_done_callback(lambda _: self._on_done(job))
+        with self._lock:
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.pop(next(iter(self._jobs)))
+        logging.info('Submitted %s job %s', job.kind, job.id)
+        return job
+
+    def _on_done(self, job: Job) -> None:
+        job.finished_at = dt.now().isoformat()
+        logging.info('%s job %s finished with status %s', job.kind, job.id, job.status)
+
+    def get(self, job_id: str) -> Job | None:
+        with self._lock:
+            return self._jobs.get(job_id)
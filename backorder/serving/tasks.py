@@ -0,0 +1,15 @@
+""" Long running tasks executed off the request path by the serving apps. """
+
+from pathlib import Path
+
+from backorder import pipeline
+
+
+def batch_prediction(fp: Path, out_fp: Path) -> dict:
+    artifact = pipeline.Prediction().stream_prediction(fp, out_fp)
+    return {
+        'message': 'Prediction Completed!',
+        'prediction_path': artifact.prediction_fp.absolute().as_uri(),
+        'n_rows': artifact.n_rows,
+        'rows_per_sec': artifact.rows_per_sec,
+    }
@@ -0,0 +1,138 @@
+""" Run `pipeline.Training` in a separate, CPU limited process. """
+
+import os
+from concurrent.futures import Future
+from multiprocessing import get_context
+from pathlib import Path
+from queue import Empty, Queue
+from threading import Lock, Thread
+from typing import Callable
+
+from threadpoolctl import threadpool_limits
+
+from backorder.entity import TrainingJobConfig
+from backorder.logger import logging
+from backorder.serving.jobs import Job, JobStore
+
+
+class TrainingQueueFull(Exception):
+    """ Raised when a training request cannot be queued. """
+
+
+def _limit_resources(cpu_limit: int, nice: int) -> None:
+    """ Pin this process to the last `cpu_limit` allowed cores and renice it. """
+    if hasattr(os, 'sched_getaffinity'):
+        cpus = sorted(os.sched_getaffinity(0))
+        os.sched_setaffinity(0, cpus[-cpu_limit:])
+    if hasattr(os, 'nice'):
+        os.nice(nice)
+    # Keep BLAS/OpenMP thread pools within the same budget
+    threadpool_limits(cpu_limit)
+
+
+def _train(events, cpu_limit: int, nice: int, main_data_fp: Path | None) -> None:
+    """ Entry point of the training process; reports through `events`. """
+    _limit_resources(cpu_limit, nice)
+
+    from backorder import pipeline
+
+    def progress(stage, event, seconds):
+        events.put(('progress', stage, event, seconds))
+
+    try:
+        pipeline.Training().initiate(main_data_fp, progress=progress)
+    except Exception as e:
+        events.put(('error', str(e)))
+    else:
+        events.put(('result', {'message': 'Model Training Completed!'}))
+
+
+class TrainingJobRunner(TrainingJobConfig):
+    def __init__(self, jobs: JobStore, target: Callable = _train) -> None:
+        """
+        Execute training requests one at a time in a child process.
+
+        At most `max_queue` requests wait behind the running one; further
+        requests raise `TrainingQueueFull`. With `dedupe`, a request made
+        while one is already waiting returns the waiting job instead, since
+        both would train on the same data.
+
+        `target(events, cpu_limit, nice, main_data_fp)` runs in the child
+        process and reports through `events` like `_train`.
+        """
+        super().__init__()
+        self.jobs = jobs
+        self.target = target
+        self._pending: Queue = Queue()
+        self._queued: list[Job] = []
+        self._lock = Lock()
+        self._ctx = get_context('spawn')
+        self._thread: Thread | None = None
+
+    def submit(self, main_data_fp: Path | None = None) -> Job:
+        with self._lock:
+            if self._queued and self.dedupe:
+                logging.info('Training request deduplicated into job %s', self._queued[-1].id)
+                return self._queued[-1]
+            if len(self._queued) >= self.max_queue:
+                raise TrainingQueueFull(
+                    f'{len(self._queued)} training job(s) already waiting.')
+
+            job = Job('train_model', Future())
+            self._queued.append(job)
+            self.jobs.add(job)
+            self._pending.put((job, main_data_fp))
+
+            if self._thread is None:
+                self._thread = Thread(target=self._run, name='training-runner', daemon=True)
+                self._thread.start()
+        return job
+
+    def _run(self) -> None:
+        while True:
+            job, main_data_fp = self._pending.get()
+            with self._lock:
+                self._queued.remove(job)
+            job.future.set_running_or_notify_cancel()
+            try:
+                self._train(job, main_data_fp)
+            except Exception as e:
+                if not job.future.done():
+                    job.future.set_exception(e)
+
+    def _train(self, job: Job, main_data_fp: Path | None) -> None:
+        events = self._ctx.Queue()
+        process = self._ctx.Process(
+            target=self.target,
+            args=(events, self.cpu_limit, self.nice, main_data_fp),
+            name=f'training-{job.id}',
+        )
+        process.start()
+        logging.info('Training job %s started in process %s', job.id, process.pid)
+
+        exited = False
+        while not job.future.done():
+            try:
+                event = events.get(timeout=0.5)
+            except Empty:
+                if exited:
+                    break
+                # Give events sent right before exiting one more read
+                exited = not process.is_alive()
+                continue
+
+            if event[0] == 'progress':
+                _, stage, status, seconds = event
+                job.stages[stage] = {
+                    'status': 'running' if status == 'start' else 'done',
+                    'seconds': seconds,
+                }
+            elif event[0] == 'result':
+                job.future.set_result(event[1])
+            else:
+                job.future.set_exception(RuntimeError(event[1]))
+
+        process.join()
+        if not job.future.done():
+            job.future.set_exception(
+                RuntimeError(f'Training process exited with code {process.exitcode}'))
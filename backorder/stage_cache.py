@@ -0,0 +1,134 @@
+""" Content-addressed cache that lets unchanged pipeline stages be skipped. """
+
+import hashlib
+import inspect
+import json
+from dataclasses import asdict, fields
+from pathlib import Path
+from typing import Any, Callable
+
+import yaml
+
+from backorder import utils
+from backorder.config import STAGE_CACHE_PATH
+from backorder.logger import logging
+
+# (path, size, mtime_ns) -> sha256, so a file is hashed once per process
+_file_digests: dict[tuple, str] = {}
+
+
+def _memo_key(fp: Path) -> tuple:
+    stat = fp.stat()
+    return str(fp.resolve()), stat.st_size, stat.st_mtime_ns
+
+
+def remember_file_fingerprint(fp: Path, digest: str) -> None:
+    """ Record the sha256 of a file just written, so it is not read back to hash. """
+    _file_digests[_memo_key(Path(fp))] = digest
+
+
+def file_fingerprint(fp: Path) -> str:
+    """ sha256 of a file's content, or of every file below a directory. """
+    fp = Path(fp)
+    if fp.is_dir():
+        digest = hashlib.sha256()
+        for child in sorted(p for p in fp.rglob('*') if p.is_file()):
+            digest.update(str(child.relative_to(fp)).encode())
+            digest.update(file_fingerprint(child).encode())
+        return digest.hexdigest()
+
+    memo_key = _memo_key(fp)
+    if memo_key not in _file_digests:
+        digest = hashlib.sha256()
+        with open(fp, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        _file_digests[memo_key] = digest.hexdigest()
+    return _file_digests[memo_key]
+
+
+def code_fingerprint(obj: Any) -> str:
+    """ sha256 of the source file of a module, class or function, or of the class of `obj`. """
+    if not (inspect.ismodule(obj) or inspect.isclass(obj) or inspect.isfunction(obj)):
+        obj = type(obj)
+    return hashlib.sha256(Path(inspect.getsourcefile(obj)).read_bytes()).hexdigest()
+
+
+class StageCache:
+    def __init__(self, root: Path = STAGE_CACHE_PATH, enabled: bool = True) -> None:
+        """
+        Map a fingerprint of a stage's inputs to the artifact it produced.
+
+        Entries live in `<root>/<stage>/<key>.yaml`. An entry is only reused
+        if every output file that existed when it was stored still has the
+        sha256 it had then: outputs of the hour's artifact directory may
+        have been rewritten by a later run since. Output directories (e.g.
+        `stored_models/`) are only checked to exist, their content is not
+        hashed; key such stages on what identifies their content instead.
+        """
+        self.root = root
+        self.enabled = enabled
+        self.report: dict[str, dict] = {}
+
+    @staticmethod
+    def key(parts: dict) -> str:
+        payload = json.dumps(parts, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _entry_path(self, stage: str, key: str) -> Path:
+        return self.root / stage / f'{key}.yaml'
+
+    def lookup(self, stage: str, key: str, artifact_cls: type):
+        fp = self._entry_path(stage, key)
+        if not self.enabled or not fp.exists():
+            return None
+
+        with open(fp) as f:
+            entry = yaml.safe_load(f)
+        outputs = entry['outputs']
+        if not isinstance(outputs, dict):
+            logging.info('Stage cache entry %s is stale: no output checksums', fp)
+            return None
+        for output, digest in outputs.items():
+            if not Path(output).exists():
+                logging.info('Stage cache entry %s is stale: %s is missing', fp, output)
+                return None
+            if digest is not None and file_fingerprint(Path(output)) != digest:
+                logging.warning('Stage cache entry %s is stale: %s was rewritten', fp, output)
+                return None
+
+        data = entry['artifact']
+        for field in fields(artifact_cls):
+            if field.type in (Path, Path | None) and data.get(field.name) is not None:
+                data[field.name] = Path(data[field.name])
+        return artifact_cls(**data)
+
+    def store(self, stage: str, key: str, artifact) -> None:
+        if not self.enabled:
+            return
+        data, outputs = {}, {}
+        for name, value in asdict(artifact).items():
+            if isinstance(value, Path):
+                if value.is_dir():
+                    outputs[str(value)] = None
+                elif value.exists():
+                    outputs[str(value)] = file_fingerprint(value)
+                value = str(value)
+            elif hasattr(value, 'item'):
+                # NumPy scalars, e.g. scores returned by sklearn metrics
+                value = value.item()
+            data[name] = value
+        utils.to_yaml(self._entry_path(stage, key), {'artifact': data, 'outputs': outputs})
+
+    def run(self, stage: str, parts: dict, artifact_cls: type, func: Callable):
+        """ Return the cached artifact for `parts`, or run `func` and cache it. """
+        key = self.key(parts)
+        artifact = self.lookup(stage, key, artifact_cls)
+        hit = artifact is not None
+        if not hit:
+            artifact = func()
+            self.store(stage, key, artifact)
+
+        self.report[stage] = {'cache': 'hit' if hit else 'miss', 'key': key}
+        logging.info('Stage cache %s for %s (%s)', 'hit' if hit else 'miss', stage, key)
+        return artifact
@@ -1,15 +1,20 @@
 """ Extra functions for the project. """
 
+import os
+import shutil
+import sys
 from pathlib import Path
 from sys import exc_info
+from typing import Iterator
 from warnings import warn
 
-import dill
 import numpy as np
 import pandas as pd
 import yaml
 from pandas import DataFrame
 
+from backorder import serialization
+from backorder.config import SERIALIZATION_COMPRESS, SERIALIZATION_FORMAT
 from backorder.exception import CustomException
 from backorder.logger import logging
 
@@ -32,50 +37,264 @@ def wrap_with_custom_exception(cls):
     return cls
 
 
-def read_dataset(fp: Path) -> DataFrame:
-    """ Mostly supports `csv` and `parquet`. """
+def read_dataset(
+    fp: Path,
+    columns: list[str] | None = None,
+    filters: list | None = None,
+) -> DataFrame:
+    """
+    Mostly supports `csv` and `parquet`, or a directory of parquet files.
+
+    columns: Read only these columns (projection)
+    filters: Row filters in the `pyarrow` / `pd.read_parquet` DNF format,
+        e.g. `[('lead_time', '<', 52)]`, applied while scanning the file(s).
+
+    Parquet files, directories and filtered CSV files are scanned with
+    `pyarrow.dataset`, so unused columns are never decoded and row groups
+    excluded by `filters` are skipped using their statistics.
+    """
     # Extract pandas attribute from file extension
-    suffix = fp.suffix[1:]
+    suffix = 'parquet' if fp.is_dir() else fp.suffix[1:]
 
     # Print and log the warning
     if suffix not in ['csv', 'parquet']:
         warn_msg = 'utils.read_dataset: Supports CSV and parquet files easily.'
         warn(warn_msg)
         logging.warn(warn_msg)
+    elif suffix == 'parquet' or filters is not None:
+        import pyarrow.dataset as ds
+        import pyarrow.parquet as pq
+
+        dataset = ds.dataset(fp, format=suffix)
+        table = dataset.to_table(
+            columns=columns,
+            filter=None if filters is None else pq.filters_to_expression(filters),
+        )
+        return table.to_pandas()
 
     pd_attr = 'read_' + suffix
-    df: DataFrame = getattr(pd, pd_attr)(fp)
+    if columns is None:
+        df: DataFrame = getattr(pd, pd_attr)(fp)
+    elif suffix == 'csv':
+        df = pd.read_csv(fp, usecols=columns)[columns]
+    else:
+        df = getattr(pd, pd_attr)(fp, columns=columns)
+    return df
+
+
+def count_rows(fp: Path) -> int:
+    """
+    Number of rows, from the header for `.npy`, the footer for parquet, else
+    by reading in chunks.
+    """
+    if fp.suffix == '.npy':
+        return len(np.load(fp, mmap_mode='r'))
+    if fp.suffix == '.parquet':
+        import pyarrow.parquet as pq
+
+        return pq.read_metadata(fp).num_rows
+    return sum(len(chunk) for chunk in iter_dataset_chunks(fp, 1_000_000))
+
+
+def parquet_null_counts(fp: Path) -> tuple[int, dict[str, int]] | None:
+    """
+    Number of rows and nulls per column of a parquet file, read from the
+    row group statistics in its footer without touching the data pages.
+
+    Returns `None` if the file is not parquet or a column has no null count.
+    """
+    if fp.suffix != '.parquet':
+        return None
+    import pyarrow.parquet as pq
+
+    metadata = pq.read_metadata(fp)
+    null_counts = dict.fromkeys(metadata.schema.names, 0)
+    for i in range(metadata.num_row_groups):
+        row_group = metadata.row_group(i)
+        for j in range(row_group.num_columns):
+            column = row_group.column(j)
+            stats = column.statistics
+            if stats is None or not stats.has_null_count:
+                return None
+            null_counts[column.path_in_schema] += stats.null_count
+    return metadata.num_rows, null_counts
+
+
+def iter_dataset_chunks(fp: Path, chunk_size: int) -> Iterator[DataFrame]:
+    """
+    Yield `fp` as DataFrames of at most `chunk_size` rows.
+
+    CSV files are read with pandas' chunked reader and parquet files batch by
+    batch through `pyarrow`, so only one chunk is held in memory at a time.
+    """
+    suffix = fp.suffix[1:]
+    if suffix == 'csv':
+        yield from pd.read_csv(fp, chunksize=chunk_size)
+    elif suffix == 'parquet':
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(fp)
+        for batch in parquet_file.iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        raise ValueError(f'utils.iter_dataset_chunks: Unsupported file {fp}')
+
+
+def downcast_dtypes(df: DataFrame, num_cols: list[str], flag_cols: list[str]) -> DataFrame:
+    """
+    Store `flag_cols` ('Yes'/'No' like columns) as `category` and `num_cols`
+    as float32 wherever that is lossless, i.e. every value survives the
+    float64 -> float32 -> float64 round trip (integer counts up to 2**24).
+
+    The dtypes are kept by `DataFrame.to_parquet` and read back as is.
+    """
+    df = df.copy(deep=False)
+    for col in flag_cols:
+        df[col] = df[col].astype('category')
+    for col in num_cols:
+        values = df[col].to_numpy(dtype=np.float64, na_value=np.nan)
+        as_float32 = values.astype(np.float32)
+        if np.array_equal(as_float32, values, equal_nan=True):
+            df[col] = as_float32
     return df
 
 
+def row_hashes(X, y, chunk_size: int = 1_000_000) -> np.ndarray:
+    """ uint64 hash of every (features, label) row, computed chunk by chunk. """
+    hashes = np.empty(len(X), dtype=np.uint64)
+    for start in range(0, len(X), chunk_size):
+        end = start + chunk_size
+        chunk = pd.DataFrame(np.asarray(X[start:end]))
+        chunk['label'] = np.asarray(y[start:end])
+        hashes[start:end] = pd.util.hash_pandas_object(chunk, index=False).to_numpy()
+    return hashes
+
+
+def memory_mb(df: DataFrame) -> float:
+    """ Memory held by `df`, including the contents of string columns, in MiB. """
+    return float(df.memory_usage(deep=True).sum()) / 1024**2
+
+
+def reset_peak_rss() -> bool:
+    """
+    Reset the peak RSS high-water mark of this process to its current RSS,
+    where Linux allows it. Returns whether it was reset; if not, the next
+    `peak_rss_mb` is the peak over the process lifetime.
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        return False
+    return True
+
+
+def peak_rss_mb() -> float | None:
+    """
+    Peak resident set size of this process in MiB, since the last
+    `reset_peak_rss` on Linux (`None` on Windows).
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux reports kilobytes
+    return peak / 1024**2 if sys.platform == 'darwin' else peak / 1024
+
+
 def to_yaml(fp: Path, data: dict):
-    fp.parent.mkdir(exist_ok=True)
+    fp.parent.mkdir(parents=True, exist_ok=True)
     with open(fp, 'w') as f:
         yaml.dump(data, f)
 
 
-def dump_object(fp: Path, obj: object) -> None:
-    logging.info('Dumping object at %s', fp)
-    fp.parent.mkdir(parents=True, exist_ok=True)
-    with open(fp, 'wb') as f:
-        dill.dump(obj, f)
+def dump_object(fp: Path, obj: object, fmt: serialization.Format = SERIALIZATION_FORMAT) -> None:
+    logging.info('Dumping object at %s as %s', fp, fmt)
+    digest = serialization.dump(fp, obj, fmt, SERIALIZATION_COMPRESS)
+    # `stage_cache` imports this module
+    from backorder.stage_cache import remember_file_fingerprint
+
+    remember_file_fingerprint(fp, digest)
 
 
 def load_object(fp: Path):
+    """ Load an object dumped in any `serialization` format, detected from the file. """
     logging.info('Loading object from %s', fp)
     if not fp.exists():
         raise FileNotFoundError(fp)
-    with open(fp, 'rb') as f:
-        return dill.load(f)
+    return serialization.load(fp)
+
 
+def dump_array(fp: Path, array, dtype=None):
+    """
+    Save `array` in `.npy` format, casting to `dtype` while writing.
 
-def dump_array(fp: Path, array):
+    The data is written straight into a memory-mapped file, so casting does
+    not allocate a second in-memory array. The `.npy` header is padded to a
+    64 byte boundary, which keeps the data aligned for `load_array(mmap_mode=...)`.
+    """
     logging.info('Dumping array at %s', fp)
-    with open(fp, "wb") as f:
-        np.save(f, array)
+    out = open_array(fp, array.shape, array.dtype if dtype is None else dtype)
+    out[...] = array
+    out.flush()
+    del out
+
+
+def open_array(fp: Path, shape: tuple, dtype) -> np.memmap:
+    """ Create a `.npy` file of `shape` and return it memory-mapped for writing. """
+    fp.parent.mkdir(parents=True, exist_ok=True)
+    # A new file, never writing into one that is hard-linked elsewhere
+    fp.unlink(missing_ok=True)
+    return np.lib.format.open_memmap(fp, mode='w+', dtype=dtype, shape=shape)
+
+
+def _reflink(src: Path, dst: Path) -> bool:
+    """ Copy-on-write clone of `src` (Btrfs, XFS, ...), `False` if unsupported. """
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    FICLONE = 0x40049409
+    with open(src, 'rb') as src_f, open(dst, 'wb') as dst_f:
+        try:
+            fcntl.ioctl(dst_f.fileno(), FICLONE, src_f.fileno())
+        except OSError:
+            return False
+    return True
+
+
+def link_or_copy(src: Path, dst: Path) -> str:
+    """
+    Place the file `src` at `dst` without reading it where the filesystem
+    allows: a hard link, else a reflink, else a byte copy. `dst` is
+    replaced atomically. Returns 'hardlink', 'reflink' or 'copy'.
+
+    Hard-linked files share their content, so files written by this
+    project are always replaced, never rewritten in place.
+    """
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dst.with_name(f'.{dst.name}.{os.getpid()}.tmp')
+    tmp.unlink(missing_ok=True)
+    try:
+        os.link(src, tmp)
+        method = 'hardlink'
+    except OSError:
+        method = 'reflink' if _reflink(src, tmp) else 'copy'
+        if method == 'copy':
+            shutil.copyfile(src, tmp)
+    os.replace(tmp, dst)
+    return method
 
 
-def load_array(fp: Path):
+def load_array(fp: Path, mmap_mode: str | None = None):
+    """ Load a `.npy` file; with `mmap_mode` the data is paged in lazily. """
     logging.info('Loading array from %s', fp)
-    with open(fp, "rb") as f:
-        return np.load(f)
+    return np.load(fp, mmap_mode=mmap_mode)
@@ -0,0 +1,53 @@
+""" Benchmark `CompiledForest` against sklearn's `RandomForestClassifier.predict`. """
+
+import sys
+from pathlib import Path
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backorder.components.model.compiled_forest import CompiledForest  # noqa: E402
+from backorder.config import TARGET_COLUMN  # noqa: E402
+
+DATA_FP = Path(__file__).resolve().parents[1] / 'data' / 'cleaned_back_order_data_5000.parquet'
+BATCH_SIZES = [1, 100, 10_000, 1_000_000]
+
+
+def best_of(func, X, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = perf_counter()
+        func(X)
+        timings.append(perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    df = pd.read_parquet(DATA_FP)
+    X = df.drop(columns=[TARGET_COLUMN]).to_numpy(dtype=np.float64)
+    y = df[TARGET_COLUMN].to_numpy()
+
+    # Same estimator as `ModelTrainer.initiate`
+    model = RandomForestClassifier(random_state=42).fit(X, y)
+    compiled = CompiledForest(model)
+
+    rng = np.random.default_rng(42)
+    X_all = X[rng.integers(0, len(X), size=max(BATCH_SIZES))]
+
+    print(f"{'batch':>10} {'sklearn (s)':>12} {'compiled (s)':>13} {'speedup':>8} {'identical':>10}")
+    for batch_size in BATCH_SIZES:
+        X_batch = X_all[:batch_size]
+        repeat = 1 if batch_size >= 1_000_000 else 5
+        identical = np.array_equal(model.predict(X_batch), compiled.predict(X_batch))
+        sklearn_sec = best_of(model.predict, X_batch, repeat)
+        compiled_sec = best_of(compiled.predict, X_batch, repeat)
+        print(f'{batch_size:>10} {sklearn_sec:>12.5f} {compiled_sec:>13.5f} '
+              f'{sklearn_sec / compiled_sec:>7.2f}x {str(identical):>10}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+Single-row request latency while a new model version is rolled out: the
+first request after the push loading it (`ModelCache.get`), against the
+background watcher loading, canary checking and swapping it.
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+from threading import Thread
+from time import perf_counter, sleep
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import LabelEncoder
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backorder import utils  # noqa: E402
+from backorder.components.data.transformation import DataTransformation  # noqa: E402
+from backorder.config import TARGET_COLUMN  # noqa: E402
+from backorder.model_registry import ModelRegistry  # noqa: E402
+from backorder.pipeline.model_cache import ModelCache  # noqa: E402
+from backorder.pipeline.row_scorer import get_row_scorer  # noqa: E402
+
+DATA_FP = Path(__file__).resolve().parents[1] / 'data' / 'cleaned_back_order_data_5000.parquet'
+CAT_COLS = ['potential_issue', 'deck_risk', 'oe_constraint', 'ppap_risk', 'stop_auto_buy', 'rev_stop']
+N_TREES = 300
+RUN_SEC = 4.0
+PUSH_AT_SEC = 1.0
+
+
+def store_version(registry: ModelRegistry, version: int, df: pd.DataFrame) -> None:
+    X, y = df.drop(columns=[TARGET_COLUMN]), df[TARGET_COLUMN]
+    num_cols = [col for col in X.columns if col not in CAT_COLS]
+    transformer = DataTransformation.get_transformer_object(num_cols, CAT_COLS).fit(X)
+    target_enc = LabelEncoder().fit(y)
+    model = RandomForestClassifier(N_TREES, random_state=version, n_jobs=-1)
+    model.fit(transformer.transform(X), target_enc.transform(y))
+
+    stored_dir = registry.version_dir(version)
+    utils.dump_object(stored_dir / 'model.pkl', model)
+    utils.dump_object(stored_dir / 'transformer.pkl', transformer)
+    utils.dump_object(stored_dir / 'target_encoder.pkl', target_enc)
+    df.head(256).to_parquet(stored_dir / 'canary.parquet', index=False)
+
+
+def serve(cache: ModelCache, records: list[dict], push) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Back to back single-row requests, pushing a new version after
+    `PUSH_AT_SEC`. Returns the latencies in ms and the request start times.
+    """
+    latencies, starts = [], []
+    start = perf_counter()
+    pushed = False
+    while perf_counter() - start < RUN_SEC:
+        if not pushed and perf_counter() - start > PUSH_AT_SEC:
+            Thread(target=push).start()
+            pushed = True
+        t = perf_counter()
+        get_row_scorer(cache.get()).predict([records[len(latencies) % len(records)]])
+        latencies.append(perf_counter() - t)
+        starts.append(t - start)
+        # Leave the interpreter to other threads, as a server between requests
+        sleep(0.0005)
+    return np.array(latencies) * 1000, np.array(starts)
+
+
+def main():
+    df = pd.read_parquet(DATA_FP)
+    for col in CAT_COLS + [TARGET_COLUMN]:
+        df[col] = df[col].map({0: 'No', 1: 'Yes'})
+    records = df.drop(columns=[TARGET_COLUMN]).astype(str).to_dict('records')
+
+    cwd = Path.cwd()
+    print(f"{'mode':>18} {'p50 ms':>7} {'p99 ms':>7} {'rollout p99':>12} {'max ms':>7}"
+          f" {'version':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            for mode in ['load on request', 'hot swap']:
+                root = Path(mode.replace(' ', '_'))
+                registry = ModelRegistry(root)
+                store_version(registry, 0, df)
+                registry.add(0)
+                store_version(registry, 1, df)
+
+                cache = ModelCache(root)
+                get_row_scorer(cache.get())
+                if mode == 'hot swap':
+                    cache.start_watcher(poll_sec=0.05)
+                latencies, starts = serve(cache, records, lambda: registry.add(1))
+                cache.stop_watcher()
+
+                # The second after the push, when the new version is loaded
+                rollout = latencies[(starts > PUSH_AT_SEC) & (starts < PUSH_AT_SEC + 1)]
+                print(f'{mode:>18} {np.percentile(latencies, 50):>7.3f} '
+                      f'{np.percentile(latencies, 99):>7.3f} {np.percentile(rollout, 99):>12.3f} '
+                      f'{latencies.max():>7.1f} {cache.get().version:>8}')
+        finally:
+            os.chdir(cwd)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Time and peak memory of importing a raw extract in `DataIngestion`:
+reading every column then dropping `sku`, versus pyarrow column projection
+(and a pushed-down row filter). Each mode runs in a fresh process so peak
+RSS is not shared between them.
+"""
+
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backorder import utils  # noqa: E402
+from backorder.config import TARGET_COLUMN  # noqa: E402
+from backorder.entity import DataIngestionConfig  # noqa: E402
+
+N_ROWS, N_FILES = 3_000_000, 4
+
+
+def make_raw_extract(dir: Path) -> None:
+    """ Directory of parquet files shaped like the raw SKU extract. """
+    config = DataIngestionConfig()
+    rng = np.random.default_rng(42)
+    rows_per_file = N_ROWS // N_FILES
+    for i in range(N_FILES):
+        df = pd.DataFrame({'sku': [f'SKU-{i}-{j:09d}' for j in range(rows_per_file)]})
+        for col in config.num_cols:
+            df[col] = rng.poisson(20, rows_per_file).astype('float64')
+        for col in config.cat_cols + [TARGET_COLUMN]:
+            df[col] = rng.choice(['Yes', 'No'], rows_per_file)
+        df.to_parquet(dir / f'part-{i}.parquet', index=False, row_group_size=100_000)
+
+
+def run(mode: str, dir: Path) -> None:
+    config = DataIngestionConfig()
+    columns = config.num_cols + config.cat_cols + [TARGET_COLUMN]
+    start = perf_counter()
+    if mode == 'all_columns':
+        # Previous `_import_data` + `_clean_df`
+        df = pd.concat([pd.read_parquet(fp) for fp in sorted(dir.glob('*.parquet'))])
+        df = df[:-1].drop(columns=['sku'])
+    elif mode == 'projection':
+        df = utils.read_dataset(dir, columns=columns)
+    else:
+        df = utils.read_dataset(dir, columns=columns, filters=[('lead_time', '<', 15)])
+    elapsed = perf_counter() - start
+    print(f'{mode:<22} {elapsed:>6.2f}s  peak RSS {utils.peak_rss_mb():>6.0f} MiB  rows {len(df):,}')
+
+
+def main():
+    if len(sys.argv) == 3:
+        run(sys.argv[1], Path(sys.argv[2]))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        make_raw_extract(Path(tmp))
+        for mode in ['all_columns', 'projection', 'projection_filter']:
+            subprocess.run([sys.executable, __file__, mode, tmp], check=True)
+
+
+if __name__ == '__main__':
+    main()
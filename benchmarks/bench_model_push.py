@@ -0,0 +1,80 @@
+"""
+Promotion time of `ModelPusher` for forests of growing size: the previous
+load + dump twice of every object, against linking the files into a
+staged version directory.
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backorder import utils  # noqa: E402
+from backorder.components.model.pusher import ModelPusher  # noqa: E402
+from backorder.entity import (DataTransformationArtifact,  # noqa: E402
+                              ModelTrainerArtifact, StoredModelConfig)
+
+N_ROWS = 200_000
+N_TREES = [10, 50, 100]
+
+
+def repickle_push(trf_artifact, trainer_artifact, out_dir: Path) -> None:
+    """ Previous `ModelPusher.initiate`. """
+    stored = StoredModelConfig()
+    transformer = utils.load_object(trf_artifact.transformer_pkl)
+    model = utils.load_object(trainer_artifact.model_path)
+    target_enc = utils.load_object(trf_artifact.target_enc_fp)
+    for dir in [out_dir, stored.new_dir_to_store_models]:
+        utils.dump_object(dir / 'transformer.pkl', transformer)
+        utils.dump_object(dir / 'model.pkl', model)
+        utils.dump_object(dir / 'target_encoder.pkl', target_enc)
+    utils.dump_array(stored.path_to_store_train_rows,
+                     utils.load_array(trainer_artifact.train_rows_path))
+    stored.registry.add(int(stored.new_dir_to_store_models.name))
+
+
+def main():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(N_ROWS, 21)).astype(np.float32)
+    y = (X[:, 0] + rng.normal(scale=1.0, size=N_ROWS) > 0).astype(int)
+
+    cwd = Path.cwd()
+    print(f"{'trees':>5} {'model MiB':>10} {'re-pickle s':>12} {'link s':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            trained = Path('trained')
+            utils.dump_object(trained / 'transformer.pkl', {'transformer': True})
+            utils.dump_object(trained / 'target_encoder.pkl', {'target_enc': True})
+            utils.dump_array(trained / 'train_rows.npy', np.arange(N_ROWS, dtype=np.uint64))
+            trf_artifact = DataTransformationArtifact(
+                trained / 'transformer.pkl', trained / 'target_encoder.pkl', *[None] * 4)
+            trainer_artifact = ModelTrainerArtifact(
+                trained / 'model.pkl', 1.0, 1.0, trained / 'train_rows.npy')
+
+            for n_trees in N_TREES:
+                model = RandomForestClassifier(n_trees, min_samples_leaf=5, n_jobs=-1).fit(X, y)
+                utils.dump_object(trainer_artifact.model_path, model)
+                del model
+                size = trainer_artifact.model_path.stat().st_size / 1024**2
+
+                start = perf_counter()
+                repickle_push(trf_artifact, trainer_artifact, Path('repickled'))
+                repickle_sec = perf_counter() - start
+
+                start = perf_counter()
+                ModelPusher(trf_artifact, trainer_artifact).initiate()
+                link_sec = perf_counter() - start
+                print(f'{n_trees:>5} {size:>10.1f} {repickle_sec:>12.3f} {link_sec:>8.3f}')
+        finally:
+            os.chdir(cwd)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+""" p50/p99 latency of the `/one_prediction` DataFrame path vs `RowScorer`. """
+
+import sys
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import LabelEncoder
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backorder.components.data.transformation import DataTransformation  # noqa: E402
+from backorder.config import TARGET_COLUMN  # noqa: E402
+from backorder.entity import StoredModelBundle  # noqa: E402
+from backorder.pipeline.row_scorer import RowScorer  # noqa: E402
+
+DATA_FP = Path(__file__).resolve().parents[1] / 'data' / 'cleaned_back_order_data_5000.parquet'
+CAT_COLS = ['potential_issue', 'deck_risk', 'oe_constraint', 'ppap_risk', 'stop_auto_buy', 'rev_stop']
+N_REQUESTS = 2000
+
+
+def build_bundle(df: pd.DataFrame) -> StoredModelBundle:
+    X, y = df.drop(columns=[TARGET_COLUMN]), df[TARGET_COLUMN]
+    num_cols = [col for col in X.columns if col not in CAT_COLS]
+    transformer = DataTransformation.get_transformer_object(num_cols, CAT_COLS).fit(X)
+    target_enc = LabelEncoder().fit(y)
+    model = RandomForestClassifier(random_state=42)
+    model.fit(transformer.transform(X), target_enc.transform(y))
+    return StoredModelBundle(0, model, transformer, target_enc)
+
+
+def dataframe_path(bundle: StoredModelBundle, form_data: dict, out_fp: Path):
+    """ What `/one_prediction` did before `RowScorer`. """
+    df = pd.DataFrame([form_data.values()], columns=list(form_data.keys()))
+    transformer = bundle.transformer
+    input_arr = transformer.transform(df[transformer.feature_names_in_])
+    prediction = bundle.model.predict(input_arr)
+    df['backorder_prediction'] = bundle.target_enc.inverse_transform(prediction.astype(int))
+    df.to_csv(out_fp, index=False)
+    return df['backorder_prediction'][0]
+
+
+def latencies_ms(func, records: list[dict]) -> np.ndarray:
+    timings = []
+    for record in records:
+        start = perf_counter()
+        func(record)
+        timings.append(perf_counter() - start)
+    return np.array(timings) * 1000
+
+
+def main():
+    df = pd.read_parquet(DATA_FP)
+    for col in CAT_COLS + [TARGET_COLUMN]:
+        df[col] = df[col].map({0: 'No', 1: 'Yes'})
+    bundle = build_bundle(df)
+    scorer = RowScorer(bundle)
+
+    # Form data arrives as strings
+    records = df.drop(columns=[TARGET_COLUMN]).astype(str).to_dict('records')[:N_REQUESTS]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        out_fp = Path(tmp) / 'pred.csv'
+        slow = [dataframe_path(bundle, record, out_fp) for record in records[:200]]
+        assert slow == scorer.predict(records[:200])
+
+        results = {
+            'DataFrame + sklearn': latencies_ms(
+                lambda record: dataframe_path(bundle, record, out_fp), records),
+            'RowScorer': latencies_ms(lambda record: scorer.predict([record]), records),
+        }
+
+    print(f"{'path':<22} {'p50 (ms)':>10} {'p99 (ms)':>10}")
+    for name, timings in results.items():
+        p50, p99 = np.percentile(timings, [50, 99])
+        print(f'{name:<22} {p50:>10.3f} {p99:>10.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+File size, dump time and load time of a 100-tree forest and the fitted
+transformer in every `backorder.serialization` format. Loads run in a
+fresh process that already imported sklearn, as a serving worker picking
+up a new model does, with the file in the page cache.
+"""
+
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backorder import serialization  # noqa: E402
+from backorder.components.data.transformation import DataTransformation  # noqa: E402
+from backorder.entity import DataIngestionConfig  # noqa: E402
+
+N_ROWS = 200_000
+# joblib level 9 is left out, it takes minutes to dump the forest
+FORMATS = [('dill', 0), ('joblib', 1), ('joblib', 3), ('pickle5', 0)]
+
+
+def build_objects() -> dict:
+    config = DataIngestionConfig()
+    rng = np.random.default_rng(42)
+    df = pd.DataFrame({col: rng.poisson(20, N_ROWS).astype('float64') for col in config.num_cols})
+    for col in config.cat_cols:
+        df[col] = rng.choice(['Yes', 'No'], N_ROWS)
+    y = (df[config.num_cols[0]] + rng.normal(0, 5, N_ROWS) > 22).astype(int)
+    transformer = DataTransformation.get_transformer_object(config.num_cols, config.cat_cols)
+    X = transformer.fit_transform(df)
+    model = RandomForestClassifier(100, min_samples_leaf=5, n_jobs=-1, random_state=0).fit(X, y)
+    return {'model': model, 'transformer': transformer}
+
+
+def load_seconds(fp: Path) -> float:
+    """ Best of three loads, each in a new interpreter with sklearn imported. """
+    code = (
+        'import sys; from time import perf_counter; from pathlib import Path\n'
+        f'sys.path.insert(0, {str(Path(__file__).resolve().parents[1])!r})\n'
+        'import sklearn.compose, sklearn.ensemble, sklearn.pipeline, sklearn.impute\n'
+        'from backorder import serialization\n'
+        'start = perf_counter(); serialization.load(Path(sys.argv[1]))\n'
+        'print(perf_counter() - start)'
+    )
+    return min(
+        float(subprocess.run([sys.executable, '-c', code, str(fp)],
+                             capture_output=True, text=True, check=True).stdout)
+        for _ in range(3)
+    )
+
+
+def main():
+    objects = build_objects()
+    print(f"{'object':<12} {'format':<10} {'size MiB':>9} {'dump s':>8} {'load s':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, obj in objects.items():
+            for fmt, compress in FORMATS:
+                label = f'{fmt}-{compress}' if fmt == 'joblib' else fmt
+                fp = Path(tmp) / f'{name}-{label}.pkl'
+                start = perf_counter()
+                serialization.dump(fp, obj, fmt, compress)
+                dump_sec = perf_counter() - start
+                size = fp.stat().st_size / 1024**2
+                print(f'{name:<12} {label:<10} {size:>9.2f} {dump_sec:>8.3f} {load_seconds(fp):>8.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Peak memory of handing the transformed training data to sklearn:
+`np.c_` + `np.save`/`np.load` versus separate memory-mapped `.npy` files.
+
+Each variant runs in a fresh process and reports its peak RSS above the
+input arrays, which counts the memory-mapped pages it touches as well.
+"""
+
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+from sklearn.utils import check_array
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backorder import utils  # noqa: E402
+
+N_ROWS, N_FEATURES = 2_000_000, 21
+
+
+def combined_npy(X, y, tmp: Path):
+    """ Previous layout: one array with the label as last column. """
+    fp = tmp / 'train.npz'
+    with open(fp, 'wb') as f:
+        np.save(f, np.c_[X, y])
+    with open(fp, 'rb') as f:
+        train_arr = np.load(f)
+    X_train, y_train = train_arr[:, :-1], train_arr[:, -1]
+    # What `RandomForestClassifier.fit` does with its input
+    return check_array(X_train, dtype=np.float32), y_train
+
+
+def memmapped_npy(X, y, tmp: Path):
+    utils.dump_array(tmp / 'train_X.npy', X, np.float32)
+    utils.dump_array(tmp / 'train_y.npy', y)
+    X_train = utils.load_array(tmp / 'train_X.npy', mmap_mode='r')
+    y_train = utils.load_array(tmp / 'train_y.npy', mmap_mode='r')
+    return check_array(X_train, dtype=np.float32), y_train
+
+
+VARIANTS = {
+    'np.c_ + np.save/np.load': combined_npy,
+    'separate memory-mapped .npy': memmapped_npy,
+}
+
+
+def run(name: str) -> None:
+    rng = np.random.default_rng(42)
+    # Output of `ColumnTransformer.transform` is float64
+    X = rng.random((N_ROWS, N_FEATURES))
+    y = rng.integers(0, 2, size=N_ROWS)
+    with tempfile.TemporaryDirectory() as tmp:
+        if not utils.reset_peak_rss():
+            sys.exit('Needs Linux, to reset the peak RSS after creating the inputs.')
+        inputs_mb = utils.peak_rss_mb()
+        VARIANTS[name](X, y, Path(tmp))
+        peak_mb = utils.peak_rss_mb() - inputs_mb
+    print(f'{name:<30} peak RSS above inputs: {peak_mb:>8.0f} MiB')
+
+
+def main():
+    if len(sys.argv) == 2:
+        run(sys.argv[1])
+        return
+
+    X_mb = N_ROWS * N_FEATURES * 8 / 1024**2
+    print(f'Transformed X: {X_mb:.0f} MiB ({N_ROWS:,} x {N_FEATURES})')
+    for name in VARIANTS:
+        subprocess.run([sys.executable, __file__, name], check=True)
+
+
+if __name__ == '__main__':
+    main()
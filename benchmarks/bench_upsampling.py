@@ -0,0 +1,92 @@
+"""
+Time and peak memory of rebalancing a 1:150 dataset: the previous
+`resample` + `np.concatenate` upsampling, index-based upsampling and
+upsampling expressed as sample weights.
+
+Each variant runs in a fresh process and reports its peak RSS above the
+input frame, so memory allocated outside Python's allocator counts too.
+"""
+
+import subprocess
+import sys
+from pathlib import Path
+from time import perf_counter
+
+import numpy as np
+from pandas import DataFrame, Series
+from sklearn.utils import resample
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backorder import utils  # noqa: E402
+from backorder.components.data import sampling  # noqa: E402
+from backorder.config import TARGET_COLUMN  # noqa: E402
+from backorder.entity import DataIngestionConfig  # noqa: E402
+
+N_ROWS = 300_000
+
+
+def concatenate_upsample(X: DataFrame, y: Series):
+    """ Previous `DataIngestion.upsample_data`. """
+    X_majority, X_minority = X[y == 'No'], X[y == 'Yes']
+    y_majority, y_minority = y[y == 'No'], y[y == 'Yes']
+    X_upsampled, y_upsampled = resample(
+        X_minority, y_minority, replace=True, n_samples=len(X_majority))
+    X_upsampled = np.concatenate((X_majority, X_upsampled))
+    y_upsampled = np.concatenate((y_majority, y_upsampled))
+    return DataFrame(X_upsampled, columns=X.columns), Series(y_upsampled, name=TARGET_COLUMN)
+
+
+def index_upsample(X: DataFrame, y: Series):
+    indices = sampling.upsample_indices(y)
+    return X.iloc[indices], y.iloc[indices]
+
+
+def weight_upsample(X: DataFrame, y: Series):
+    return sampling.upsample_weights(y)
+
+
+VARIANTS = {
+    'resample + np.concatenate': concatenate_upsample,
+    'index upsampling (iloc)': index_upsample,
+    'sample weights': weight_upsample,
+}
+
+
+def make_data() -> tuple[DataFrame, Series]:
+    config = DataIngestionConfig()
+    rng = np.random.default_rng(42)
+    df = DataFrame({col: rng.poisson(20, N_ROWS).astype('float64') for col in config.num_cols})
+    for col in config.cat_cols:
+        df[col] = rng.choice(['Yes', 'No'], N_ROWS)
+    df = utils.downcast_dtypes(df, config.num_cols, config.cat_cols)
+    y = Series(np.where(rng.random(N_ROWS) < 1 / 150, 'Yes', 'No'), name=TARGET_COLUMN)
+    return df, y
+
+
+def run(name: str) -> None:
+    X, y = make_data()
+    if not utils.reset_peak_rss():
+        sys.exit('Needs Linux, to reset the peak RSS after creating the inputs.')
+    inputs_mb = utils.peak_rss_mb()
+    start = perf_counter()
+    VARIANTS[name](X, y)
+    elapsed = perf_counter() - start
+    peak_mb = utils.peak_rss_mb() - inputs_mb
+    print(f'{name:<28} {elapsed:>7.2f}s  peak RSS above inputs {peak_mb:>7.0f} MiB')
+
+
+def main():
+    if len(sys.argv) == 2:
+        run(sys.argv[1])
+        return
+
+    df, y = make_data()
+    print(f'{N_ROWS:,} rows, {(y == "Yes").sum():,} minority; frame {utils.memory_mb(df):.0f} MiB')
+    del df, y
+    for name in VARIANTS:
+        subprocess.run([sys.executable, __file__, name], check=True)
+
+
+if __name__ == '__main__':
+    main()
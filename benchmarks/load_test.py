@@ -0,0 +1,73 @@
+"""
+Load test `/one_prediction` of a running server and report requests/sec and
+latency percentiles.
+
+Start both servers, then run the harness against each of them:
+
+    python app.py                                          # Flask, port 8501
+    hypercorn asgi_app:app --bind 127.0.0.1:8502           # ASGI
+    python benchmarks/load_test.py http://127.0.0.1:8501 http://127.0.0.1:8502
+"""
+
+import argparse
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from time import perf_counter
+from urllib.parse import urlencode
+from urllib.request import urlopen
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backorder.config import TARGET_COLUMN  # noqa: E402
+
+DATA_FP = Path(__file__).resolve().parents[1] / 'data' / 'cleaned_back_order_data_5000.parquet'
+CAT_COLS = ['potential_issue', 'deck_risk', 'oe_constraint', 'ppap_risk', 'stop_auto_buy', 'rev_stop']
+
+
+def load_payloads(n: int) -> list[bytes]:
+    df = pd.read_parquet(DATA_FP).drop(columns=[TARGET_COLUMN]).head(n)
+    for col in CAT_COLS:
+        df[col] = df[col].map({0: 'No', 1: 'Yes'})
+    return [urlencode(record).encode() for record in df.astype(str).to_dict('records')]
+
+
+def run(base_url: str, payloads: list[bytes], concurrency: int, n_requests: int) -> dict:
+    url = base_url.rstrip('/') + '/one_prediction'
+
+    def send(i: int) -> float:
+        start = perf_counter()
+        with urlopen(url, data=payloads[i % len(payloads)], timeout=30) as response:
+            response.read()
+        return perf_counter() - start
+
+    # Warm up the model cache before measuring
+    send(0)
+    start = perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        latencies = np.array(list(pool.map(send, range(n_requests)))) * 1000
+    elapsed = perf_counter() - start
+
+    p50, p99 = np.percentile(latencies, [50, 99])
+    return {'rps': n_requests / elapsed, 'p50_ms': p50, 'p99_ms': p99}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('urls', nargs='+', help='Base URLs of the servers to compare')
+    parser.add_argument('-c', '--concurrency', type=int, default=32)
+    parser.add_argument('-n', '--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    payloads = load_payloads(500)
+    print(f"{'server':<30} {'req/s':>9} {'p50 (ms)':>10} {'p99 (ms)':>10}")
+    for url in args.urls:
+        result = run(url, payloads, args.concurrency, args.requests)
+        print(f"{url:<30} {result['rps']:>9.1f} {result['p50_ms']:>10.2f} {result['p99_ms']:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
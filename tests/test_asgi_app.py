@@ -0,0 +1,109 @@
+""" Test the routes of the ASGI serving mode with Quart's test client. """
+
+import asyncio
+import io
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import LabelEncoder
+from werkzeug.datastructures import FileStorage
+
+from backorder import utils
+from backorder.components.data.transformation import DataTransformation
+from backorder.config import STORED_MODEL_PATH
+from backorder.model_registry import ModelRegistry
+from backorder.pipeline import prediction
+from backorder.pipeline.model_cache import ModelCache
+
+
+class TestAsgiApp(unittest.IsolatedAsyncioTestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.cwd = Path.cwd()
+        cls.tmp = tempfile.TemporaryDirectory()
+        os.chdir(cls.tmp.name)
+
+        rng = np.random.default_rng(0)
+        cls.df = pd.DataFrame({
+            'a': rng.normal(size=300),
+            'flag': rng.choice(['Yes', 'No'], size=300),
+        })
+        y = np.where(cls.df['a'] > 0, 'Yes', 'No')
+        transformer = DataTransformation.get_transformer_object(['a'], ['flag']).fit(cls.df)
+        target_enc = LabelEncoder().fit(y)
+        model = RandomForestClassifier(n_estimators=10, random_state=0).fit(
+            transformer.transform(cls.df), target_enc.transform(y))
+        registry = ModelRegistry(STORED_MODEL_PATH)
+        utils.dump_object(registry.version_dir(0) / 'model.pkl', model)
+        utils.dump_object(registry.version_dir(0) / 'transformer.pkl', transformer)
+        utils.dump_object(registry.version_dir(0) / 'target_encoder.pkl', target_enc)
+        registry.add(0)
+        cls.expected = target_enc.inverse_transform(
+            model.predict(transformer.transform(cls.df)))
+
+        # A cache of this registry only; forked executor workers inherit it
+        cls.patch_cache = mock.patch.object(
+            prediction, 'model_cache', ModelCache(STORED_MODEL_PATH))
+        cls.patch_cache.start()
+        import asgi_app
+        asgi_app.model_cache.stop_watcher()
+        cls.asgi_app = asgi_app
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.patch_cache.stop()
+        os.chdir(cls.cwd)
+        cls.tmp.cleanup()
+
+    def setUp(self):
+        self.client = self.asgi_app.app.test_client()
+
+    async def job_result(self, job_id: str, timeout: float = 60) -> dict:
+        """ Poll `/jobs/<job_id>` until the job has finished. """
+        for _ in range(int(timeout / 0.05)):
+            response = await self.client.get(f'/jobs/{job_id}')
+            self.assertEqual(response.status_code, 200)
+            data = await response.get_json()
+            if data['status'] not in ('queued', 'running'):
+                return data
+            await asyncio.sleep(0.05)
+        raise TimeoutError(f'Job {job_id} did not finish')
+
+    async def test_one_prediction(self):
+        record = self.df.iloc[0]
+        response = await self.client.post(
+            '/one_prediction', form={'a': str(record['a']), 'flag': record['flag']})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((await response.get_json())['backorder_prediction'], self.expected[0])
+
+    async def test_batch_prediction(self):
+        upload = FileStorage(io.BytesIO(self.df.to_csv(index=False).encode()),
+                             filename='input.csv')
+        response = await self.client.post('/batch_prediction', files={'file': upload})
+        self.assertEqual(response.status_code, 202)
+        job = await response.get_json()
+        self.assertEqual(job['kind'], 'batch_prediction')
+
+        data = await self.job_result(job['job_id'])
+        self.assertEqual(data['status'], 'succeeded', data.get('error'))
+        self.assertEqual(data['result']['n_rows'], len(self.df))
+        predicted = pd.read_csv(data['result']['prediction_path'].removeprefix('file://'))
+        np.testing.assert_array_equal(predicted['backorder_prediction'], self.expected)
+
+    async def test_batch_prediction_without_file(self):
+        response = await self.client.post('/batch_prediction')
+        self.assertEqual(await response.get_json(), {'error': 'No file uploaded'})
+
+    async def test_unknown_job(self):
+        response = await self.client.get('/jobs/unknown')
+        self.assertEqual(response.status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+""" Test the MicroBatcher request coalescer. """
+
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from backorder.serving import MicroBatcher
+
+
+def double(items):
+    if 'bad' in items:
+        raise ValueError('bad item')
+    return [item * 2 for item in items]
+
+
+class TestMicroBatcher(unittest.TestCase):
+    def test_results_match_callers(self):
+        batcher = MicroBatcher(double, max_batch_size=8, max_wait_ms=20)
+        with ThreadPoolExecutor(16) as pool:
+            results = list(pool.map(batcher.predict, range(64)))
+        self.assertEqual(results, [i * 2 for i in range(64)])
+
+        stats = batcher.stats()
+        self.assertEqual(stats['items'], 64)
+        self.assertLess(stats['batches'], 64)
+        self.assertLessEqual(max(stats['batch_sizes']), 8)
+
+    def test_failure_is_isolated(self):
+        batcher = MicroBatcher(double, max_batch_size=4, max_wait_ms=50)
+        good, bad = batcher.submit(1), batcher.submit('bad')
+        self.assertEqual(good.result(1), 2)
+        with self.assertRaises(ValueError):
+            bad.result(1)
+
+    def test_result_count_mismatch(self):
+        batcher = MicroBatcher(lambda items: items[:-1], max_batch_size=4, max_wait_ms=50)
+        futures = [batcher.submit(i) for i in range(3)]
+        for future in futures:
+            with self.assertRaises(ValueError):
+                future.result(1)
+
+    def test_base_exception_keeps_worker_alive(self):
+        def score(items):
+            if 'exit' in items:
+                raise SystemExit
+            return items
+
+        batcher = MicroBatcher(score, max_batch_size=1, max_wait_ms=0)
+        with self.assertRaises(SystemExit):
+            batcher.predict('exit', timeout=1)
+        self.assertEqual(batcher.predict('ok', timeout=1), 'ok')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+""" Test fitting the transformer from streamed chunk statistics. """
+
+import unittest
+
+import numpy as np
+from pandas import DataFrame
+
+from backorder.components.data.chunk_stats import ChunkStats
+from backorder.components.data.transformation import DataTransformation
+
+
+def fit_in_chunks(df: DataFrame, num_cols: list[str], cat_cols: list[str]):
+    """ `DataTransformation._fit_from_chunk_stats` over `df` streamed in chunks. """
+    stats = ChunkStats(num_cols, cat_cols, 'target')
+    for start in range(0, len(df), 300):
+        stats.update(df.iloc[start:start + 300])
+    # Only the column lists of the config are used
+    transformation = DataTransformation.__new__(DataTransformation)
+    transformation.num_cols, transformation.cat_cols = num_cols, cat_cols
+    trf_pipeline, target_enc = transformation._fit_from_chunk_stats(stats)
+    return stats, trf_pipeline, target_enc
+
+
+class TestChunkStats(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        rng = np.random.default_rng(0)
+        n_rows = 1_000
+        cls.df = DataFrame({
+            'a': rng.normal(size=n_rows),
+            'b': np.where(rng.random(n_rows) < 0.2, np.nan, rng.poisson(5, n_rows)),
+            'c': rng.choice(['x', 'y', 'z'], n_rows),
+            'target': rng.choice(['No', 'Yes'], n_rows),
+        })
+        cls.stats, cls.trf_pipeline, cls.target_enc = fit_in_chunks(cls.df, ['a', 'b'], ['c'])
+
+    def assert_matches_full_fit(self, df: DataFrame, trf_pipeline, num_cols, cat_cols):
+        X = df.drop(columns='target')
+        full = DataTransformation.get_transformer_object(num_cols, cat_cols).fit(X)
+        np.testing.assert_allclose(trf_pipeline.transform(X), full.transform(X))
+
+    def test_matches_full_fit(self):
+        self.assert_matches_full_fit(self.df, self.trf_pipeline, ['a', 'b'], ['c'])
+        np.testing.assert_array_equal(self.target_enc.classes_, ['No', 'Yes'])
+
+    def test_missing_categories(self):
+        df = self.df.assign(
+            # Missing values only in the chunks after the first one
+            c=self.df['c'].where(np.arange(len(self.df)) < 500),
+            d=np.nan,
+        )
+        _, trf_pipeline, _ = fit_in_chunks(df, ['a', 'b'], ['c', 'd'])
+        self.assert_matches_full_fit(df, trf_pipeline, ['a', 'b'], ['c', 'd'])
+
+    def test_counts(self):
+        self.assertEqual(self.stats.n_rows, len(self.df))
+        self.assertEqual(self.stats.feature_cols, ['a', 'b', 'c'])
+        self.assertEqual(self.stats.labels, {'No', 'Yes'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+""" Test the CompiledForest inference engine. """
+
+import unittest
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+from backorder.components.model.compiled_forest import CompiledForest
+
+
+class TestCompiledForest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        rng = np.random.default_rng(0)
+        cls.X = rng.normal(size=(500, 6))
+        y = (cls.X[:, 0] + rng.normal(scale=0.5, size=500) > 0).astype(int)
+        cls.model = RandomForestClassifier(n_estimators=20, random_state=0).fit(cls.X, y)
+        cls.compiled = CompiledForest(cls.model, block_size=64)
+
+    def test_identical_to_sklearn(self):
+        np.testing.assert_array_equal(
+            self.compiled.predict_proba(self.X), self.model.predict_proba(self.X))
+        np.testing.assert_array_equal(self.compiled.predict(self.X), self.model.predict(self.X))
+
+    def test_single_row(self):
+        np.testing.assert_array_equal(
+            self.compiled.predict(self.X[:1]), self.model.predict(self.X[:1]))
+
+    def test_wrong_shape(self):
+        with self.assertRaises(ValueError):
+            self.compiled.predict(self.X[:, :3])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+""" Test the DriftEngine class. """
+
+import unittest
+
+import numpy as np
+import pandas as pd
+from scipy.stats import ks_2samp
+
+from backorder.components.data.drift import DriftEngine
+
+
+class TestDriftEngine(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(42)
+        self.base_df = pd.DataFrame({
+            'tied': rng.integers(0, 10, 3000).astype(float),
+            'normal': rng.normal(size=3000),
+            'flag': rng.choice(['Yes', 'No'], 3000),
+        })
+        self.base_df.loc[::11, 'normal'] = np.nan
+        self.curr_df = pd.DataFrame({
+            'tied': rng.integers(0, 12, 1000).astype(float),
+            'normal': rng.normal(0.1, size=1000),
+            'flag': rng.choice(['Yes', 'No'], 1000),
+        })
+
+    def test_matches_ks_2samp(self):
+        report = DriftEngine(self.base_df).compare(self.curr_df)
+        for col in ['tied', 'normal']:
+            expected = ks_2samp(self.base_df[col].dropna(), self.curr_df[col], method='asymp')
+            self.assertAlmostEqual(report[col]['pvalues'], expected.pvalue)
+        self.assertFalse(report['tied']['same_distribution'])
+        self.assertIn('flag', report)
+
+    def test_sketch_close_to_exact(self):
+        exact = DriftEngine(self.base_df).compare(self.curr_df)
+        approx = DriftEngine(self.base_df, approx_rows=0, sketch_size=500).compare(self.curr_df)
+        for col in ['tied', 'normal']:
+            self.assertEqual(exact[col]['same_distribution'], approx[col]['same_distribution'])
+
+
+if __name__ == '__main__':
+    unittest.main()
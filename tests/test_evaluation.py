@@ -0,0 +1,87 @@
+""" Test the fitted transformer comparison and the metrics of ModelEvaluation. """
+
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import yaml
+from pandas import DataFrame
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import LabelEncoder
+
+from backorder import utils
+from backorder.components.data.transformation import DataTransformation
+from backorder.components.model.evaluation import ModelEvaluation, _equivalent
+from backorder.entity import (DataTransformationArtifact, ModelTrainerArtifact,
+                              StoredModelConfig)
+
+
+def _fit(df: DataFrame):
+    return DataTransformation.get_transformer_object(['a'], ['c']).fit(df)
+
+
+class TestEquivalentTransformers(unittest.TestCase):
+    def setUp(self):
+        self.df = DataFrame({'a': [1.0, np.nan, 3.0, 4.0], 'c': ['x', 'y', 'x', 'z']})
+
+    def test_same_fit(self):
+        self.assertTrue(_equivalent(_fit(self.df), _fit(self.df.copy())))
+
+    def test_different_ranges(self):
+        other = self.df.assign(a=self.df['a'] * 2)
+        self.assertFalse(_equivalent(_fit(self.df), _fit(other)))
+
+    def test_different_categories(self):
+        other = self.df.assign(c=['x', 'y', 'x', 'x'])
+        self.assertFalse(_equivalent(_fit(self.df), _fit(other)))
+
+
+class TestEvaluateStoredModel(unittest.TestCase):
+    def setUp(self):
+        self.cwd = Path.cwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def test_float_labelled_stored_model(self):
+        rng = np.random.default_rng(0)
+        df = DataFrame({'a': rng.normal(size=300), 'c': rng.choice(['x', 'y'], size=300)})
+        y = np.where(df['a'] > 0, 'Yes', 'No')
+        transformer = DataTransformation.get_transformer_object(['a'], ['c']).fit(df)
+        target_enc = LabelEncoder().fit(y)
+        X, codes = transformer.transform(df), target_enc.transform(y)
+
+        # Stored before labels were kept as integers: `classes_` is [0.0, 1.0]
+        old_model = RandomForestClassifier(3, random_state=0).fit(X, codes.astype(float))
+        stored = StoredModelConfig()
+        version_dir = stored.new_dir_to_store_models
+        utils.dump_object(version_dir / 'model.pkl', old_model)
+        utils.dump_object(version_dir / 'transformer.pkl', transformer)
+        utils.dump_object(version_dir / 'target_encoder.pkl', target_enc)
+        stored.registry.add(int(version_dir.name))
+
+        new_model = RandomForestClassifier(20, random_state=0).fit(X, codes)
+        utils.dump_array(Path('test_X.npy'), X)
+        utils.dump_array(Path('test_y.npy'), codes)
+        trf_artifact = DataTransformationArtifact(
+            None, None, None, None, Path('test_X.npy'), Path('test_y.npy'))
+        trainer_artifact = ModelTrainerArtifact(None, 1.0, 1.0, None)
+        evaluation = ModelEvaluation(None, trf_artifact, trainer_artifact,
+                                     new_model, transformer, target_enc)
+        try:
+            evaluation.initiate()
+        except Exception as e:
+            # Only the acceptance decision may fail, not the evaluation
+            self.assertIn('not better', str(e))
+        report = yaml.safe_load(evaluation.report_fp.read_text())
+        self.assertGreater(report['old']['accuracy'], 0.8)
+        self.assertTrue(report['shared_transform'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+""" Test the hyperparameter search of ModelTrainer. """
+
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import yaml
+from sklearn.utils.validation import check_is_fitted
+
+from backorder.components.model.trainer import ModelTrainer
+
+
+class TestFineTune(unittest.TestCase):
+    def setUp(self):
+        self.cwd = Path.cwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+        self.trainer = ModelTrainer()
+        self.trainer.search_space = {'n_estimators': [5, 10], 'max_depth': [2, None]}
+        self.trainer.search_n_candidates = 4
+        self.trainer.search_factor = 2
+        self.trainer.search_cv = 2
+        self.trainer.n_jobs = 1
+
+        rng = np.random.default_rng(0)
+        self.X = rng.normal(size=(400, 4)).astype(np.float32)
+        self.y = (self.X[:, 0] + self.X[:, 1] > 0).astype(np.int64)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def test_writes_report_and_returns_fitted_model(self):
+        model = self.trainer._fine_tune(self.X, self.y)
+        check_is_fitted(model)
+        report = yaml.safe_load(self.trainer.search_report_fp.read_text())
+        self.assertEqual(model.get_params()['max_depth'], report['best_params']['max_depth'])
+        self.assertEqual(len(model.estimators_), report['best_params']['n_estimators'])
+        self.assertTrue(report['candidates'])
+
+    def test_reproducible(self):
+        first = self.trainer._fine_tune(self.X, self.y)
+        second = self.trainer._fine_tune(self.X, self.y)
+        self.assertEqual(first.get_params(), second.get_params())
+        np.testing.assert_array_equal(first.predict_proba(self.X), second.predict_proba(self.X))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+""" Test growing the stored forest in ModelTrainer's incremental mode. """
+
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import yaml
+from sklearn.ensemble import RandomForestClassifier
+
+from backorder import utils
+from backorder.components.model.trainer import ModelTrainer
+from backorder.entity import StoredModelConfig
+
+
+def make_data(n_rows: int, seed: int):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n_rows, 4)).astype(np.float32)
+    y = (X[:, 0] > 0).astype(np.int64)
+    return X, y
+
+
+class TestIncrementalTraining(unittest.TestCase):
+    def setUp(self):
+        self.cwd = Path.cwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+        self.trainer = ModelTrainer()
+        self.trainer.sampling = 'none'
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def test_grow_stored_model(self):
+        X, y = make_data(300, 0)
+        model = RandomForestClassifier(10, random_state=0).fit(X, y)
+        kept = model.estimators_[2:]
+        self.trainer.incremental_refresh_fraction = 0.2
+        self.trainer.incremental_add_fraction = 0.3
+
+        X_new, y_new = make_data(100, 1)
+        grown = self.trainer._grow_stored_model(model, X_new, y_new)
+        self.assertEqual(len(grown.estimators_), 13)
+        # The oldest two trees are replaced, the others are kept as they are
+        self.assertTrue(all(a is b for a, b in zip(grown.estimators_, kept)))
+        self.assertFalse(grown.warm_start)
+
+    def store(self, model, train_rows: np.ndarray, transformer: dict,
+              metrics: dict | None = None) -> Path:
+        stored = StoredModelConfig()
+        version_dir = stored.new_dir_to_store_models
+        utils.dump_object(version_dir / 'model.pkl', model)
+        utils.dump_object(version_dir / 'transformer.pkl', transformer)
+        utils.dump_array(version_dir / 'train_rows.npy', train_rows)
+        stored.registry.add(int(version_dir.name), metrics=metrics)
+        return version_dir / 'transformer.pkl'
+
+    def test_incremental_fit_on_new_rows(self):
+        X_old, y_old = make_data(300, 0)
+        X_new, y_new = make_data(100, 1)
+        X_test, y_test = make_data(100, 2)
+        stored_transformer = self.store(
+            RandomForestClassifier(10, random_state=0).fit(X_old, y_old),
+            utils.row_hashes(X_old, y_old), {'transformer': 0})
+
+        X_train, y_train = np.vstack([X_old, X_new]), np.concatenate([y_old, y_new])
+        train_rows = utils.row_hashes(X_train, y_train)
+        model = self.trainer._incremental_fit(
+            X_train, X_test, y_train, y_test, train_rows, stored_transformer)
+
+        self.assertEqual(len(model.estimators_), 12)
+        report = yaml.safe_load(self.trainer.incremental_report_fp.read_text())
+        self.assertEqual(report['n_new_rows'], 100)
+        self.assertIn('accuracy_gain', report)
+        # No full fit recorded for the stored version, and measuring one is opt-in
+        self.assertNotIn('estimated_speedup', report)
+        self.assertNotIn('full_sec', report)
+
+        self.trainer.incremental_compare_full = True
+        self.trainer._incremental_fit(
+            X_train, X_test, y_train, y_test, train_rows, stored_transformer)
+        report = yaml.safe_load(self.trainer.incremental_report_fp.read_text())
+        self.assertIn('speedup', report)
+
+    def test_estimated_speedup(self):
+        X_old, y_old = make_data(300, 0)
+        X_new, y_new = make_data(100, 1)
+        stored_transformer = self.store(
+            RandomForestClassifier(10, random_state=0).fit(X_old, y_old),
+            utils.row_hashes(X_old, y_old), {'transformer': 0},
+            metrics={'full_fit_sec_per_row': 0.001})
+
+        X_train, y_train = np.vstack([X_old, X_new]), np.concatenate([y_old, y_new])
+        self.trainer._incremental_fit(X_train, X_new, y_train, y_new,
+                                      utils.row_hashes(X_train, y_train), stored_transformer)
+        report = yaml.safe_load(self.trainer.incremental_report_fp.read_text())
+        self.assertAlmostEqual(report['estimated_full_sec'], 0.4)
+        self.assertGreater(report['estimated_speedup'], 0)
+
+    def test_incremental_fit_needs_same_transformer(self):
+        X, y = make_data(300, 0)
+        self.store(RandomForestClassifier(10, random_state=0).fit(X, y),
+                   utils.row_hashes(X, y), {'transformer': 0})
+        utils.dump_object(Path('transformer.pkl'), {'transformer': 1})
+        self.assertIsNone(self.trainer._incremental_fit(
+            X, X, y, y, utils.row_hashes(X, y), Path('transformer.pkl')))
+
+
+if __name__ == '__main__':
+    unittest.main()
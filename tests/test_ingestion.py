@@ -0,0 +1,54 @@
+""" Test the train/test split of DataIngestion. """
+
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+from pandas import DataFrame, concat
+
+from backorder.components.data.ingestion import DataIngestion
+from backorder.config import TARGET_COLUMN
+
+
+def make_df(n_rows: int, seed: int) -> DataFrame:
+    rng = np.random.default_rng(seed)
+    return DataFrame({
+        'a': rng.normal(size=n_rows),
+        'flag': rng.choice(['Yes', 'No'], n_rows),
+        TARGET_COLUMN: rng.choice(['Yes', 'No'], n_rows),
+    })
+
+
+class TestSplit(unittest.TestCase):
+    def setUp(self):
+        self.cwd = Path.cwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+        self.ingestion = DataIngestion()
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def test_rows_stay_on_their_side(self):
+        df = make_df(2_000, 0)
+        train_df, test_df = self.ingestion.split_data(df)
+        self.assertEqual(len(train_df) + len(test_df), len(df))
+        self.assertAlmostEqual(len(test_df) / len(df), self.ingestion.test_size, delta=0.03)
+
+        # A later run on more rows, in another order
+        more = concat([df, make_df(500, 1)]).sample(frac=1, random_state=0)
+        more_train, more_test = self.ingestion.split_data(more)
+        self.assertTrue(set(train_df['a']) <= set(more_train['a']))
+        self.assertTrue(set(test_df['a']) <= set(more_test['a']))
+
+    def test_copies_share_a_side(self):
+        df = make_df(200, 0)
+        train_df, test_df = self.ingestion.split_data(concat([df, df]))
+        self.assertFalse(set(train_df['a']) & set(test_df['a']))
+
+
+if __name__ == '__main__':
+    unittest.main()
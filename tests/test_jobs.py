@@ -0,0 +1,36 @@
+""" Test the in-memory JobStore. """
+
+import unittest
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from backorder.serving import Job, JobStore
+
+
+class TestJobStore(unittest.TestCase):
+    def test_submit_and_get(self):
+        jobs = JobStore()
+        with ThreadPoolExecutor(1) as executor:
+            job = jobs.submit(executor, 'double', lambda x: 2 * x, 21)
+            self.assertEqual(job.future.result(5), 42)
+        self.assertIs(jobs.get(job.id), job)
+        self.assertIsNone(jobs.get('unknown'))
+
+        data = job.to_dict()
+        self.assertEqual((data['status'], data['result']), ('succeeded', 42))
+        self.assertIsNotNone(data['finished_at'])
+
+    def test_failed_job(self):
+        job = JobStore().add(Job('fail', Future()))
+        self.assertEqual(job.status, 'queued')
+        job.future.set_exception(ValueError('bad input'))
+        self.assertEqual(job.to_dict()['error'], 'bad input')
+
+    def test_evicts_oldest(self):
+        jobs = JobStore(max_jobs=2)
+        added = [jobs.add(Job('noop', Future())) for _ in range(3)]
+        self.assertIsNone(jobs.get(added[0].id))
+        self.assertEqual([jobs.get(job.id) for job in added[1:]], added[1:])
+
+
+if __name__ == '__main__':
+    unittest.main()
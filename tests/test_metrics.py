@@ -0,0 +1,44 @@
+""" Test the Prometheus text-format metrics. """
+
+import unittest
+
+from backorder import metrics
+from backorder.metrics import MetricsRegistry
+
+
+class TestMetrics(unittest.TestCase):
+    def test_histogram_is_cumulative(self):
+        registry = MetricsRegistry()
+        histogram = registry.histogram('latency_seconds', 'Latency.', ('method',), (0.1, 1.0))
+        for value in [0.05, 0.5, 0.5, 5.0]:
+            histogram.labels('a').observe(value)
+        text = registry.render()
+        self.assertIn('# TYPE latency_seconds histogram', text)
+        self.assertIn('latency_seconds_bucket{method="a",le="0.1"} 1', text)
+        self.assertIn('latency_seconds_bucket{method="a",le="1.0"} 3', text)
+        self.assertIn('latency_seconds_bucket{method="a",le="+Inf"} 4', text)
+        self.assertIn('latency_seconds_count{method="a"} 4', text)
+        self.assertIn('latency_seconds_sum{method="a"} 6.05', text)
+
+    def test_counter_gauge_and_function(self):
+        registry = MetricsRegistry()
+        registry.counter('calls_total', 'Calls.', ('path',)).labels('x"y').inc(2)
+        registry.gauge('version', 'Version.').set_function(lambda: None)
+        text = registry.render()
+        self.assertIn('calls_total{path="x\\"y"} 2.0', text)
+        self.assertIn('version NaN', text)
+        with self.assertRaises(ValueError):
+            registry.counter('calls_total', 'Again.')
+
+    def test_track_request_counts_errors(self):
+        before = metrics.PREDICTION_SECONDS.labels('test_method').sum
+        with self.assertRaises(KeyError):
+            with metrics.track_request('test_method', 3):
+                raise KeyError
+        self.assertEqual(metrics.PREDICTION_ERRORS.labels('test_method').value, 1)
+        self.assertEqual(metrics.PREDICTION_ROWS.labels('test_method').sum, 3)
+        self.assertGreater(metrics.PREDICTION_SECONDS.labels('test_method').sum, before)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,157 @@
+""" Test the ModelCache class. """
+
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import LabelEncoder
+
+from backorder import metrics, utils
+from backorder.components.data.transformation import DataTransformation
+from backorder.config import TARGET_COLUMN
+from backorder.model_registry import ModelRegistry
+from backorder.pipeline.model_cache import CanaryFailed, ModelCache
+
+
+def store_version(registry: Path, version: int) -> None:
+    index = ModelRegistry(registry)
+    for name in ['model.pkl', 'transformer.pkl', 'target_encoder.pkl']:
+        utils.dump_object(registry / str(version) / name, {'version': version})
+    index.add(version)
+
+
+def store_trained_version(registry: Path, version: int, flip_labels: bool = False) -> None:
+    """ Real model bundle and canary rows; `flip_labels` trains a useless model. """
+    index = ModelRegistry(registry)
+    rng = np.random.default_rng(version)
+    df = pd.DataFrame({'a': rng.normal(size=200), 'flag': rng.choice(['Yes', 'No'], size=200)})
+    y = np.where(df['a'] > 0, 'Yes', 'No')
+    train_y = np.where(y == 'Yes', 'No', 'Yes') if flip_labels else y
+
+    transformer = DataTransformation.get_transformer_object(['a'], ['flag']).fit(df)
+    target_enc = LabelEncoder().fit(y)
+    model = RandomForestClassifier(n_estimators=5, random_state=0).fit(
+        transformer.transform(df), target_enc.transform(train_y))
+
+    stored_dir = registry / str(version)
+    utils.dump_object(stored_dir / 'model.pkl', model)
+    utils.dump_object(stored_dir / 'transformer.pkl', transformer)
+    utils.dump_object(stored_dir / 'target_encoder.pkl', target_enc)
+    df.assign(**{TARGET_COLUMN: y}).to_parquet(stored_dir / 'canary.parquet', index=False)
+    index.add(version)
+
+
+class TestModelCache(unittest.TestCase):
+    def setUp(self):
+        self.cwd = Path.cwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+        self.registry = Path('stored_models')
+        self.registry.mkdir()
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def test_loads_once(self):
+        store_version(self.registry, 0)
+        cache = ModelCache(self.registry)
+        first = cache.get()
+        second = cache.get()
+        self.assertIs(first, second)
+        self.assertEqual(cache.stats(), {'hits': 1, 'misses': 1, 'reloads': 0, 'version': 0})
+
+    def test_reloads_newer_version(self):
+        store_version(self.registry, 0)
+        cache = ModelCache(self.registry)
+        cache.get()
+        store_version(self.registry, 1)
+        bundle = cache.get()
+        self.assertEqual(bundle.version, 1)
+        self.assertEqual(bundle.model, {'version': 1})
+        self.assertEqual(cache.reloads, 1)
+
+    def test_no_model(self):
+        with self.assertRaises(FileNotFoundError):
+            ModelCache(self.registry).get()
+
+
+class TestHotSwap(unittest.TestCase):
+    def setUp(self):
+        self.cwd = Path.cwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+        self.registry = Path('stored_models')
+        store_trained_version(self.registry, 0)
+        self.cache = ModelCache(self.registry)
+        self.cache.get()
+
+    def tearDown(self):
+        self.cache.stop_watcher()
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def test_refresh_swaps_valid_version(self):
+        old = self.cache.get()
+        store_trained_version(self.registry, 1)
+        self.assertTrue(self.cache.refresh())
+        self.assertEqual(self.cache.get().version, 1)
+        # Built by the canary check, not by the first request
+        self.assertIsNotNone(self.cache.get().row_scorer)
+        # A request still holding the old bundle is unaffected
+        self.assertEqual(old.version, 0)
+        self.assertFalse(self.cache.refresh())
+
+    def test_rejects_version_failing_canary(self):
+        rejected = metrics.MODEL_SWAPS.labels('rejected')
+        n_rejected = rejected.value
+        store_trained_version(self.registry, 1, flip_labels=True)
+        self.assertFalse(self.cache.refresh())
+        self.assertEqual(self.cache.get().version, 0)
+        self.assertEqual(rejected.value, n_rejected + 1)
+        # Not retried until the registry changes
+        self.assertFalse(self.cache.refresh())
+        self.assertEqual(rejected.value, n_rejected + 1)
+        # Rolled back for every other reader of the registry
+        self.assertEqual(ModelRegistry(self.registry).current_version(), 0)
+        self.assertEqual(ModelCache(self.registry).get().version, 0)
+
+    def test_rejected_first_version_is_not_served(self):
+        store_trained_version(self.registry, 1)
+        # Canary rows the bundle cannot score
+        pd.DataFrame({'a': [0.0]}).to_parquet(self.registry / '1' / 'canary.parquet')
+        cache = ModelCache(self.registry)
+        cache.start_watcher(poll_sec=3600)
+        try:
+            self.assertFalse(cache.refresh())
+            with self.assertRaises(CanaryFailed):
+                cache.get()
+            # The next version pushed is served as usual
+            store_trained_version(self.registry, 2)
+            self.assertEqual(cache.get().version, 2)
+        finally:
+            cache.stop_watcher()
+
+    def test_rollback_keeps_newer_push(self):
+        store_trained_version(self.registry, 1, flip_labels=True)
+        store_trained_version(self.registry, 2)
+        # Version 1 is rejected after version 2 was already pushed
+        self.assertFalse(ModelRegistry(self.registry).set_current(0, expected=1))
+        self.assertEqual(ModelRegistry(self.registry).current_version(), 2)
+
+    def test_watcher_swaps_in_background(self):
+        self.cache.start_watcher(poll_sec=0.01)
+        store_trained_version(self.registry, 1)
+        deadline = time.monotonic() + 10
+        while self.cache.get().version != 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.cache.get().version, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
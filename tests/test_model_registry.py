@@ -0,0 +1,116 @@
+""" Test the ModelRegistry index of stored versions. """
+
+import hashlib
+import os
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import yaml
+
+from backorder.model_registry import (ModelRegistry, change_counter,
+                                      verify_stored_files)
+
+
+def open_registry(root: str) -> list[int]:
+    return ModelRegistry(Path(root)).versions()
+
+
+class TestModelRegistry(unittest.TestCase):
+    def setUp(self):
+        self.cwd = Path.cwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+        self.root = Path('stored_models')
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def store(self, registry: ModelRegistry, version: int) -> None:
+        registry.version_dir(version).mkdir()
+        registry.add(version, files={'model.pkl': {'bytes': 10}}, metrics={'test_score': 0.9})
+
+    def test_imports_existing_directories(self):
+        for name in ['0', '2', '.staging-3-1', 'notes']:
+            (self.root / name).mkdir(parents=True)
+        (self.root / '2' / 'manifest.yaml').write_text(
+            yaml.dump({'created': '2026-01-01T00:00:00', 'files': {'model.pkl': {'bytes': 7}}}))
+        registry = ModelRegistry(self.root)
+        self.assertEqual(registry.versions(), [0, 2])
+        self.assertEqual(registry.current_version(), 2)
+        self.assertEqual(registry.next_version(), 3)
+        self.assertEqual(registry.get(2)['artifact_bytes'], 7)
+
+    def test_concurrent_import(self):
+        for version in range(20):
+            (self.root / str(version)).mkdir(parents=True)
+        with ProcessPoolExecutor(4) as pool:
+            results = list(pool.map(open_registry, [str(self.root.absolute())] * 8))
+        self.assertEqual(results, [list(range(20))] * 8)
+        self.assertEqual(ModelRegistry(self.root).current_version(), 19)
+
+    def test_failed_import_is_retried(self):
+        (self.root / '0').mkdir(parents=True)
+        manifest_fp = self.root / '0' / 'manifest.yaml'
+        manifest_fp.write_text('files: [unclosed')
+        with self.assertRaises(yaml.YAMLError):
+            ModelRegistry(self.root)
+        manifest_fp.write_text(yaml.dump({'files': {'model.pkl': {'bytes': 3}}}))
+        registry = ModelRegistry(self.root)
+        self.assertEqual(registry.versions(), [0])
+        self.assertEqual(registry.get(0)['artifact_bytes'], 3)
+
+    def test_reserved_versions_are_unique(self):
+        registry = ModelRegistry(self.root)
+        self.store(registry, 0)
+        self.assertEqual([registry.reserve_version() for _ in range(2)], [1, 2])
+        # Another process sees the reservations
+        self.assertEqual(ModelRegistry(self.root).next_version(), 3)
+        registry.version_dir(5).mkdir()
+        self.assertEqual(registry.reserve_version(), 6)
+        self.assertEqual(registry.versions(), [0])
+
+    def test_verify_stored_files(self):
+        stored_dir = self.root / '0'
+        stored_dir.mkdir(parents=True)
+        (stored_dir / 'model.pkl').write_bytes(b'model')
+        # Stored before manifests: loaded unchecked
+        verify_stored_files(stored_dir, ['model.pkl'])
+
+        (stored_dir / 'manifest.yaml').write_text(yaml.safe_dump({'files': {'model.pkl': {
+            'sha256': hashlib.sha256(b'model').hexdigest()}}}))
+        verify_stored_files(stored_dir, ['model.pkl'])
+        with self.assertRaisesRegex(ValueError, 'not listed'):
+            verify_stored_files(stored_dir, ['transformer.pkl'])
+        (stored_dir / 'model.pkl').write_bytes(b'other model')
+        with self.assertRaisesRegex(ValueError, 'does not match'):
+            verify_stored_files(stored_dir, ['model.pkl'])
+
+    def test_gc_keeps_newest_and_served_versions(self):
+        registry = ModelRegistry(self.root)
+        for version in range(5):
+            self.store(registry, version)
+        registry.set_current(1)
+        self.assertEqual(registry.gc(keep_last=2), [0, 2])
+        self.assertEqual(registry.versions(), [1, 3, 4])
+        self.assertFalse(registry.version_dir(0).exists())
+        # Removed versions keep their metadata and their number
+        self.assertIsNotNone(registry.get(0)['removed'])
+        self.assertEqual(registry.next_version(), 5)
+        with self.assertRaises(ValueError):
+            registry.set_current(0)
+
+    def test_change_counter_moves_on_writes_only(self):
+        registry = ModelRegistry(self.root)
+        before = change_counter(registry.db_path)
+        registry.versions()
+        registry.current_dir()
+        self.assertEqual(change_counter(registry.db_path), before)
+        self.store(registry, 0)
+        self.assertNotEqual(change_counter(registry.db_path), before)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+""" Test the chunked prediction paths against a single batch_prediction. """
+
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import LabelEncoder
+
+from backorder import utils
+from backorder.components.data.transformation import DataTransformation
+from backorder.config import PREDICTION_DIR, STORED_MODEL_PATH
+from backorder.model_registry import ModelRegistry
+from backorder.pipeline import prediction
+from backorder.pipeline.model_cache import ModelCache
+from backorder.pipeline.prediction import Prediction
+
+
+def store_model(version: int, df: pd.DataFrame, y: np.ndarray) -> None:
+    transformer = DataTransformation.get_transformer_object(['a', 'b'], ['flag']).fit(df)
+    target_enc = LabelEncoder().fit(y)
+    model = RandomForestClassifier(n_estimators=10, random_state=version).fit(
+        transformer.transform(df), target_enc.transform(y))
+
+    registry = ModelRegistry(STORED_MODEL_PATH)
+    stored_dir = registry.version_dir(version)
+    utils.dump_object(stored_dir / 'model.pkl', model)
+    utils.dump_object(stored_dir / 'transformer.pkl', transformer)
+    utils.dump_object(stored_dir / 'target_encoder.pkl', target_enc)
+    registry.add(version)
+
+
+class TestPrediction(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.cwd = Path.cwd()
+        cls.tmp = tempfile.TemporaryDirectory()
+        os.chdir(cls.tmp.name)
+        PREDICTION_DIR.mkdir()
+        # A cache of this registry only, not the module level one other tests load
+        cls.patch_cache = mock.patch.object(
+            prediction, 'model_cache', ModelCache(STORED_MODEL_PATH))
+        cls.patch_cache.start()
+
+        rng = np.random.default_rng(0)
+        cls.df = pd.DataFrame({
+            'a': rng.normal(size=1_000),
+            'b': np.where(rng.random(1_000) < 0.1, np.nan, rng.poisson(3, 1_000)),
+            'flag': rng.choice(['Yes', 'No'], size=1_000),
+        })
+        store_model(0, cls.df, np.where(cls.df['a'] + rng.normal(size=1_000) > 0, 'Yes', 'No'))
+        cls.prediction = Prediction()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.patch_cache.stop()
+        os.chdir(cls.cwd)
+        cls.tmp.cleanup()
+
+    def batch_output(self, df: pd.DataFrame) -> pd.DataFrame:
+        return pd.read_csv(self.prediction.batch_prediction(df=df.copy()))
+
+    def test_matches_batch_prediction(self):
+        expected = self.batch_output(self.df)
+        for suffix in ['csv', 'parquet']:
+            fp = Path(f'input.{suffix}')
+            getattr(self.df, f'to_{suffix}')(fp, index=False)
+            artifact = self.prediction.stream_prediction(fp, Path('out.csv'), chunk_size=128)
+
+            self.assertEqual((artifact.n_rows, artifact.n_chunks), (1_000, 8))
+            pd.testing.assert_frame_equal(pd.read_csv(artifact.prediction_fp), expected)
+
+    def test_peak_rss_of_the_call(self):
+        self.df.to_parquet('input.parquet', index=False)
+        # Raises the process peak well above what streaming the file needs
+        large = np.ones(256 * 1024**2 // 8)
+        process_peak = utils.peak_rss_mb()
+        del large
+        artifact = self.prediction.stream_prediction(Path('input.parquet'), Path('out.csv'))
+        if artifact.peak_rss_scope != 'call':
+            self.skipTest('The peak RSS cannot be reset on this platform.')
+        self.assertLess(artifact.peak_rss_mb, process_peak - 128)
+
+    def test_empty_input(self):
+        expected = self.batch_output(self.df.head(0))
+        for suffix in ['csv', 'parquet']:
+            fp = Path(f'empty.{suffix}')
+            getattr(self.df.head(0), f'to_{suffix}')(fp, index=False)
+            out_fp = Path('out.csv')
+            out_fp.write_text('stale\n1\n')
+            artifact = self.prediction.stream_prediction(fp, out_fp, chunk_size=128)
+
+            self.assertEqual(artifact.n_rows, 0)
+            pd.testing.assert_frame_equal(pd.read_csv(out_fp), expected)
+
+    def test_parallel_matches_batch_prediction(self):
+        expected = self.batch_output(self.df)
+        self.df.to_parquet('input.parquet', index=False)
+        for data in [self.df.copy(), Path('input.parquet')]:
+            artifact = self.prediction.parallel_prediction(
+                data, Path('out.csv'), n_workers=2, shard_size=128)
+
+            self.assertEqual((artifact.n_rows, artifact.n_chunks), (1_000, 8))
+            pd.testing.assert_frame_equal(pd.read_csv(artifact.prediction_fp), expected)
+
+        artifact = self.prediction.parallel_prediction(self.df.head(0), Path('out.csv'))
+        self.assertEqual(artifact.n_rows, 0)
+        pd.testing.assert_frame_equal(pd.read_csv(artifact.prediction_fp),
+                                      self.batch_output(self.df.head(0)))
+
+    def test_worker_pins_version(self):
+        # A version pushed after the call started is not picked up by workers
+        store_model(1, self.df, np.where(self.df['a'] > 0, 'No', 'Yes'))
+        try:
+            prediction._init_worker(STORED_MODEL_PATH / '0')
+            self.assertEqual(prediction._worker_bundle.version, 0)
+        finally:
+            ModelRegistry(STORED_MODEL_PATH).set_current(0)
+            prediction._worker_bundle = None
+
+
+if __name__ == '__main__':
+    unittest.main()
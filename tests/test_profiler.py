@@ -0,0 +1,42 @@
+""" Test the per-stage StageProfiler. """
+
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from backorder.profiler import StageProfiler
+
+
+class TestStageProfiler(unittest.TestCase):
+    def test_records_stage(self):
+        profiler = StageProfiler()
+        with profiler.stage('alloc') as record:
+            np.ones(1_000_000).sum()
+            record['rows_in'] = 10
+        record = profiler.records['alloc']
+        self.assertEqual(record['status'], 'ok')
+        self.assertEqual(record['rows_in'], 10)
+        self.assertGreater(record['wall_sec'], 0)
+        self.assertGreaterEqual(record['cpu_sec'], 0)
+        self.assertEqual(profiler.report()['stages'][0]['stage'], 'alloc')
+
+    def test_failed_stage_is_recorded(self):
+        profiler = StageProfiler()
+        with self.assertRaises(ValueError):
+            with profiler.stage('fails'):
+                raise ValueError
+        self.assertEqual(profiler.records['fails']['status'], 'error')
+        self.assertIn('wall_sec', profiler.records['fails'])
+
+    def test_cprofile_dump(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            profiler = StageProfiler(Path(tmp) / 'cprofile')
+            with profiler.stage('train'):
+                sum(range(1000))
+            self.assertTrue((Path(tmp) / 'cprofile' / 'train.prof').exists())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+""" Test promoting trained files with ModelPusher. """
+
+import os
+import tempfile
+import sqlite3
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import yaml
+
+from backorder import utils
+from backorder.components.model.pusher import ModelPusher
+from backorder.entity import (DataTransformationArtifact, ModelTrainerArtifact,
+                              StoredModelConfig)
+from backorder.model_registry import ModelRegistry
+from backorder.pipeline.model_cache import ModelCache
+from backorder.stage_cache import file_fingerprint
+
+
+class TestModelPusher(unittest.TestCase):
+    def setUp(self):
+        self.cwd = Path.cwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def push(self, version: int) -> None:
+        trained = Path('trained')
+        utils.dump_object(trained / 'model.pkl', {'model': version})
+        utils.dump_object(trained / 'transformer.pkl', {'transformer': version})
+        utils.dump_object(trained / 'target_encoder.pkl', {'target_enc': version})
+        utils.dump_array(trained / 'train_rows.npy', np.arange(version + 1, dtype=np.uint64))
+        trf_artifact = DataTransformationArtifact(
+            trained / 'transformer.pkl', trained / 'target_encoder.pkl', *[None] * 4)
+        trainer_artifact = ModelTrainerArtifact(
+            trained / 'model.pkl', 1.0, 1.0, trained / 'train_rows.npy')
+        ModelPusher(trf_artifact, trainer_artifact).initiate()
+
+    def test_promotes_versions(self):
+        self.push(0)
+        self.push(1)
+        stored = StoredModelConfig()
+        self.assertEqual(stored.stored_versions, [0, 1])
+        self.assertEqual(stored.latest_stored_dir.name, '1')
+        self.assertEqual(stored.registry.current_version(), 1)
+        self.assertEqual(utils.load_object(stored.stored_model_path), {'model': 1})
+        # No staging directory is left behind
+        self.assertEqual(sorted(p.name for p in stored.model_registry.iterdir()),
+                         ['0', '1', 'registry.db'])
+        record = stored.registry.get(1)
+        self.assertEqual(record['metrics'], {'train_score': 1.0, 'test_score': 1.0})
+        self.assertEqual(record['data_fingerprint'],
+                         record['files']['train_rows.npy']['sha256'])
+
+        manifest = yaml.safe_load((stored.latest_stored_dir / 'manifest.yaml').read_text())
+        for name, entry in manifest['files'].items():
+            fp = stored.latest_stored_dir / name
+            self.assertEqual(file_fingerprint(fp), entry['sha256'])
+        self.assertEqual(manifest['files']['model.pkl']['method'], 'hardlink')
+        # Rewriting the trained files does not touch the stored version
+        self.push(2)
+        self.assertEqual(utils.load_object(Path('stored_models/1/model.pkl')), {'model': 1})
+
+    def test_current_version_selects_served_version(self):
+        self.push(0)
+        self.push(1)
+        StoredModelConfig().registry.set_current(0)
+        stored = StoredModelConfig()
+        self.assertEqual(stored.latest_stored_dir.name, '0')
+        self.assertEqual(stored.new_dir_to_store_models.name, '2')
+        self.assertEqual(ModelCache(stored.model_registry).get().version, 0)
+
+    def test_tampered_version_is_not_loaded(self):
+        self.push(0)
+        self.assertEqual(ModelCache(Path('stored_models')).get().version, 0)
+        model_fp = Path('stored_models', '0', 'model.pkl')
+        model_fp.unlink()
+        utils.dump_object(model_fp, {'model': 'swapped'})
+        with self.assertRaisesRegex(Exception, 'does not match the checksum'):
+            ModelCache(Path('stored_models')).get()
+
+    def test_failed_registration_is_cleaned_up(self):
+        self.push(0)
+        with mock.patch.object(ModelRegistry, 'add',
+                               side_effect=sqlite3.OperationalError('database is locked')):
+            with self.assertRaises(Exception):
+                self.push(1)
+        stored = StoredModelConfig()
+        self.assertFalse((stored.model_registry / '1').exists())
+        self.assertEqual(stored.registry.current_version(), 0)
+
+        self.push(1)
+        self.assertEqual(StoredModelConfig().stored_versions, [0, 2])
+
+    def test_skips_unregistered_directory(self):
+        self.push(0)
+        # Left behind by a pusher that died before registering it
+        (Path('stored_models') / '1').mkdir()
+        (Path('stored_models') / '1' / 'model.pkl').write_bytes(b'partial')
+        self.push(1)
+        stored = StoredModelConfig()
+        self.assertEqual(stored.stored_versions, [0, 2])
+        self.assertEqual(utils.load_object(stored.stored_model_path), {'model': 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+""" Test the RowScorer single-row fast path. """
+
+import unittest
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import LabelEncoder
+
+from backorder.components.data.transformation import DataTransformation
+from backorder.entity import StoredModelBundle
+from backorder.pipeline.row_scorer import RowScorer
+
+
+class TestRowScorer(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        rng = np.random.default_rng(0)
+        cls.df = pd.DataFrame({
+            'a': rng.normal(size=300),
+            'b': rng.integers(0, 100, size=300).astype(float),
+            'flag': rng.choice(['Yes', 'No'], size=300),
+        })
+        cls.df.loc[::7, 'a'] = np.nan
+        y = np.where(cls.df['b'] > 50, 'Yes', 'No')
+
+        transformer = DataTransformation.get_transformer_object(['a', 'b'], ['flag'])
+        transformer.fit(cls.df)
+        target_enc = LabelEncoder().fit(y)
+        model = RandomForestClassifier(n_estimators=10, random_state=0)
+        model.fit(transformer.transform(cls.df), target_enc.transform(y))
+
+        cls.bundle = StoredModelBundle(0, model, transformer, target_enc)
+        cls.scorer = RowScorer(cls.bundle)
+
+    def test_matches_transformer(self):
+        records = self.df.to_dict('records')
+        np.testing.assert_array_equal(
+            self.scorer.to_matrix(records), self.bundle.transformer.transform(self.df))
+
+    def test_matches_model(self):
+        records = self.df.astype(str).to_dict('records')
+        expected = self.bundle.target_enc.inverse_transform(
+            self.bundle.model.predict(self.bundle.transformer.transform(self.df)))
+        self.assertEqual(self.scorer.predict(records), list(expected))
+
+    def test_unknown_category(self):
+        with self.assertRaises(ValueError):
+            self.scorer.predict([{'a': 1, 'b': 2, 'flag': 'Maybe'}])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+""" Test the sampling functions. """
+
+import unittest
+
+import numpy as np
+
+from backorder.components.data import sampling
+
+
+class TestSampling(unittest.TestCase):
+    def setUp(self):
+        self.y = np.array(['No'] * 90 + ['Yes'] * 10)
+
+    def test_upsample_indices_balance_classes(self):
+        indices = sampling.upsample_indices(self.y, random_state=0)
+        labels, counts = np.unique(self.y[indices], return_counts=True)
+        self.assertEqual(counts.tolist(), [90, 90])
+        # Every original row is kept
+        self.assertEqual(len(np.unique(indices)), 90 + 10)
+
+    def test_upsample_weights_match_indices(self):
+        weights = sampling.upsample_weights(self.y, random_state=0)
+        self.assertEqual(weights.sum(), 180)
+        self.assertTrue((weights[:90] == 1).all())
+        self.assertEqual(weights[90:].sum(), 90)
+
+    def test_class_weight(self):
+        weights = sampling.get_sample_weight(self.y, 'class_weight')
+        self.assertAlmostEqual(weights[self.y == 'No'].sum(), weights[self.y == 'Yes'].sum())
+        self.assertIsNone(sampling.get_sample_weight(self.y, 'none'))
+        with self.assertRaises(ValueError):
+            sampling.get_sample_weight(self.y, 'downsample')
+
+
+if __name__ == '__main__':
+    unittest.main()
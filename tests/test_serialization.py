@@ -0,0 +1,59 @@
+""" Test the pluggable artifact serialization formats. """
+
+import tempfile
+import unittest
+from pathlib import Path
+
+import dill
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+from backorder import serialization
+
+
+class TestSerialization(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        rng = np.random.default_rng(0)
+        cls.X = rng.normal(size=(300, 5))
+        y = (cls.X[:, 0] > 0).astype(int)
+        cls.model = RandomForestClassifier(n_estimators=5, random_state=0).fit(cls.X, y)
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_round_trip(self):
+        expected = self.model.predict_proba(self.X)
+        for fmt in ['dill', 'joblib', 'pickle5']:
+            fp = self.dir / f'{fmt}.pkl'
+            serialization.dump(fp, self.model, fmt)
+            self.assertEqual(serialization.detect_format(fp), fmt)
+            np.testing.assert_array_equal(serialization.load(fp).predict_proba(self.X), expected)
+        # Only the renamed files are left
+        self.assertEqual(len(list(self.dir.iterdir())), 3)
+
+    def test_pickle5_arrays_are_writable(self):
+        fp = self.dir / 'array.pkl'
+        serialization.dump(fp, {'a': np.arange(10.0), 'b': 'text'}, 'pickle5')
+        obj = serialization.load(fp)
+        obj['a'][0] = -1
+        self.assertEqual(obj['b'], 'text')
+        self.assertEqual(serialization.load(fp)['a'][0], 0)
+
+    def test_legacy_dill_file(self):
+        fp = self.dir / 'legacy.pkl'
+        fp.write_bytes(dill.dumps({'x': 1}))
+        self.assertEqual(serialization.load(fp), {'x': 1})
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            serialization.dump(self.dir / 'x.pkl', 1, 'yaml')
+        self.assertEqual(list(self.dir.iterdir()), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+""" Test the StageCache class. """
+
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from backorder.entity import (DataIngestionArtifact, DataTransformationArtifact,
+                              ModelPusherArtifact)
+from backorder.stage_cache import StageCache, file_fingerprint
+
+
+class TestStageCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.cache = StageCache(self.root / 'cache')
+        self.train_fp = self.root / 'train.parquet'
+        self.train_fp.write_bytes(b'train')
+        self.artifact = DataIngestionArtifact(
+            self.root / 'never_written.csv', self.train_fp, self.train_fp)
+        self.calls = 0
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _ingest(self):
+        self.calls += 1
+        return self.artifact
+
+    def test_hit_on_same_inputs(self):
+        parts = {'data': file_fingerprint(self.train_fp)}
+        first = self.cache.run('data_ingestion', parts, DataIngestionArtifact, self._ingest)
+        second = self.cache.run('data_ingestion', parts, DataIngestionArtifact, self._ingest)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(first, second)
+        self.assertEqual(self.cache.report['data_ingestion']['cache'], 'hit')
+
+    def test_miss_on_changed_input(self):
+        self.cache.run('data_ingestion', {'data': file_fingerprint(self.train_fp)},
+                       DataIngestionArtifact, self._ingest)
+        self.train_fp.write_bytes(b'new train data')
+        self.cache.run('data_ingestion', {'data': file_fingerprint(self.train_fp)},
+                       DataIngestionArtifact, self._ingest)
+        self.assertEqual(self.calls, 2)
+
+    def test_miss_on_deleted_output(self):
+        parts = {'data': 'x'}
+        self.cache.run('data_ingestion', parts, DataIngestionArtifact, self._ingest)
+        self.train_fp.unlink()
+        self.assertIsNone(self.cache.lookup(
+            'data_ingestion', StageCache.key(parts), DataIngestionArtifact))
+
+    def test_miss_on_rewritten_output(self):
+        parts = {'data': 'x'}
+        self.cache.run('data_ingestion', parts, DataIngestionArtifact, self._ingest)
+        self.train_fp.write_bytes(b'written by a later run')
+        self.assertIsNone(self.cache.lookup(
+            'data_ingestion', StageCache.key(parts), DataIngestionArtifact))
+
+    def test_disabled(self):
+        cache = StageCache(self.root / 'cache', enabled=False)
+        cache.run('data_ingestion', {}, DataIngestionArtifact, self._ingest)
+        cache.run('data_ingestion', {}, DataIngestionArtifact, self._ingest)
+        self.assertEqual(self.calls, 2)
+
+    def test_optional_paths(self):
+        fps = [self.train_fp] * 6
+        for canary_fp in [None, self.train_fp]:
+            artifact = DataTransformationArtifact(*fps, canary_fp)
+            self.cache.store('data_transformation', str(canary_fp), artifact)
+            self.assertEqual(self.cache.lookup('data_transformation', str(canary_fp),
+                                               DataTransformationArtifact), artifact)
+
+    def test_directory_outputs_are_not_hashed(self):
+        stored_dir = self.root / 'stored_models'
+        (stored_dir / '0').mkdir(parents=True)
+        (stored_dir / '0' / 'model.pkl').write_bytes(b'model')
+        artifact = ModelPusherArtifact(self.root, stored_dir)
+        self.cache.store('model_pusher', 'key', artifact)
+
+        # Versions pushed or removed later do not make the entry stale ...
+        (stored_dir / '1').mkdir()
+        (stored_dir / '1' / 'model.pkl').write_bytes(b'newer model')
+        self.assertEqual(self.cache.lookup('model_pusher', 'key', ModelPusherArtifact), artifact)
+        # ... only a missing directory does
+        shutil.rmtree(stored_dir)
+        self.assertIsNone(self.cache.lookup('model_pusher', 'key', ModelPusherArtifact))
+
+
+if __name__ == '__main__':
+    unittest.main()
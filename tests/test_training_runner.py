@@ -0,0 +1,126 @@
+""" Test TrainingJobRunner with stub training processes. """
+
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from backorder.serving import JobStore, TrainingJobRunner, TrainingQueueFull
+
+
+# Stub targets, run in a spawned process in place of `training_runner._train`
+def _succeed(events, cpu_limit, nice, main_data_fp):
+    events.put(('progress', 'data_ingestion', 'start', None))
+    events.put(('progress', 'data_ingestion', 'end', 0.5))
+    events.put(('result', {'message': 'Model Training Completed!'}))
+
+
+def _fail(events, cpu_limit, nice, main_data_fp):
+    events.put(('progress', 'data_ingestion', 'start', None))
+    events.put(('error', 'No data to train on.'))
+
+
+def _crash(events, cpu_limit, nice, main_data_fp):
+    os._exit(3)
+
+
+def _wait_for(events, cpu_limit, nice, gate: Path):
+    """ Train until `gate` exists. """
+    while not gate.exists():
+        time.sleep(0.05)
+    events.put(('result', {'message': 'Model Training Completed!'}))
+
+
+def wait_until_running(job, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while job.status != 'running':
+        if time.monotonic() > deadline:
+            raise TimeoutError(f'Job {job.id} is {job.status}')
+        time.sleep(0.01)
+
+
+class TestTrainingJobRunner(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.gate = Path(self.tmp.name) / 'gate'
+        self.jobs = JobStore()
+
+    def tearDown(self):
+        # Lets a stub still waiting exit
+        self.gate.touch()
+        self.tmp.cleanup()
+
+    def test_result_and_progress(self):
+        job = TrainingJobRunner(self.jobs, _succeed).submit()
+        self.assertEqual(job.future.result(60), {'message': 'Model Training Completed!'})
+        self.assertIs(self.jobs.get(job.id), job)
+
+        data = job.to_dict()
+        self.assertEqual(data['status'], 'succeeded')
+        self.assertEqual(data['stages'], {'data_ingestion': {'status': 'done', 'seconds': 0.5}})
+        # A snapshot, not the dict the runner thread writes to
+        self.assertIsNot(data['stages'], job.stages)
+
+    def test_failure(self):
+        runner = TrainingJobRunner(self.jobs, _fail)
+        job = runner.submit()
+        with self.assertRaisesRegex(RuntimeError, 'No data to train on.'):
+            job.future.result(60)
+        data = job.to_dict()
+        self.assertEqual((data['status'], data['error']), ('failed', 'No data to train on.'))
+        self.assertEqual(data['stages'], {'data_ingestion': {'status': 'running', 'seconds': None}})
+
+        runner.target = _crash
+        job = runner.submit()
+        with self.assertRaisesRegex(RuntimeError, 'exited with code 3'):
+            job.future.result(60)
+
+    def test_queue_full(self):
+        runner = TrainingJobRunner(self.jobs, _wait_for)
+        runner.dedupe, runner.max_queue = False, 1
+        running = runner.submit(self.gate)
+        wait_until_running(running)
+        waiting = runner.submit(self.gate)
+        with self.assertRaises(TrainingQueueFull):
+            runner.submit(self.gate)
+
+        self.gate.touch()
+        for job in [running, waiting]:
+            self.assertEqual(job.future.result(60), {'message': 'Model Training Completed!'})
+
+    def test_dedupe(self):
+        runner = TrainingJobRunner(self.jobs, _wait_for)
+        wait_until_running(runner.submit(self.gate))
+        waiting = runner.submit(self.gate)
+        self.assertIs(runner.submit(self.gate), waiting)
+        self.gate.touch()
+        waiting.future.result(60)
+
+
+class TestTrainModelRoute(unittest.TestCase):
+    def setUp(self):
+        self.cwd = Path.cwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+        import app
+        app.model_cache.stop_watcher()
+        self.app = app
+        self.training_runner = app.training_runner
+
+    def tearDown(self):
+        self.app.training_runner = self.training_runner
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def test_queue_full_is_429(self):
+        runner = TrainingJobRunner(self.app.jobs, _succeed)
+        runner.max_queue = 0
+        self.app.training_runner = runner
+        response = self.app.app.test_client().post('/train_model')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('already waiting', response.get_json()['error'])
+
+
+if __name__ == '__main__':
+    unittest.main()
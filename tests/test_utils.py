@@ -0,0 +1,72 @@
+""" Test the dataset readers of utils. """
+
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from backorder import utils
+
+
+class TestDatasetReaders(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        rng = np.random.default_rng(0)
+        n_rows = 1_000
+        cls.df = pd.DataFrame({
+            'a': np.where(rng.random(n_rows) < 0.3, np.nan, rng.normal(size=n_rows)),
+            'b': rng.poisson(5, n_rows).astype(float),
+            'c': pd.Series(rng.choice(['x', 'y', None], n_rows), dtype=object),
+            'd': np.where(rng.random(n_rows) < 0.01, np.nan, rng.random(n_rows)),
+        })
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_parquet_null_counts(self):
+        fp = self.dir / 'data.parquet'
+        # Several row groups, whose counts are summed
+        self.df.to_parquet(fp, index=False, row_group_size=300)
+
+        n_rows, null_counts = utils.parquet_null_counts(fp)
+        self.assertEqual(n_rows, len(self.df))
+        self.assertEqual(null_counts, self.df.isna().sum().to_dict())
+
+    def test_parquet_null_counts_unavailable(self):
+        no_stats_fp = self.dir / 'data.parquet'
+        self.df.to_parquet(no_stats_fp, index=False, write_statistics=False)
+        csv_fp = self.dir / 'data.csv'
+        self.df.to_csv(csv_fp, index=False)
+
+        self.assertIsNone(utils.parquet_null_counts(no_stats_fp))
+        self.assertIsNone(utils.parquet_null_counts(csv_fp))
+
+    def test_read_columns(self):
+        columns = ['d', 'a']
+        parquet_dir = self.dir / 'parts'
+        parquet_dir.mkdir()
+        for i, start in enumerate(range(0, len(self.df), 500)):
+            self.df.iloc[start:start + 500].to_parquet(parquet_dir / f'{i}.parquet', index=False)
+        self.df.to_parquet(self.dir / 'data.parquet', index=False)
+        self.df.to_csv(self.dir / 'data.csv', index=False)
+
+        for fp in [self.dir / 'data.parquet', parquet_dir, self.dir / 'data.csv']:
+            df = utils.read_dataset(fp, columns=columns)
+            self.assertEqual(list(df.columns), columns)
+            pd.testing.assert_frame_equal(df, self.df[columns])
+
+        filtered = utils.read_dataset(self.dir / 'data.csv', columns=columns,
+                                      filters=[('d', '<', 0.5)])
+        self.assertEqual(list(filtered.columns), columns)
+        pd.testing.assert_frame_equal(
+            filtered, self.df.loc[self.df['d'] < 0.5, columns].reset_index(drop=True))
+
+
+if __name__ == '__main__':
+    unittest.main()